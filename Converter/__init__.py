@@ -1,5 +1,80 @@
-from .converter import Converter
+"""Merges a New File into a Current File and writes the result to an Output File.
+
+The names below are imported from their modules the first time they are used, so importing the package, or a single module such as Converter.streams, does not import every engine.
+"""
+
+import importlib
+from typing import Any, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .converter import Converter
+    from .external_sort import ExternalSortConverter
+    from .incremental import IncrementalConverter
+    from .pipeline import PipelinedConverter
+    from .engines import ENGINES, create_converter, default_engine
+    from .columnar import ColumnarConverter
+    from .sources import NewFileSource, SourceChanges
+    from .output_index import OutputIndex
+    from .lookup import AircraftLookup, IndexedFileLookup
+    from .worker import ConversionWorker, WorkerMessage
+    from .instrumentation import Instrumentation
+
+# The module each name is imported from
+LAZY_IMPORTS = {
+    'Converter': 'converter',
+    'ExternalSortConverter': 'external_sort',
+    'IncrementalConverter': 'incremental',
+    'PipelinedConverter': 'pipeline',
+    'ENGINES': 'engines',
+    'create_converter': 'engines',
+    'default_engine': 'engines',
+    'ColumnarConverter': 'columnar',
+    'NewFileSource': 'sources',
+    'SourceChanges': 'sources',
+    'OutputIndex': 'output_index',
+    'AircraftLookup': 'lookup',
+    'IndexedFileLookup': 'lookup',
+    'ConversionWorker': 'worker',
+    'WorkerMessage': 'worker',
+    'Instrumentation': 'instrumentation',
+}
 
 __all__ = [
     'Converter',
+    'ExternalSortConverter',
+    'IncrementalConverter',
+    'PipelinedConverter',
+    'ENGINES',
+    'create_converter',
+    'default_engine',
+    'ColumnarConverter',
+    'NewFileSource',
+    'SourceChanges',
+    'OutputIndex',
+    'AircraftLookup',
+    'IndexedFileLookup',
+    'ConversionWorker',
+    'WorkerMessage',
+    'Instrumentation',
 ]
+
+def __getattr__(name: str) -> Any:
+    """Imports a name from its module the first time it is used.
+
+    Args:
+        name (str): The name.
+
+    Returns:
+        Any: The value of the name.
+
+    Raises:
+        AttributeError: If the package does not export the name.
+    """
+    if name not in LAZY_IMPORTS:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    # Import the module and store the value, so this is only called once for each name
+    value = getattr(importlib.import_module(f'.{LAZY_IMPORTS[name]}', __name__), name)
+    globals()[name] = value
+
+    return value
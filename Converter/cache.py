@@ -0,0 +1,193 @@
+"""Caches the parsed rows of current files so later conversions do not have to parse them again.
+
+The same current file is usually converted against many new files, parsing it is the slowest part of reading it. After a current file has been parsed its rows are saved in marshal format, loading them back is several times faster than parsing the file.
+
+Each cached file is stored as an entry named after its path, delimiter and fieldnames. The entry records the size, modification time and a hash of the contents of the file it was parsed from, it is only used if they all still match, so an entry is never used once the file has changed.
+
+The total size of the entries is capped, the least recently used entries are deleted first when the cap is exceeded.
+
+Classes:
+    CacheEntry: Identifies the version of a current file and where its cache entry is stored.
+    ParsedFileCache: Saves and loads the parsed rows of current files.
+
+Functions:
+    hash_file: Hashes the contents of a file.
+"""
+
+import hashlib
+import logging
+import marshal
+import os
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from .streams import file_fingerprint, paused_gc
+
+import constants
+
+class CacheEntry(NamedTuple):
+    """Identifies the version of a current file and where its cache entry is stored.
+
+    Attributes:
+        path (Path): The path of the cache entry.
+        fingerprint (Tuple[str, int, int]): The path, size and modification time of the current file.
+        content_hash (str): The hash of the contents of the current file.
+    """
+    path: Path
+    fingerprint: Tuple[str, int, int]
+    content_hash: str
+
+def hash_file(path: Path) -> str:
+    """Hashes the contents of a file.
+
+    Args:
+        path (Path): The path of the file.
+
+    Returns:
+        str: The hexadecimal digest of the contents.
+    """
+    digest = hashlib.blake2b(digest_size=constants.CACHE_DIGEST_SIZE)
+
+    with path.open('rb') as source_file:
+        while chunk := source_file.read(constants.COPY_CHUNK_SIZE):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+class ParsedFileCache:
+    """Saves and loads the parsed rows of current files.
+
+    Args:
+        directory (Path): The directory the entries are stored in, created when the first entry is saved.
+        size_limit (int): The maximum total size of the entries in bytes.
+    """
+    def __init__(self, directory: Path, size_limit: int = constants.CACHE_SIZE_LIMIT) -> None:
+        self.directory = directory
+        self.size_limit = size_limit
+
+    def entry(self, source_path: Path, delimiter: str, fieldnames: Sequence[str]) -> CacheEntry:
+        """Identifies the current version of a file.
+
+        Args:
+            source_path (Path): The path of the file.
+            delimiter (str): The delimiter the file is parsed with.
+            fieldnames (Sequence[str]): The fieldnames of the rows the file is parsed into.
+
+        Returns:
+            CacheEntry: The entry for the file.
+        """
+        # Fingerprint the file before hashing it, so a change while it is hashed is noticed when the entry is saved
+        fingerprint = file_fingerprint(source_path)
+
+        # Name the entry after everything which changes how the file is parsed, so each file has a single entry which is replaced when it changes
+        name = hashlib.blake2b(marshal.dumps((constants.CACHE_VERSION, fingerprint[0], delimiter, list(fieldnames))), digest_size=constants.CACHE_DIGEST_SIZE).hexdigest()
+
+        return CacheEntry(self.directory / f'{name}{constants.CACHE_SUFFIX}', fingerprint, hash_file(source_path))
+
+    def load(self, entry: CacheEntry) -> Optional[Tuple[List[List[str]], int]]:
+        """Loads the rows of a file, if they have been cached.
+
+        Args:
+            entry (CacheEntry): The entry for the file.
+
+        Returns:
+            Optional[Tuple[List[List[str]], int]]: The rows and the number of lines read to parse them, or None if they are not cached or the file has changed.
+        """
+        try:
+            with entry.path.open('rb') as cache_file:
+                # Check the entry was saved from this version of the file before loading the rows
+                header: Dict[str, object] = marshal.load(cache_file)
+
+                if header['version'] != constants.CACHE_VERSION or tuple(header['fingerprint']) != entry.fingerprint or header['content_hash'] != entry.content_hash: # type: ignore[arg-type]
+                    # Log that the entry is out of date
+                    logging.info('The cached rows of %s are out of date', entry.fingerprint[0])
+
+                    return None
+
+                # Read the rows in a single call, marshal reads a file in small pieces
+                data = cache_file.read()
+
+                # Pause the garbage collector while the rows are loaded
+                with paused_gc():
+                    rows: List[List[str]] = marshal.loads(data)
+
+            # Mark the entry as recently used
+            os.utime(entry.path)
+
+            # Log that the rows were loaded from the cache
+            logging.info('Loaded %s rows of %s from the cache', len(rows), entry.fingerprint[0])
+
+            return rows, header['lines_read'] # type: ignore[return-value]
+
+        except FileNotFoundError:
+            return None
+
+        except (OSError, EOFError, ValueError, TypeError, KeyError) as error:
+            # Log that the entry could not be read, it is replaced when the file has been parsed
+            logging.warning('Could not read the cached rows of %s: %s', entry.fingerprint[0], error)
+
+            return None
+
+    def save(self, entry: CacheEntry, rows: List[List[str]], lines_read: int) -> None:
+        """Saves the rows of a file, then deletes the least recently used entries if the cache is too large.
+
+        Args:
+            entry (CacheEntry): The entry for the file.
+            rows (List[List[str]]): The rows parsed from the file.
+            lines_read (int): The number of lines read to parse the rows.
+        """
+        try:
+            # Do not save the rows if the file changed while it was being parsed
+            if file_fingerprint(Path(entry.fingerprint[0])) != entry.fingerprint:
+                logging.info('%s changed while it was read, its rows have not been cached', entry.fingerprint[0])
+                return
+
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+            # Write to a temporary file first so a partial entry is never left behind
+            partial_path = entry.path.with_name(entry.path.name + constants.PARTIAL_OUTPUT_SUFFIX)
+
+            with partial_path.open('wb') as cache_file:
+                marshal.dump({
+                    'version': constants.CACHE_VERSION,
+                    'fingerprint': entry.fingerprint,
+                    'content_hash': entry.content_hash,
+                    'lines_read': lines_read,
+                }, cache_file)
+                marshal.dump(rows, cache_file)
+
+            # Replace the previous entry for the file
+            os.replace(partial_path, entry.path)
+
+            # Keep the cache within its size limit
+            self.evict()
+
+        except (OSError, ValueError) as error:
+            # The cache is only an optimisation, so log the error and carry on
+            logging.warning('Could not cache the rows of %s: %s', entry.fingerprint[0], error)
+
+    def evict(self) -> None:
+        """Deletes the least recently used entries until the cache is within its size limit."""
+        # Find the entries, the modification time of each is updated whenever it is used
+        entries = []
+
+        for path in self.directory.glob(f'*{constants.CACHE_SUFFIX}'):
+            try:
+                entry_status = path.stat()
+            except FileNotFoundError:
+                continue
+
+            entries.append((entry_status.st_mtime_ns, entry_status.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+
+        # Delete the least recently used entries first
+        for _, size, path in sorted(entries):
+            if total_size <= self.size_limit:
+                break
+
+            # Log that the entry is being deleted
+            logging.info('Removing %s from the cache', path.name)
+
+            path.unlink(missing_ok=True)
+            total_size -= size
@@ -0,0 +1,494 @@
+"""Merges the New File into the Current File with column operations, using pyarrow and NumPy where they are installed.
+
+The in memory engine parses, maps and stores one row at a time in Python, which limits how fast it can go. This engine reads each file with pyarrow's multi-threaded CSV reader and applies the mapping to whole columns:
+
+- the Mode S IDs of both files are converted to ICAO addresses as a column
+- each mapped column of the new file is copied to all of its IRCA columns at once
+- only the non-empty values of a column are copied, the last non-empty value for each address wins
+- the new file is joined to the current file on the address, rows for new addresses are added in the order they first appear
+
+The rows are joined into lines as columns too, only the rows with a value needing quotes are formatted by the in memory engine's row formatter, so the output is byte-identical to the in memory engine's.
+
+pyarrow and NumPy are optional, the module can be imported without them and the engine is only chosen automatically when both are installed. Files pyarrow cannot read the same way as csv.reader, such as those whose rows do not all have the same number of values, are read by the in memory engine's code instead, from the bytes already read.
+
+The read and merge phases each run in a single call whatever the time slice, so the engine suits the command line rather than the progress dialog.
+
+Classes:
+    ColumnarConverter: Merges the New File into the Current File with column operations.
+
+Functions:
+    columnar_available: Checks whether pyarrow and NumPy are installed.
+"""
+
+import codecs
+import csv
+import importlib.util
+import io
+import logging
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .converter import Converter
+from .merge_plan import MergePlan
+from .row_store import RowStore
+from .sources import NewFileSource
+from .streams import InputFile, open_input_file, paused_gc
+from .writer import RowFormatter
+
+import constants
+
+def columnar_available() -> bool:
+    """Checks whether pyarrow and NumPy are installed.
+
+    Returns:
+        bool: True if both can be imported.
+    """
+    return all(importlib.util.find_spec(module) is not None for module in constants.COLUMNAR_ENGINE_MODULES)
+
+class ColumnarConverter(Converter):
+    """Merges the New File into the Current File with column operations.
+
+    Args:
+        current_file_path (Path): The existing aircraft database file.
+        current_file_delimiter (str): The delimiter of the existing database file.
+        new_file_path (Path): The file containing new data to be merged into the existing database.
+        new_file_delimiter (str): The delimiter of the new file.
+        output_file_path (Path): The file to output the merged data to.
+        mapping (Dict[str, str]): The mapping of the new file's fieldnames to the current file's fieldnames.
+        time_slice (Optional[timedelta]): How long each call to the write method runs for, None writes the output file in a single call. The read and merge phases always run in a single call.
+        additional_sources (Sequence[NewFileSource]): Further new files to merge after the new file, in order.
+        record_changes (bool): True to record the rows and fields each new file changes in source_changes.
+        sorted_output (bool): True to write the rows sorted by ICAO address, with an index next to the output file.
+
+    Raises:
+        ImportError: If pyarrow or NumPy is not installed.
+    """
+    def __init__(
+            self,
+            current_file_path: Path,
+            current_file_delimiter: str,
+            new_file_path: Path,
+            new_file_delimiter: str,
+            output_file_path: Path,
+            mapping: Dict[str, str],
+            time_slice: Optional[timedelta] = timedelta(milliseconds=constants.UI_REFRESH_TIME),
+            additional_sources: Sequence[NewFileSource] = (),
+            record_changes: bool = False,
+            sorted_output: bool = False
+        ) -> None:
+        # The rows are stored as columns, so the parsed file cache, which holds rows, is not used
+        super().__init__(current_file_path, current_file_delimiter, new_file_path, new_file_delimiter, output_file_path, mapping, time_slice, workers=1, cache_directory=None, additional_sources=additional_sources, record_changes=record_changes, sorted_output=sorted_output)
+
+        # Import the optional modules
+        if not columnar_available():
+            raise ImportError(f'The {constants.COLUMNAR_ENGINE} engine needs {" and ".join(constants.COLUMNAR_ENGINE_MODULES)} to be installed')
+
+        import numpy
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.csv
+
+        self.np: Any = numpy
+        self.pa: Any = pyarrow
+        self.pc: Any = pyarrow.compute
+        self.pa_csv: Any = pyarrow.csv
+
+        # Initialise the ICAO address of each row and the values of each IRCA field, in schema order, while the rows are held as columns
+        self.keys: Any = None
+        self.columns: Optional[List[Any]] = None
+
+        # Initialise the formatted lines of the output file, None if the rows are written from the row store
+        self.output_lines: Optional[List[str]] = None
+
+        # Initialise whether the conversion has fallen back to the in memory engine's row by row code
+        self.row_by_row = False
+
+    def read_table(self, path: Path, delimiter: str) -> Tuple[Optional[Any], List[str], bytes]:
+        """Reads a file into a table with a column of strings for each field.
+
+        Args:
+            path (Path): The path of the file, or '-' for standard input.
+            delimiter (str): The delimiter of the file.
+
+        Returns:
+            Tuple[Optional[Any], List[str], bytes]: The table, or None if pyarrow cannot read the file as csv.reader would, the header and the bytes of the file.
+        """
+        # Read the whole file, decompressing it if it is compressed, so it can be read row by row if pyarrow cannot read it
+        with open_input_file(path) as input_file:
+            data: bytes = input_file.buffer.read()
+
+        # csv.reader keeps a byte order mark in the first fieldname
+        if data.startswith(codecs.BOM_UTF8):
+            return None, [], data
+
+        # Split the header directly, a header which is quoted, empty or ends in a carriage return on its own is left to csv.reader
+        header_end = data.find(b'\n')
+        header_line = data[:header_end] if header_end != -1 else data
+        header_line = header_line[:-1] if header_line.endswith(b'\r') else header_line
+
+        if not header_line or b'"' in header_line or b'\r' in header_line:
+            return None, [], data
+
+        header = header_line.decode('utf-8').split(delimiter)
+
+        # Read every value as a string, never as null, naming the columns by position as fieldnames can be repeated
+        column_names = [str(column) for column in range(len(header))]
+
+        try:
+            table = self.pa_csv.read_csv(
+                self.pa.BufferReader(data),
+                read_options=self.pa_csv.ReadOptions(column_names=column_names, skip_rows=1, use_threads=True),
+                parse_options=self.pa_csv.ParseOptions(delimiter=delimiter, quote_char='"', double_quote=True, escape_char=False, newlines_in_values=True, ignore_empty_lines=True),
+                convert_options=self.pa_csv.ConvertOptions(column_types={name: self.pa.string() for name in column_names}, null_values=[], strings_can_be_null=False, quoted_strings_can_be_null=False),
+            )
+
+        except self.pa.ArrowInvalid as error:
+            # Log why the file is read row by row
+            logging.info('Reading %s row by row, %s', path, error)
+
+            return None, header, data
+
+        return table, header, data
+
+    def initialise_current_file(self) -> None:
+        """Initialises the current file, it is read by read_current_file."""
+        # Initialise the number of lines read to 0
+        self.lines_read = 0
+
+    def read_current_file(self) -> Tuple[float, bool]:
+        """Reads the current file into columns in a single call.
+
+        Returns:
+            Tuple[float, bool]: The percentage of the current file read and whether the current file is still being read.
+
+        Notes:
+            If an address appears more than once, its row keeps the position of its first appearance and the values of its last, as the row store does. Rows whose Mode S ID is not a valid address are skipped.
+        """
+        # Read the file row by row if pyarrow could not read it
+        if self.row_by_row:
+            return super().read_current_file()
+
+        table, header, data = self.read_table(self.current_file_path, self.current_file_delimiter)
+
+        if table is None:
+            # Read the bytes already read with the in memory engine's code
+            self.row_by_row = True
+            self.current_file = InputFile(io.BytesIO(data), len(data)) # type: ignore[arg-type]
+            self.current_file_reader = csv.reader(self.current_file, delimiter=self.current_file_delimiter)
+            self.read_current_file_header()
+
+            return super().read_current_file()
+
+        # Take the column of each IRCA field, fields missing from the file are empty
+        header_columns = {field: column for column, field in enumerate(header)}
+        fields = [table.column(header_columns[field]) if field in header_columns else self.pa.array([''] * table.num_rows, self.pa.string()) for field in self.current_file_data.fieldnames]
+
+        # Key each row by its address, skipping the rows whose Mode S ID is not a valid address
+        addresses, _, valid = self.parse_addresses(self.current_file_path, fields[self.current_file_data.schema[constants.MODE_S_ADDRESS_KEY]].combine_chunks())
+
+        if len(addresses) < table.num_rows:
+            fields = [field.filter(valid) for field in fields]
+
+        # Find the distinct addresses in the order they first appear
+        encoded = addresses.dictionary_encode()
+        self.keys = encoded.dictionary
+
+        if len(self.keys) < len(addresses):
+            # Find the last row of each address, the codes are numbered in the order the addresses first appear
+            codes = encoded.indices.to_numpy()
+            _, first_from_end = self.np.unique(codes[::-1], return_index=True)
+            last_rows = len(codes) - 1 - first_from_end
+
+            fields = [field.take(self.pa.array(last_rows)) for field in fields]
+
+        # Hold each field as a single array of strings
+        self.columns = [field.combine_chunks() if isinstance(field, self.pa.ChunkedArray) else field for field in fields]
+        self.lines_read = table.num_rows
+
+        return 100, False
+
+    def initialise_new_file(self) -> None:
+        """Initialises the new file, it is read by merge_source_file unless it has to be read row by row."""
+        # Log the details of the new file
+        self.log_probe(self.new_file_path)
+
+        # Initialise the number of lines read to 0
+        self.lines_read = 0
+
+        # Once the current file has been read row by row the new file is also merged row by row
+        if self.row_by_row:
+            super().initialise_new_file()
+
+    def merge_source_file(self) -> Tuple[float, bool]:
+        """Merges the new file into the columns in a single call.
+
+        Returns:
+            Tuple[float, bool]: The percentage of the new file merged and whether the new file is still being merged.
+        """
+        # Merge the file row by row if either file could not be read by pyarrow
+        if self.row_by_row:
+            return super().merge_source_file()
+
+        table, header, data = self.read_table(self.new_file_path, self.new_file_delimiter)
+
+        if table is None:
+            # Move the columns into the row store and merge the bytes already read with the in memory engine's code
+            self.store_columns()
+            self.row_by_row = True
+            self.new_file = InputFile(io.BytesIO(data), len(data)) # type: ignore[arg-type]
+            self.new_file_reader = csv.reader(self.new_file, delimiter=self.new_file_delimiter)
+            self.merge_plan = MergePlan(self.mapping, self.current_file_data.schema, next(self.new_file_reader, []), self.merge_pool())
+
+            return super().merge_source_file()
+
+        # Compile the mapping, this checks the mapped fields are in the file
+        self.merge_plan = MergePlan(self.mapping, self.current_file_data.schema, header, self.merge_pool())
+        self.merge_columns(table)
+        self.lines_read = table.num_rows
+
+        return 100, False
+
+    def parse_addresses(self, path: Path, mode_s_ids: Any) -> Tuple[Any, Any, Any]:
+        """Converts a column of Mode S IDs to the ICAO addresses they hold, reporting the Mode S IDs which are not valid addresses.
+
+        The Mode S IDs are checked as parse_icao24 checks a single Mode S ID. The valid ones are padded with zeros to six digits, so their string data is six bytes for each, which NumPy converts to integers a digit at a time.
+
+        Args:
+            path (Path): The file the Mode S IDs were read from.
+            mode_s_ids (Any): The Mode S IDs, as an arrow array.
+
+        Returns:
+            Tuple[Any, Any, Any]: The addresses of the valid Mode S IDs, those Mode S IDs without padding and in uppercase, both as arrow arrays, and an arrow array which is True for each valid Mode S ID.
+        """
+        # Remove the padding and check each Mode S ID is one to six hexadecimal digits
+        digits = self.pc.utf8_trim_whitespace(mode_s_ids)
+        valid = self.pc.match_substring_regex(digits, constants.ICAO24_PATTERN)
+
+        if self.pc.all(valid).as_py() is False:
+            # Report the Mode S IDs which are not valid addresses
+            for mode_s_id in mode_s_ids.filter(self.pc.invert(valid)).to_pylist():
+                self.report_invalid_mode_s_id(path, mode_s_id)
+
+            digits = digits.filter(valid)
+
+        # The digits are ASCII once they have been checked
+        digits = self.pc.ascii_upper(digits)
+
+        if len(digits) == 0:
+            return self.pa.array([], self.pa.int64()), digits, valid
+
+        # View the string data of the padded digits as a row of six bytes for each Mode S ID
+        padded = self.pc.utf8_lpad(digits, width=constants.ICAO24_DIGITS, padding='0')
+        offsets, data = padded.buffers()[1:]
+        start = int(self.np.frombuffer(offsets, dtype=self.np.int32)[padded.offset])
+        characters = self.np.frombuffer(data, dtype=self.np.uint8)[start:start + len(padded) * constants.ICAO24_DIGITS].reshape(-1, constants.ICAO24_DIGITS)
+
+        # Look up the value of each digit and add them up, most significant first
+        digit_values = self.np.zeros(256, dtype=self.np.int64)
+
+        for digit in constants.HEXADECIMAL_DIGITS:
+            digit_values[ord(digit)] = int(digit, 16)
+
+        shifts = self.np.arange(constants.ICAO24_DIGITS - 1, -1, -1, dtype=self.np.int64) * 4
+
+        return self.pa.array((digit_values[characters] << shifts).sum(axis=1)), digits, valid
+
+    def merge_columns(self, table: Any) -> None:
+        """Joins the new file to the columns on the ICAO address and copies the non-empty values of each mapped column, recording the rows and fields it changes.
+
+        Args:
+            table (Any): The new file, as read by read_table.
+        """
+        assert self.columns is not None
+        changes = self.source_changes[self.source_index] if self.record_changes else None
+
+        # Get the address of each row, rows whose Mode S ID is not a valid address are skipped
+        keys, mode_s_ids, has_key = self.parse_addresses(self.new_file_path, table.column(self.merge_plan.key_column).combine_chunks())
+
+        # Add empty rows for the addresses which are not in the current file, in the order they first appear
+        new_keys = self.pc.unique(keys.filter(self.pc.is_null(self.pc.index_in(keys, value_set=self.keys))))
+
+        if len(new_keys):
+            if changes is not None:
+                changes.added.extend(new_keys.to_pylist())
+
+            self.keys = self.pa.concat_arrays([self.keys, new_keys])
+            empty_values = self.pa.array([''] * len(new_keys), self.pa.string())
+            self.columns = [self.pa.concat_arrays([column, empty_values]) for column in self.columns]
+
+        # Find the row of each row of the new file
+        positions = self.pc.index_in(keys, value_set=self.keys).to_numpy()
+        row_count = len(self.keys)
+
+        # Initialise the bit mask of the columns changed in each row, held as Python integers so any number of columns fits
+        changed = self.np.zeros(row_count, dtype=object) if changes is not None else None
+
+        for column, irca_columns in self.merge_plan.columns:
+            # Use the Mode S IDs without padding and in uppercase for the Mode S column
+            values = mode_s_ids if column == self.merge_plan.key_column else table.column(column).combine_chunks().filter(has_key)
+
+            # Only non-empty values are copied
+            non_empty = self.pc.not_equal(values, '')
+            targets = positions[non_empty.to_numpy(zero_copy_only=False)]
+            values = values.filter(non_empty)
+
+            # Keep the last value for each row, searching from the end
+            rows, last_from_end = self.np.unique(targets[::-1], return_index=True)
+            last_values = values.take(self.pa.array(len(values) - 1 - last_from_end))
+
+            # Arrow arrays cannot be changed in place, so take each row's value from the column, or from the last values appended to it where it is replaced
+            sources = self.np.arange(row_count)
+            sources[rows] = row_count + self.np.arange(len(rows))
+            sources = self.pa.array(sources)
+
+            for irca_column in irca_columns:
+                irca_values = self.columns[irca_column]
+
+                # Record the rows whose value changes
+                if changed is not None:
+                    changed[rows[self.pc.not_equal(irca_values.take(self.pa.array(rows)), last_values).to_numpy(zero_copy_only=False)]] |= 1 << irca_column
+
+                self.columns[irca_column] = self.pa.concat_arrays([irca_values, last_values]).take(sources)
+
+        # Record the fields changed in each row, each is only changed once so the changes are already those of the whole file
+        if changes is not None and changed is not None:
+            changed_rows = self.np.flatnonzero(changed)
+
+            for key, columns in zip(self.keys.take(self.pa.array(changed_rows)).to_pylist(), changed[changed_rows].tolist()):
+                changes.change_fields(key, columns)
+
+    def store_columns(self) -> None:
+        """Moves the rows held as columns into the row store."""
+        if self.columns is None:
+            return
+
+        # Convert the columns to lists first, iterating over an arrow array returns its values one at a time
+        pooled_columns = set(self.current_file_data.pool.columns)
+        columns = [self.pooled_values(column) if irca_column in pooled_columns else column.to_pylist() for irca_column, column in enumerate(self.columns)]
+
+        # Pause the garbage collector while the rows are created
+        with paused_gc():
+            rows = list(map(list, zip(*columns)))
+
+        self.current_file_data.restore_rows(rows, self.keys.to_pylist())
+
+        # Release the columns
+        self.keys = None
+        self.columns = None
+
+    def pooled_values(self, column: Any) -> List[str]:
+        """Converts a column to a list whose equal values share the pooled string of the row store.
+
+        Args:
+            column (Any): The column, as an arrow array.
+
+        Returns:
+            List[str]: The values of the column.
+        """
+        # Dictionary encode the column so each distinct value is converted to a string and pooled once
+        encoded = column.dictionary_encode()
+        pool_value = self.current_file_data.pool.values.setdefault
+        values = [pool_value(value, value) for value in encoded.dictionary.to_pylist()]
+
+        return list(map(values.__getitem__, encoded.indices.to_pylist()))
+
+    def initialise_output_file(self) -> None:
+        """Initialises the output file, formatting every line at once if the rows are still held as columns."""
+        super().initialise_output_file()
+
+        # Write the rows in the row store if the conversion fell back to row by row
+        if self.columns is None:
+            return
+
+        # Sort the rows by ICAO address if the output is sorted
+        if self.sorted_output:
+            self.sort_columns()
+
+        # Format the lines, the header has already been written
+        self.output_lines = self.format_columns()
+
+        # Record the offset of every line in the index at once, the lines are already formatted
+        if self.output_index is not None:
+            self.output_index.add_lines(self.columns[self.current_file_data.schema[constants.MODE_S_ADDRESS_KEY]].to_pylist(), self.output_lines)
+
+        # Release the columns
+        self.keys = None
+        self.columns = None
+
+    def merged_rows(self) -> Optional[RowStore]:
+        """Gets the merged rows once the conversion has finished.
+
+        Returns:
+            Optional[RowStore]: The rows if the conversion fell back to the row by row code, None if they were held as columns, which are released once the lines have been formatted.
+        """
+        return self.current_file_data if self.output_lines is None else None
+
+    def sort_columns(self) -> None:
+        """Sorts the rows held as columns by ICAO address, in the same order as the in memory engine."""
+        assert self.columns is not None
+
+        # Sort the positions of the rows by their address, each address has a single row
+        order = self.pa.array(self.np.argsort(self.keys.to_numpy()))
+
+        self.keys = self.keys.take(order)
+        self.columns = [column.take(order) for column in self.columns]
+
+    def format_columns(self) -> List[str]:
+        """Formats the rows held as columns as lines, without the line terminator.
+
+        Returns:
+            List[str]: The lines, exactly as the row formatter would format them.
+        """
+        assert self.columns is not None
+
+        # Join the values of each row directly
+        formatter = self.output_file_writer
+        lines = self.pc.binary_join_element_wise(*self.columns, formatter.delimiter)
+
+        output_lines: List[str] = lines.to_pylist()
+
+        # Find the rows the row formatter would pass through csv.writer, those with a quote, a newline or an extra delimiter, Python's string searches are faster than pyarrow's here
+        delimiter = formatter.delimiter
+        delimiter_count = formatter.delimiter_count
+        needs_quoting = [row for row, line in enumerate(output_lines) if line.count(delimiter) != delimiter_count or '"' in line or '\n' in line or '\r' in line]
+
+        # Let the row formatter quote the values of those rows
+        for row in needs_quoting:
+            output_lines[row] = formatter.format_row([column[row].as_py() for column in self.columns])
+
+        return output_lines
+
+    def write_output_file(self) -> Tuple[float, bool]:
+        """Writes the output file.
+
+        Returns:
+            Tuple[float, bool]: The percentage of the output file written and whether the output file has been fully written.
+        """
+        # Write the rows in the row store if the conversion fell back to row by row
+        if self.output_lines is None:
+            return super().write_output_file()
+
+        # Start the time slice
+        self.batch_scheduler.start_slice(constants.WRITE_OUTPUT_FILE_PHASE)
+
+        # Write batches of the formatted lines for the time slice
+        while self.batch_scheduler.next_batch():
+            if self.output_file is None or self.output_file.closed:
+                break
+
+            batch = self.output_lines[self.lines_written:self.lines_written + self.batch_scheduler.batch_size]
+
+            # Close the output file and save its index once every line has been written
+            if not batch:
+                self.output_file.close()
+                self.save_output_index()
+                break
+
+            self.output_file.write(RowFormatter.line_terminator.join(batch) + RowFormatter.line_terminator)
+            self.lines_written += len(batch)
+
+        # End the time slice
+        self.batch_scheduler.end_slice()
+
+        return self.percentage(self.lines_written, len(self.output_lines)), True if self.output_file is None else not self.output_file.closed
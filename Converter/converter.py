@@ -7,11 +7,29 @@ Classes:
 import csv
 import logging
 from pathlib import Path
-from typing import Dict, Tuple
-from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Sequence, TextIO, Tuple, TYPE_CHECKING, Union
+from datetime import timedelta
+
+from .cache import CacheEntry, ParsedFileCache
+from .icao import parse_icao24
+from .mapped_reader import MappedReader
+from .merge_plan import MergePlan
+from .output_index import OutputIndexWriter, output_index_path
+from .preload import PreloadedRows
+from .probe import FileProbe, cached_probe
+from .row_store import RowStore, StringPool
+from .scheduler import BatchScheduler
+from .sources import NewFileSource, SourceChanges
+from .streams import InputFile, is_standard_stream, open_input_file, open_output_file
+from .writer import RowFormatter, RowWriter
 
 import constants
 
+if TYPE_CHECKING:
+    from .instrumentation import StepTimer
+    from .parallel import ParallelParser
+    from .preload import PreloadJob, Preloader
+
 class Converter:
     """Merges the New File into the Current File and outputs the result to the Output File.
 
@@ -22,7 +40,33 @@ class Converter:
         new_file_delimiter (str): The delimiter of the new file.
         output_file_path (Path): The file to output the merged data to.
         mapping (Dict[str, str]): The mapping of the new file's fieldnames to the current file's fieldnames.
+        time_slice (Optional[timedelta]): How long each call to a read, merge or write method runs for, None runs each phase to completion in a single call.
+        workers (int): The number of processes used to parse the new file, 1 parses it in the main process.
+        cache_directory (Optional[Path]): The directory the parsed rows of current files are cached in, None to always parse the current file.
+        preloader (Optional[Preloader]): The preloader which may already have read the current and new files in the background, None to always read them here.
+        additional_sources (Sequence[NewFileSource]): Further new files to merge after the new file, in order, each overwriting the values merged from the files before it.
+        record_changes (bool): True to record the rows and fields each new file changes in source_changes, which makes the merge slower.
+        sorted_output (bool): True to write the rows sorted by ICAO address, with an index of the address and byte offset of each row next to the output file, False to write them in the order they were first added.
+
+    Notes:
+        Any of the file paths can be '-' to read from standard input or write to standard output.
+
+        The new file is only parsed in parallel if it is a regular file, standard input is always parsed in the main process.
+
+        A current file read from standard input is never cached.
+
+        The merge phase merges each new file in turn.
+
+        Rows are keyed by the ICAO address held in their Mode S ID, so the rows of the current and new files with the same address are merged whatever the case or padding of their Mode S IDs. Rows whose Mode S ID is not a valid address are logged and skipped.
+
+        A sorted output file written to standard output has no index.
     """
+    # Whether the engine can merge several new files in a single conversion
+    multiple_sources = True
+
+    # Whether the engine can write the output file sorted by ICAO address
+    sortable_output = True
+
     def __init__(
             self,
             current_file_path: Path,
@@ -30,7 +74,14 @@ class Converter:
             new_file_path: Path,
             new_file_delimiter: str,
             output_file_path: Path,
-            mapping: Dict[str, str]
+            mapping: Dict[str, str],
+            time_slice: Optional[timedelta] = timedelta(milliseconds=constants.UI_REFRESH_TIME),
+            workers: int = constants.DEFAULT_WORKERS,
+            cache_directory: Optional[Path] = constants.CACHE_PATH,
+            preloader: Optional['Preloader'] = None,
+            additional_sources: Sequence[NewFileSource] = (),
+            record_changes: bool = False,
+            sorted_output: bool = False
         ) -> None:
         # Store the file paths
         self.current_file_path = current_file_path
@@ -42,29 +93,116 @@ class Converter:
         # Store the mapping
         self.mapping = mapping
 
-        # Initialise an empty dictionary to store the current file's data
-        self.current_file_data: Dict[str, Dict[str, str]] = {}
+        # Store the new files in the order they are merged, starting with the new file
+        self.sources = [NewFileSource(new_file_path, new_file_delimiter, mapping)] + list(additional_sources)
+
+        # Initialise the index of the new file being merged and the number of lines merged from the new files before it
+        self.source_index = 0
+        self.previous_sources_lines_read = 0
+
+        # Store the time slice
+        self.time_slice = time_slice
+
+        # Create the scheduler which splits each time slice into batches of rows
+        self.batch_scheduler = BatchScheduler(time_slice)
+
+        # Store the number of processes used to parse the new file
+        if workers < 1:
+            raise ValueError('The number of workers must be at least 1')
+
+        self.workers = workers
+
+        # Initialise an empty row store to hold the current file's data, using the IRCA fields as the schema
+        self.current_file_data = RowStore(constants.ORIGINAL_IRCA_MAPPING.keys())
+
+        # Initialise the record of the lines merged from each new file and, if they are recorded, the rows and fields it changes
+        self.record_changes = record_changes
+        self.source_changes = [SourceChanges(source, self.current_file_data.fieldnames) for source in self.sources]
+
+        # Create the cache of parsed current files
+        self.current_file_cache = ParsedFileCache(cache_directory) if cache_directory is not None else None
+
+        # Initialise the cache entry for the current file and whether its rows were loaded from the cache
+        self.current_file_cache_entry: Optional[CacheEntry] = None
+        self.current_file_cached = False
+
+        # Store the preloader and initialise the preloads taken from it
+        self.preloader = preloader
+        self.current_file_preload: Optional['PreloadJob'] = None
+        self.new_file_preload: Optional['PreloadJob'] = None
+
+        # Store whether the output is sorted and initialise the index of its rows, which is only created while a sorted output file is written
+        self.sorted_output = sorted_output
+        self.output_index: Optional[OutputIndexWriter] = None
 
         # Initialise the file pointers
-        self.current_file = None
-        self.new_file = None
-        self.output_file = None
+        self.current_file: Optional[Union[InputFile, MappedReader]] = None
+        self.new_file: Optional[Union[InputFile, PreloadedRows]] = None
+        self.output_file: Optional[TextIO] = None
 
-    def initialise_current_file(self) -> None:
-        """Initialises the current file."""
-        # Get the number of lines in the original file
-        with open(self.current_file_path, 'r', encoding='utf8') as current_file:
-            self.current_file_lines = len(current_file.readlines())
+        # Initialise the parallel parser, which is only created if the new file is parsed across several processes
+        self.parallel_parser: Optional['ParallelParser'] = None
 
-        # Open the current file
-        self.current_file = open(self.current_file_path, 'r', encoding='utf-8', newline='')
+        # Initialise the step timer, which is only set if the conversion is instrumented
+        self.step_timer: Optional['StepTimer'] = None
 
-        # Create a reader for the current file
-        self.current_file_reader = csv.DictReader(self.current_file, delimiter=self.current_file_delimiter)
+        # Initialise the generator running the current phase, used by subclasses which run their phases as generators
+        self.phase: Optional[Iterator[None]] = None
 
+    def initialise_current_file(self) -> None:
+        """Initialises the current file, loading its rows from the cache if it has been parsed before."""
         # Initialise the number of lines read to 0
         self.lines_read = 0
 
+        # Use the rows read in the background since the current file was selected, if the file has not changed since
+        if self.preloader is not None:
+            self.current_file_preload = self.preloader.take_current_file(self.current_file_path, self.current_file_delimiter)
+
+            if self.current_file_preload is not None:
+                return
+
+        # Load the rows from the cache if this version of the current file has been parsed before
+        if self.current_file_cache is not None and not is_standard_stream(self.current_file_path):
+            self.current_file_cache_entry = self.current_file_cache.entry(self.current_file_path, self.current_file_delimiter, self.current_file_data.fieldnames)
+            cached = self.current_file_cache.load(self.current_file_cache_entry)
+
+            if cached is not None:
+                rows, self.lines_read = cached
+
+                # Only rows with a valid address are cached, so their addresses are parsed again without checking
+                key_column = self.current_file_data.schema[constants.MODE_S_ADDRESS_KEY]
+                self.current_file_data.restore_rows(rows, [parse_icao24(values[key_column]) for values in rows]) # type: ignore[misc]
+                self.current_file_cached = True
+                return
+
+        # Read a regular file from a memory map, splitting its lines directly rather than with csv.reader where it can, a file the probe found to be compressed is not opened to check again
+        probe = self.log_probe(self.current_file_path)
+        mapped_reader = MappedReader.open(self.current_file_path, self.current_file_delimiter) if probe is None or probe.compression is None else None
+
+        if mapped_reader is not None:
+            # The reader is both the file and the reader
+            self.current_file = mapped_reader
+            self.current_file_reader: Iterator[List[str]] = mapped_reader
+        else:
+            # Open the current file, progress is tracked from the position in the file so the lines do not need to be counted first
+            self.current_file = open_input_file(self.current_file_path)
+
+            # Create a reader for the current file
+            self.current_file_reader = csv.reader(self.current_file, delimiter=self.current_file_delimiter)
+
+        # Read the header
+        self.read_current_file_header()
+
+    def read_current_file_header(self) -> None:
+        """Reads the header of the current file and finds the column of each IRCA field."""
+        # Read the header and find the column of each IRCA field in the current file
+        header = next(self.current_file_reader, [])
+        header_columns = {field: column for column, field in enumerate(header)}
+        self.current_file_columns = [header_columns.get(field) for field in self.current_file_data.fieldnames]
+
+        # Rows can be stored as they are read if the current file's columns are already in schema order
+        self.current_file_in_schema_order = header == self.current_file_data.fieldnames
+
     def read_current_file(self) -> Tuple[float, bool]:
         """Reads the current file.
         
@@ -72,60 +210,261 @@ class Converter:
             Tuple[float, bool]: The percentage of the current file read and whether the current file has been fully read.
             
         Notes:
-            The current file is read into a dictionary. The key is the Mode S ID and the value is the row.
+            The current file is read into a row store. The key is the ICAO address held in the Mode S ID and the value is the row, rows whose Mode S ID is not a valid address are skipped.
+
+            Once the whole file has been read the rows are saved to the cache.
         """
-        # Get the start time
-        start_time = datetime.now()
+        # The rows have already been loaded from the cache
+        if self.current_file_cached:
+            return 100, False
 
-        # Run for 100 milliseconds
-        while datetime.now() - start_time < timedelta(milliseconds=constants.UI_REFRESH_TIME):
+        # The rows are being read in the background
+        if self.current_file_preload is not None:
+            return self.read_preloaded_current_file()
+
+        # Start the time slice
+        self.batch_scheduler.start_slice(constants.READ_CURRENT_FILE_PHASE)
+        step_timer = self.step_timer
+
+        # Run batches of rows for the time slice, or until the phase is complete if there is no time slice
+        while self.batch_scheduler.next_batch():
             # Check if the file is closed
             if self.current_file is None or self.current_file.closed:
                 break
 
-            # Try to read the next line
-            try:
-                # Get the next row
-                row = next(self.current_file_reader)
+            for _ in range(self.batch_scheduler.batch_size):
+                # Try to read the next line
+                try:
+                    # Get the next row
+                    row = next(self.current_file_reader)
 
-                # Add the row to the dictionary
-                if constants.MODE_S_ADDRESS_KEY in row:
-                    self.current_file_data[row[constants.MODE_S_ADDRESS_KEY]] = row
+                    if step_timer is not None:
+                        step_timer.lap('parse')
 
-            except StopIteration:
-                # Close the current file
-                self.current_file.close()
+                    # Skip blank lines
+                    if not row:
+                        continue
 
-                # Break out of the loop
-                break
+                    # Get the row's values in schema order
+                    values = self.select_current_file_values(row)
+
+                    if step_timer is not None:
+                        step_timer.lap('mapping')
 
-            except csv.Error:
-                # Log the error and ignore this line
-                logging.error('Error reading line %s of %s', self.lines_read, self.current_file_path)
+                    # Add the row to the store, keyed by its address, sharing the values repeated across rows, rows which are skipped are not pooled
+                    mode_s_id = values[self.current_file_data.schema[constants.MODE_S_ADDRESS_KEY]]
+                    icao24 = parse_icao24(mode_s_id)
 
-            # Increment the number of lines read
-            self.lines_read += 1
+                    if icao24 is not None:
+                        self.current_file_data.pool.pool_row(values)
+                        self.current_file_data.set_row(icao24, values)
+                    else:
+                        self.report_invalid_mode_s_id(self.current_file_path, mode_s_id)
+
+                    if step_timer is not None:
+                        step_timer.lap('store insert')
+
+                except StopIteration:
+                    # Close the current file
+                    self.current_file.close()
+
+                    # Cache the rows for the next conversion
+                    if self.current_file_cache is not None and self.current_file_cache_entry is not None:
+                        self.current_file_cache.save(self.current_file_cache_entry, self.current_file_data.rows, self.lines_read)
+
+                    # Break out of the loop
+                    break
+
+                except csv.Error:
+                    # Log the error and ignore this line
+                    logging.error('Error reading line %s of %s', self.lines_read, self.current_file_path)
+
+                # Increment the number of lines read
+                self.lines_read += 1
+
+        # End the time slice
+        self.batch_scheduler.end_slice()
 
         # Return the number of lines read
-        return (self.lines_read / self.current_file_lines) * 100, True if self.current_file is None else not self.current_file.closed
+        return self.current_file.percentage_read() if self.current_file is not None else 0, True if self.current_file is None else not self.current_file.closed
     
+    def read_preloaded_current_file(self) -> Tuple[float, bool]:
+        """Waits for up to a time slice for the current file to be read in the background, then uses its rows.
+
+        Returns:
+            Tuple[float, bool]: The percentage of the current file read and whether it is still being read.
+
+        Notes:
+            If the file could not be read in the background it is read here instead, reporting any error as usual.
+        """
+        preload = self.current_file_preload
+
+        if preload is None or not preload.wait(self.time_slice.total_seconds() if self.time_slice is not None else None):
+            return preload.percentage if preload is not None else 0, True
+
+        self.current_file_preload = None
+
+        # Read the file here if the preload failed
+        if preload.result is None:
+            self.initialise_current_file()
+            return 0, True
+
+        # Use the preloaded rows
+        self.current_file_data = preload.result.data
+        self.lines_read = preload.result.lines_read
+
+        # Log that the preloaded rows were used
+        logging.info('Using the %s rows of %s read in the background', len(self.current_file_data), self.current_file_path)
+
+        return 100, False
+
+    def select_current_file_values(self, row: List[str]) -> List[str]:
+        """Gets the values of a row of the current file in schema order.
+
+        Args:
+            row (List[str]): The row as read from the current file.
+
+        Returns:
+            List[str]: The values of the IRCA fields, missing values are empty.
+        """
+        # Use the row as it is if it is already in schema order
+        if self.current_file_in_schema_order and len(row) == len(self.current_file_columns):
+            return row
+
+        # Pick out the values of the IRCA fields
+        return [row[column] if column is not None and column < len(row) else '' for column in self.current_file_columns]
+
+    def report_invalid_mode_s_id(self, path: Path, mode_s_id: str) -> None:
+        """Reports a row which is skipped because its Mode S ID is not a valid ICAO address.
+
+        Args:
+            path (Path): The file the row was read from.
+            mode_s_id (str): The Mode S ID of the row.
+
+        Notes:
+            Rows without a Mode S ID are skipped without being reported.
+        """
+        if mode_s_id.strip():
+            logging.warning('Skipping a row of %s, its Mode S ID %r is not a valid ICAO address', path, mode_s_id)
+
+    def log_probe(self, path: Path) -> Optional[FileProbe]:
+        """Logs the details of a file found when it was selected, if it has been probed since it last changed.
+
+        The file is not probed here, so a conversion which was not started from the main window does not read the start of each file twice.
+
+        Args:
+            path (Path): The path of the file.
+
+        Returns:
+            Optional[FileProbe]: The cached probe of the file, None if it has not been probed or is standard input.
+        """
+        if is_standard_stream(path):
+            return None
+
+        probe = cached_probe(path)
+
+        if probe is not None:
+            # Log the size and the estimated number of rows of the file
+            if probe.estimated_rows is None:
+                logging.info('%s is %s bytes compressed with %s', path, probe.size, probe.compression)
+            else:
+                logging.info('%s is %s bytes with about %s rows', path, probe.size, probe.estimated_rows)
+
+        return probe
+
+    def merge_pool(self) -> Optional[StringPool]:
+        """Gets the pool the merge plan shares the merged values through.
+
+        Returns:
+            Optional[StringPool]: The pool of the row store, None if the engine does not keep the merged rows in it.
+        """
+        return self.current_file_data.pool
+
     def initialise_new_file(self) -> None:
         """Initialises the new file."""
-        # Get the number of lines in the new file
-        with open(self.new_file_path, 'r', encoding='utf8') as new_file:
-            self.new_file_lines = len(new_file.readlines())
+        # Log the details of the new file
+        self.log_probe(self.new_file_path)
+
+        # Initialise the number of lines read to 0
+        self.lines_read = 0
+
+        # Use the rows parsed in the background since the new file was selected, if the file has not changed since
+        if self.preloader is not None:
+            self.new_file_preload = self.preloader.take_new_file(self.new_file_path, self.new_file_delimiter)
 
-        # Open the new file
-        self.new_file = open(self.new_file_path, 'r', encoding='utf-8', newline='')
+            if self.new_file_preload is not None:
+                return
+
+        # Open the new file, progress is tracked from the position in the file so the lines do not need to be counted first
+        self.new_file = open_input_file(self.new_file_path)
 
         # Create a reader for the new file
-        self.new_file_reader = csv.DictReader(self.new_file, delimiter=self.new_file_delimiter)
+        self.new_file_reader = csv.reader(self.new_file, delimiter=self.new_file_delimiter)
 
-        # Initialise the number of lines read to 0
-        self.lines_read = 0
+        # Read the header and compile the mapping against it
+        header = next(self.new_file_reader, [])
+        self.merge_plan = MergePlan(self.mapping, self.current_file_data.schema, header, self.merge_pool())
+
+        # Start parsing the rest of the file across the worker processes, standard input and compressed files cannot be split so are always parsed here
+        if self.workers > 1 and not is_standard_stream(self.new_file_path) and self.new_file.compression is None:
+            # Import the parallel parser only when it is used, as starting the process pool pulls in multiprocessing
+            from .parallel import ParallelParser
+
+            self.parallel_parser = ParallelParser(self.new_file_path, self.new_file_delimiter, self.merge_plan, len(header), self.workers)
 
     def merge_new_file(self) -> Tuple[float, bool]:
-        """Merges the new file.
+        """Merges each new file in turn.
+
+        Returns:
+            Tuple[float, bool]: The percentage of the new files merged and whether they are still being merged.
+
+        Notes:
+            Once a new file has been merged the next one is initialised, so the merge phase only completes after the last new file has been merged.
+        """
+        # Merge the current new file
+        percentage, still_running = self.merge_source_file()
+
+        # Move on to the next new file once this one has been merged
+        if not still_running:
+            # Complete the record of the changes made by the new file
+            self.source_changes[self.source_index].lines_read = self.lines_read
+
+            if self.record_changes:
+                self.source_changes[self.source_index].finish(self.current_file_data, self.merge_plan.target_columns)
+
+            if self.source_index + 1 < len(self.sources):
+                self.previous_sources_lines_read += self.lines_read
+                self.select_source(self.source_index + 1)
+                self.initialise_new_file()
+
+                percentage, still_running = 0, True
+
+        # Return the percentage of all the new files merged
+        return (self.source_index * 100 + percentage) / len(self.sources), still_running
+
+    def select_source(self, source_index: int) -> None:
+        """Selects the new file to merge next.
+
+        Args:
+            source_index (int): The index of the new file in the sources.
+        """
+        source = self.sources[source_index]
+
+        self.source_index = source_index
+        self.new_file_path = source.path
+        self.new_file_delimiter = source.delimiter
+        self.mapping = source.mapping
+
+    def new_file_lines_read(self) -> int:
+        """Gets the number of lines merged from all the new files so far.
+
+        Returns:
+            int: The number of lines.
+        """
+        return self.previous_sources_lines_read + self.lines_read
+
+    def merge_source_file(self) -> Tuple[float, bool]:
+        """Merges the current new file.
         
         Returns:
             Tuple[float, bool]: The percentage of the new file read and whether the new file has been fully read.
@@ -133,85 +472,245 @@ class Converter:
         Notes:
             The new file is merged into the current file. If the Mode S ID is not in the current file, the row is added to the current file. If the Mode S ID is in the current file, the row is updated with the new data.
 
-            The Mode S ID is converted to uppercase before being used as a key.
+            The Mode S ID is converted to the ICAO address it holds before being used as a key.
 
-            The Mode S ID is not in the mapping, an error is logged and the row is skipped.
+            The mapping is compiled into a MergePlan when the new file is initialised, so only the mapped columns are copied.
 
-            If the Mode S ID is not in the new file, an error is logged and the row is skipped.
+            If the Mode S ID is empty or not a valid address the row is skipped.
 
             If the Mode S ID is not in the current file, the row is added to the current file.
 
             If the Mode S ID is in the current file, the row is updated with the new data.
+
+            If the new file is being parsed in parallel the results of the worker processes are merged instead.
         """
-        # Get the start time
-        start_time = datetime.now()
+        # Merge the results of the worker processes if the new file is being parsed in parallel
+        if self.parallel_parser is not None:
+            return self.merge_parsed_chunks()
+
+        # Wait for the rows being parsed in the background
+        if self.new_file_preload is not None:
+            return self.open_preloaded_new_file()
+
+        # Start the time slice
+        self.batch_scheduler.start_slice(constants.MERGE_NEW_FILE_PHASE)
+        step_timer = self.step_timer
+        changes = self.source_changes[self.source_index] if self.record_changes else None
 
-        # Run for 100 milliseconds
-        while datetime.now() - start_time < timedelta(milliseconds=constants.UI_REFRESH_TIME):
+        # Run batches of rows for the time slice, or until the phase is complete if there is no time slice
+        while self.batch_scheduler.next_batch():
             # Check if the file is closed
             if self.new_file is None or self.new_file.closed:
                 break
 
-            # Try to read the next line
+            for _ in range(self.batch_scheduler.batch_size):
+                # Try to read the next line
+                try:
+                    # Get the next row
+                    new_row = next(self.new_file_reader)
+
+                    if step_timer is not None:
+                        step_timer.lap('parse')
+
+                    # Skip blank lines
+                    if not new_row:
+                        continue
+
+                    # Get the address
+                    icao24 = self.merge_plan.key(new_row)
+
+                    # Ensure the Mode S ID is a valid address
+                    if icao24 is None:
+                        self.report_invalid_mode_s_id(self.new_file_path, self.merge_plan.mode_s_id(new_row))
+
+                    else:
+                        # Get the row from the current file
+                        current_row = self.current_file_data.get_row(icao24)
+
+                        # Check if the row is in the current file
+                        if current_row is None:
+                            # Add the row to the current file
+                            current_row = self.current_file_data.add_empty_row(icao24)
+
+                            if changes is not None:
+                                changes.add_row(icao24)
+
+                        elif changes is not None and icao24 not in changes.previous_rows:
+                            # Keep the values from before the new file changes them, to tell whether a later row changes them back
+                            changes.previous_rows[icao24] = tuple(current_row)
+
+                        if step_timer is not None:
+                            step_timer.lap('store insert')
+
+                        # Merge the new row into the current row, recording the fields it changed
+                        changed = self.merge_plan.apply(new_row, current_row)
+
+                        if changed and changes is not None:
+                            changes.change_fields(icao24, changed)
+
+                        if step_timer is not None:
+                            step_timer.lap('mapping')
+
+                except StopIteration:
+                    # Close the new file
+                    self.new_file.close()
+
+                    # Break out of the loop
+                    break
+
+                except csv.Error:
+                    # Ignore this line, log the error
+                    logging.error(f'Error reading line {self.lines_read} of {self.new_file_path}')
+
+                # Increment the number of lines read
+                self.lines_read += 1
+
+        # End the time slice
+        self.batch_scheduler.end_slice()
+
+        # Return the number of lines read
+        return self.new_file.percentage_read() if self.new_file is not None else 0, True if self.new_file is None else not self.new_file.closed
+
+    def open_preloaded_new_file(self) -> Tuple[float, bool]:
+        """Waits for up to a time slice for the new file to be parsed in the background, then merges its rows in place of reading the file.
+
+        Returns:
+            Tuple[float, bool]: The percentage of the new file merged, which is 0 until the rows are ready, and True as the merge is still running.
+
+        Notes:
+            If the file could not be parsed in the background it is read here instead, reporting any error as usual.
+        """
+        preload = self.new_file_preload
+
+        if preload is None or not preload.wait(self.time_slice.total_seconds() if self.time_slice is not None else None):
+            return 0, True
+
+        self.new_file_preload = None
+
+        # Read the file here if the preload failed
+        if preload.result is None:
+            self.initialise_new_file()
+            return 0, True
+
+        # Merge the preloaded rows, compiling the mapping against their header
+        self.new_file = PreloadedRows(preload.result.rows)
+        self.new_file_reader = self.new_file
+        self.merge_plan = MergePlan(self.mapping, self.current_file_data.schema, preload.result.header, self.merge_pool())
+
+        # Log that the preloaded rows are being used
+        logging.info('Using the %s rows of %s parsed in the background', len(preload.result.rows), self.new_file_path)
+
+        return 0, True
+
+    def merge_parsed_chunks(self) -> Tuple[float, bool]:
+        """Merges the byte ranges of the new file parsed by the worker processes, in file order.
+
+        Returns:
+            Tuple[float, bool]: The percentage of the new file merged and whether the new file has been fully merged.
+
+        Notes:
+            If a range could not be parsed safely, for example because a stray quote character meant it did not start on a record boundary, the workers are stopped and the rest of the file is merged by the main process from just after the header. Merging rows a second time does not change the result, so any ranges already merged do not need to be undone.
+        """
+        # Start the time slice, each range is merged as a single unit of work
+        self.batch_scheduler.start_slice(constants.MERGE_NEW_FILE_PHASE)
+        changes = self.source_changes[self.source_index] if self.record_changes else None
+        ranges_merged = 0
+
+        # Run for the time slice, or until the phase is complete if there is no time slice
+        while self.parallel_parser is not None and self.batch_scheduler.time_remaining() != 0:
+            # Wait for the next range for the rest of the time slice
             try:
-                # Get the next row
-                new_row = next(self.new_file_reader)
-
-                # Ensure the Mode S ID is in uppercase
-                new_row[self.mapping[constants.MODE_S_ADDRESS_KEY]] = new_row[self.mapping[constants.MODE_S_ADDRESS_KEY]].upper()
-
-                # Get the Mode S ID
-                mode_s_id = new_row[self.mapping[constants.MODE_S_ADDRESS_KEY]]
-
-                # Ensure there is actually a value in the Mode S ID
-                if mode_s_id != '':
-                    # Check if the row is in the current file
-                    if mode_s_id not in self.current_file_data:
-                        # Add the row to the current file
-                        self.current_file_data[mode_s_id] = {}
-
-                    # Merge the new row into the current row
-                    for irca_field, new_field in self.mapping.items():
-                        # Check if the field is in the current row
-                        if irca_field not in self.current_file_data[mode_s_id]:
-                            # Add the field to the current row
-                            self.current_file_data[mode_s_id][irca_field] = ''
-
-                        # Check if data from the new row should overwrite the data in the current row
-                        if new_field != constants.NO_MAPPING_STRING and new_row[new_field] != '':
-                            # Overwrite the data in the current row
-                            self.current_file_data[mode_s_id][irca_field] = new_row[new_field]
+                result = self.parallel_parser.next_result(self.batch_scheduler.time_remaining())
+
+                if self.step_timer is not None:
+                    self.step_timer.lap('parse')
 
             except StopIteration:
-                # Close the new file
-                self.new_file.close()
+                # Every range has been merged, stop the workers and close the new file
+                self.parallel_parser.shutdown()
+                self.parallel_parser = None
+
+                if self.new_file is not None:
+                    self.new_file.close()
 
-                # Break out of the loop
                 break
 
-            except csv.Error:
-                # Ignore this line, log the error
-                logging.error(f'Error reading line {self.lines_read} of {self.new_file_path}')
+            # The range is not ready yet
+            if result is None:
+                break
 
-            # Increment the number of lines read
-            self.lines_read += 1
+            # Fall back to merging the file in the main process if the range could not be parsed safely
+            if result.error:
+                logging.warning('Parsing %s in the main process, %s', self.new_file_path, result.error)
 
-        # Return the number of lines read
-        return (self.lines_read / self.new_file_lines) * 100, True if self.new_file is None else not self.new_file.closed
+                self.parallel_parser.shutdown()
+                self.parallel_parser = None
+
+                # The rows are counted again as they are merged
+                self.lines_read = 0
+
+                # End the time slice
+                self.batch_scheduler.end_slice(ranges_merged)
+
+                return 0, True
+
+            # Report the rows the worker skipped as their Mode S ID is not a valid address
+            for mode_s_id in result.invalid_mode_s_ids:
+                self.report_invalid_mode_s_id(self.new_file_path, mode_s_id)
+
+            # Merge the update for each address in the order they first appeared
+            for icao24, values in result.updates.items():
+                # Get the row from the current file, adding it if it is not there
+                current_row = self.current_file_data.get_row(icao24)
+
+                if current_row is None:
+                    current_row = self.current_file_data.add_empty_row(icao24)
+
+                    if changes is not None:
+                        changes.add_row(icao24)
+
+                elif changes is not None and icao24 not in changes.previous_rows:
+                    # Keep the values from before the new file changes them
+                    changes.previous_rows[icao24] = tuple(current_row)
+
+                # Merge the values into the current row, recording the fields they changed
+                changed = self.merge_plan.apply_values(values, current_row)
+
+                if changed and changes is not None:
+                    changes.change_fields(icao24, changed)
+
+            if self.step_timer is not None:
+                self.step_timer.lap('mapping')
+
+            # Increment the number of lines read and ranges merged
+            self.lines_read += result.rows_read
+            ranges_merged += 1
+
+        # End the time slice
+        self.batch_scheduler.end_slice(ranges_merged)
+
+        # Return the percentage merged
+        if self.parallel_parser is None:
+            return 100, False
+
+        return self.parallel_parser.percentage_parsed(), True
 
     def initialise_output_file(self) -> None:
         """Initialises the output file."""
         # Open the output file
-        self.output_file = open(self.output_file_path, 'w', encoding='utf-8', newline='')
+        self.output_file = open_output_file(self.output_file_path)
 
-        # Create the writer
-        self.output_file_writer = csv.DictWriter(self.output_file, fieldnames=constants.ORIGINAL_IRCA_MAPPING.keys(), delimiter=constants.DEFAULT_OUTPUT_FILE_DELIMITER)
+        # Create the writer, the schema is checked once here rather than for every row
+        self.output_file_writer = RowWriter(self.output_file, self.current_file_data.fieldnames, constants.DEFAULT_OUTPUT_FILE_DELIMITER)
 
         # Write the header
-        self.output_file_writer.writeheader()
+        self.output_file_writer.write_row(self.current_file_data.fieldnames)
+
+        # Index the rows as they are written if the output is sorted
+        self.output_index = self.output_file_writer.index = self.create_output_index()
 
-        # Create a list of the rows to write
-        self.current_file_data_iterator = iter(list(self.current_file_data.values()))
+        # Iterate over the rows in the store, the rows are already in the order of the header and the store is not changed while it is written
+        self.current_file_data_iterator = iter(self.sorted_rows() if self.sorted_output else self.current_file_data.rows)
 
         # Initialise the number of lines written to 0
         self.lines_written = 0
@@ -226,12 +725,12 @@ class Converter:
                 The output file is written to the output file path. The output file is written in the same format as the original IRCA file.
                 
                 The output file is written in chunks of 100 milliseconds. This is to ensure the UI is responsive.
+
+                The rows are formatted and written in batches sized by the batch scheduler, the time is only checked between batches.
                 
                 If the output file is closed, the function returns.
                 
-                If the output file is not closed, the next line is read from the output file. If the end of the file is reached, the output file is closed and the function returns.
-                
-                If the end of the file is not reached, the line is written to the output file and the number of lines written is incremented.
+                If the output file is not closed, the next batch of rows is written to the output file. If there are no rows left, the output file is closed and the function returns.
                 
                 The percentage of the output file written is calculated by dividing the number of lines written by the total number of lines in the output file.
                 
@@ -239,38 +738,146 @@ class Converter:
                 
                 The output file is fully written if the output file is closed.
                 """
-        # Get the start time
-        start_time = datetime.now()
+        # Start the time slice
+        self.batch_scheduler.start_slice(constants.WRITE_OUTPUT_FILE_PHASE)
 
-        # Run for 100 milliseconds
-        while datetime.now() - start_time < timedelta(milliseconds=constants.UI_REFRESH_TIME):
+        # Run batches of rows for the time slice, or until the phase is complete if there is no time slice
+        while self.batch_scheduler.next_batch():
             # Check if the file is closed
             if self.output_file is None or self.output_file.closed:
                 break
 
-            # Try to read the next line
-            try:
-                # Get the next row
-                row = next(self.current_file_data_iterator)
+            # Write the next batch of rows
+            rows_written = self.output_file_writer.write_batch(self.current_file_data_iterator, self.batch_scheduler.batch_size)
 
-            except StopIteration:
-                # Close the output file
+            if self.step_timer is not None:
+                self.step_timer.lap('serialise')
+
+            # Close the output file once every row has been written
+            if rows_written == 0:
                 self.output_file.close()
+                self.save_output_index()
 
                 # Break out of the loop
                 break
 
-            # Write the line to the output file
-            self.output_file_writer.writerow(row)
-
             # Increment the number of lines written
-            self.lines_written += 1
+            self.lines_written += rows_written
+
+        # End the time slice
+        self.batch_scheduler.end_slice()
 
         # Return the number of lines written
-        return (self.lines_written / len(self.current_file_data)) * 100, True if self.output_file is None else not self.output_file.closed
+        return self.percentage(self.lines_written, len(self.current_file_data)), True if self.output_file is None else not self.output_file.closed
+
+    def merged_rows(self) -> Optional[RowStore]:
+        """Gets the merged rows once the conversion has finished, so they can be used after the output file has been written.
+
+        Returns:
+            Optional[RowStore]: The rows, None if the engine does not hold every merged row in memory.
+        """
+        return self.current_file_data
+
+    def sorted_rows(self) -> List[List[str]]:
+        """Sorts the rows in the store by ICAO address.
+
+        Returns:
+            List[List[str]]: The rows, in address order.
+        """
+        rows = self.current_file_data.rows
+
+        # The store keeps its addresses sorted, alongside the position of the row with each address
+        return [rows[position] for position in self.current_file_data.positions_in_key_order()]
+
+    def create_output_index(self) -> Optional[OutputIndexWriter]:
+        """Creates the index of the output file once its header has been written, removing the index of an earlier output file.
+
+        Returns:
+            Optional[OutputIndexWriter]: The index, None if the output is not sorted or is written to standard output.
+        """
+        if is_standard_stream(self.output_file_path):
+            return None
+
+        index_path = output_index_path(self.output_file_path)
+
+        # An index left by an earlier sorted conversion no longer matches the output file
+        if not self.sorted_output:
+            index_path.unlink(missing_ok=True)
+            return None
+
+        # Count the bytes of the header, the offset of the first row
+        header = self.output_file_writer.format_row(self.current_file_data.fieldnames) + RowFormatter.line_terminator
+
+        return OutputIndexWriter(index_path, len(header.encode('utf-8')), self.current_file_data.schema[constants.MODE_S_ADDRESS_KEY])
+
+    def save_output_index(self) -> None:
+        """Saves the index of a sorted output file, once every row has been written."""
+        if self.output_index is not None:
+            self.output_index.save()
+            self.output_index = None
+
+    def run_phase_slice(self, phase_name: str) -> bool:
+        """Runs the generator of the current phase for one time slice.
+
+        Args:
+            phase_name (str): The name of the phase, used to keep the throughput measurements of each phase separate.
+
+        Returns:
+            bool: True if the phase is still running, False if it has completed.
+        """
+        # Start the time slice
+        self.batch_scheduler.start_slice(phase_name)
+
+        # Run batches of steps for the time slice, or until the phase is complete if there is no time slice
+        while self.batch_scheduler.next_batch():
+            for _ in range(self.batch_scheduler.batch_size):
+                if self.phase is None or next(self.phase, True):
+                    # The phase has completed
+                    self.phase = None
+                    self.batch_scheduler.end_slice()
+
+                    return False
+
+        # The phase is still running
+        self.batch_scheduler.end_slice()
+
+        return True
+
+    @staticmethod
+    def percentage(done: int, total: int) -> float:
+        """Calculates the percentage of a phase that has been completed.
+
+        Args:
+            done (int): The number of rows processed so far.
+            total (int): The total number of rows, 0 if this is not known.
+
+        Returns:
+            float: The percentage completed, 0 if the total is not known.
+        """
+        # Avoid dividing by zero if the total is not known
+        if total == 0:
+            return 0
+
+        # Return the percentage
+        return (done / total) * 100
 
     def conversion_cancelled(self) -> None:
         """Called when the user cancels the conversion."""
+        # Stop the current phase
+        if self.phase is not None:
+            self.phase.close()
+            self.phase = None
+
+        # Stop any preloads which have not finished
+        for preload in (self.current_file_preload, self.new_file_preload):
+            if preload is not None:
+                preload.cancel()
+
+        # Stop the worker processes
+        if self.parallel_parser is not None:
+            self.parallel_parser.shutdown()
+            self.parallel_parser = None
+
         # Close the current file
         if self.current_file is not None and not self.current_file.closed:
             self.current_file.close()
@@ -0,0 +1,92 @@
+"""Creates a Converter using the selected conversion engine.
+
+Each engine is a subclass of Converter which implements the same phase methods, so the worker, the instrumentation and the command line can run any of them. The in memory Converter is the reference engine, the output of every other engine is byte-identical to its output.
+
+Functions:
+    default_engine: Chooses the fastest engine whose dependencies are installed.
+    create_converter: Creates a Converter using the selected conversion engine.
+"""
+
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Dict, Optional, Type
+
+from .columnar import ColumnarConverter, columnar_available
+from .converter import Converter
+from .external_sort import ExternalSortConverter
+from .incremental import IncrementalConverter
+from .pipeline import PipelinedConverter
+
+import constants
+
+# The Converter class implementing each engine
+ENGINES: Dict[str, Type[Converter]] = {
+    constants.IN_MEMORY_ENGINE: Converter,
+    constants.EXTERNAL_SORT_ENGINE: ExternalSortConverter,
+    constants.INCREMENTAL_ENGINE: IncrementalConverter,
+    constants.PIPELINED_ENGINE: PipelinedConverter,
+    constants.COLUMNAR_ENGINE: ColumnarConverter,
+}
+
+def default_engine() -> str:
+    """Chooses the fastest engine whose dependencies are installed.
+
+    Returns:
+        str: The columnar engine if pyarrow and NumPy are installed, otherwise the in memory engine.
+    """
+    return constants.COLUMNAR_ENGINE if columnar_available() else constants.IN_MEMORY_ENGINE
+
+def create_converter(
+        current_file_path: Path,
+        current_file_delimiter: str,
+        new_file_path: Path,
+        new_file_delimiter: str,
+        output_file_path: Path,
+        mapping: Dict[str, str],
+        time_slice: Optional[timedelta] = timedelta(milliseconds=constants.UI_REFRESH_TIME),
+        engine: str = constants.IN_MEMORY_ENGINE,
+        **engine_options: Any
+    ) -> Converter:
+    """Creates a Converter using the selected conversion engine.
+
+    Args:
+        current_file_path (Path): The existing aircraft database file.
+        current_file_delimiter (str): The delimiter of the existing database file.
+        new_file_path (Path): The file containing new data to be merged into the existing database.
+        new_file_delimiter (str): The delimiter of the new file.
+        output_file_path (Path): The file to output the merged data to.
+        mapping (Dict[str, str]): The mapping of the new file's fieldnames to the current file's fieldnames.
+        time_slice (Optional[timedelta]): How long each call to a read, merge or write method runs for, None runs each phase to completion in a single call.
+        engine (str): The name of the engine, one of the keys of ENGINES.
+        **engine_options (Any): Options specific to the engine, such as the memory_budget of the external sort engine or the queue_size of the pipelined engine, the additional_sources to merge after the new file, or sorted_output to sort the output by ICAO address and index it.
+
+    Returns:
+        Converter: The converter.
+
+    Raises:
+        ValueError: If the engine is not known, there are additional sources and the engine can only merge a single new file, or a sorted output is requested from an engine which cannot sort it.
+        ImportError: If the engine needs optional modules which are not installed.
+    """
+    # Check the engine is known
+    if engine not in ENGINES:
+        raise ValueError(f'Unknown conversion engine {engine}, expected one of {", ".join(ENGINES)}')
+
+    # Check the engine can merge several new files if it has been given more than one
+    if engine_options.get('additional_sources') and not ENGINES[engine].multiple_sources:
+        raise ValueError(f'The {engine} engine can only merge a single new file')
+
+    # Check the engine can sort the output if it has been asked to
+    if engine_options.get('sorted_output') and not ENGINES[engine].sortable_output:
+        raise ValueError(f'The {engine} engine cannot sort the output file')
+
+    # Create the converter
+    return ENGINES[engine](
+        current_file_path,
+        current_file_delimiter,
+        new_file_path,
+        new_file_delimiter,
+        output_file_path,
+        mapping,
+        time_slice,
+        **engine_options
+    )
@@ -0,0 +1,433 @@
+"""Merges files larger than the available memory using an external sort merge-join.
+
+Classes:
+    SpillFile: A sorted run of records written to a temporary file.
+    ExternalSortConverter: A Converter which works within a fixed memory budget.
+"""
+
+import csv
+import heapq
+import itertools
+import logging
+import marshal
+import struct
+import sys
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .converter import Converter
+from .icao import parse_icao24
+from .row_store import RowStore, StringPool
+from .streams import open_output_file
+from .writer import RowWriter
+
+import constants
+
+# The length of each chunk of a spill file
+CHUNK_LENGTH = struct.Struct('<I')
+
+class SpillFile:
+    """A sorted run of records written to a temporary file.
+
+    Records are written in chunks with marshal, so only one chunk of each run is held in memory while the runs are merged.
+
+    Args:
+        path (Path): The path of the file.
+        records (Iterable[Tuple[Any, ...]]): The sorted records to write.
+    """
+    def __init__(self, path: Path, records: Iterable[Tuple[Any, ...]]) -> None:
+        # Store the path and initialise the number of records
+        self.path = path
+        self.records = 0
+
+        # Write the records in chunks, each preceded by its length
+        records = iter(records)
+
+        with path.open('wb') as spill_file:
+            while True:
+                chunk = list(itertools.islice(records, constants.SPILL_FILE_CHUNK_ROWS))
+
+                if not chunk:
+                    break
+
+                data = marshal.dumps(chunk)
+                spill_file.write(CHUNK_LENGTH.pack(len(data)))
+                spill_file.write(data)
+
+                self.records += len(chunk)
+
+    def __iter__(self) -> Iterator[Tuple[Any, ...]]:
+        """Reads the records back in order, one chunk at a time."""
+        with self.path.open('rb') as spill_file:
+            while True:
+                # Read the length of the next chunk
+                length = spill_file.read(CHUNK_LENGTH.size)
+
+                if not length:
+                    return
+
+                # Read the chunk
+                yield from marshal.loads(spill_file.read(CHUNK_LENGTH.unpack(length)[0]))
+
+class ExternalSortConverter(Converter):
+    """A Converter which works within a fixed memory budget.
+
+    Rather than loading the current file into memory, both input files are sorted by the ICAO address held in their Mode S IDs into spill files, which are then merge-joined. The merged rows are tagged with the position they would have had in the in memory Converter and sorted back into that order as they are written, so the output is identical.
+
+    Args:
+        current_file_path (Path): The existing aircraft database file.
+        current_file_delimiter (str): The delimiter of the existing database file.
+        new_file_path (Path): The file containing new data to be merged into the existing database.
+        new_file_delimiter (str): The delimiter of the new file.
+        output_file_path (Path): The file to output the merged data to.
+        mapping (Dict[str, str]): The mapping of the new file's fieldnames to the current file's fieldnames.
+        time_slice (Optional[timedelta]): How long each call to a read, merge or write method runs for, None runs each phase to completion in a single call.
+        memory_budget (int): The approximate number of bytes of rows to hold in memory before spilling them to disk.
+        spill_directory (Optional[Path]): The directory to create the spill files in, None to use the system temporary directory.
+        sorted_output (bool): True to write the rows sorted by ICAO address, with an index next to the output file.
+    """
+    # The spill files and the state file are built around a single new file
+    multiple_sources = False
+
+    def __init__(
+            self,
+            current_file_path: Path,
+            current_file_delimiter: str,
+            new_file_path: Path,
+            new_file_delimiter: str,
+            output_file_path: Path,
+            mapping: Dict[str, str],
+            time_slice: Optional[timedelta] = timedelta(milliseconds=constants.UI_REFRESH_TIME),
+            memory_budget: int = constants.DEFAULT_MEMORY_BUDGET,
+            spill_directory: Optional[Path] = None,
+            sorted_output: bool = False
+        ) -> None:
+        # The current file is never cached, loading the cached rows would hold the whole file in memory
+        super().__init__(current_file_path, current_file_delimiter, new_file_path, new_file_delimiter, output_file_path, mapping, time_slice, cache_directory=None, sorted_output=sorted_output)
+
+        # Store the memory budget
+        self.memory_budget = memory_budget
+
+        # Create the directory for the spill files
+        self.spill_directory = tempfile.TemporaryDirectory(prefix='aircraft-db-converter-', dir=spill_directory)
+        self.spill_file_count = 0
+
+        # Initialise the sorted runs of each stage
+        self.current_runs: List[SpillFile] = []
+        self.new_runs: List[SpillFile] = []
+        self.output_runs: List[SpillFile] = []
+
+        # Initialise the buffer of records waiting to be spilled
+        self.buffer: List[Tuple[Any, ...]] = []
+        self.buffer_size = 0
+
+    def buffer_record(self, record: Tuple[Any, ...], runs: List[SpillFile]) -> None:
+        """Adds a record to the buffer, spilling the buffer to disk when the memory budget is used.
+
+        Args:
+            record (Tuple[Any, ...]): The record to add, the last item must be the row.
+            runs (List[SpillFile]): The runs to add the spill file to.
+        """
+        # Add the record and estimate the memory it uses
+        self.buffer.append(record)
+        self.buffer_size += sys.getsizeof(record[-1]) + sum(map(len, record[-1])) + len(record[-1]) * constants.STRING_OVERHEAD
+
+        # Spill the buffer once it exceeds the memory budget
+        if self.buffer_size >= self.memory_budget:
+            self.spill_buffer(runs)
+
+    def spill_buffer(self, runs: List[SpillFile]) -> None:
+        """Sorts the buffer and writes it to a new spill file.
+
+        Args:
+            runs (List[SpillFile]): The runs to add the spill file to.
+        """
+        # Ignore an empty buffer
+        if not self.buffer:
+            return
+
+        # Sort the buffer
+        self.buffer.sort(key=lambda record: record[:-1])
+
+        # Write the buffer to a new spill file
+        runs.append(self.create_spill_file(self.buffer))
+
+        # Log the spill
+        logging.debug('Spilled %s records to %s', len(self.buffer), runs[-1].path)
+
+        # Empty the buffer
+        self.buffer = []
+        self.buffer_size = 0
+
+        # Merge the runs into one once there are too many to keep open at the same time
+        if len(runs) >= constants.MAX_SPILL_FILE_RUNS:
+            merged_run = self.create_spill_file(heapq.merge(*runs))
+
+            for run in runs:
+                run.path.unlink()
+
+            runs[:] = [merged_run]
+
+    def create_spill_file(self, records: Iterable[Tuple[Any, ...]]) -> SpillFile:
+        """Writes sorted records to a new spill file.
+
+        Args:
+            records (Iterable[Tuple[Any, ...]]): The sorted records to write.
+
+        Returns:
+            SpillFile: The spill file.
+        """
+        self.spill_file_count += 1
+
+        return SpillFile(Path(self.spill_directory.name, f'{self.spill_file_count}.run'), records)
+
+    def read_current_file(self) -> Tuple[float, bool]:
+        """Sorts the current file by ICAO address into spill files.
+
+        Returns:
+            Tuple[float, bool]: The percentage of the current file read and whether the current file is still being read.
+        """
+        # Start the phase
+        if self.phase is None and self.current_file is not None and not self.current_file.closed:
+            self.phase = self.sort_current_file()
+
+        # Run the phase for one time slice
+        still_reading = self.run_phase_slice(constants.READ_CURRENT_FILE_PHASE)
+
+        # Return the progress
+        return self.current_file.percentage_read() if self.current_file is not None else 0, still_reading
+
+    def sort_current_file(self) -> Iterator[None]:
+        """Reads the current file into sorted spill files, yielding after each row."""
+        # Get the column of the Mode S ID in the row store
+        key_column = self.current_file_data.schema[constants.MODE_S_ADDRESS_KEY]
+
+        while True:
+            try:
+                # Get the next row
+                row = next(self.current_file_reader)
+
+            except StopIteration:
+                break
+
+            except csv.Error:
+                # Log the error and ignore this line
+                logging.error('Error reading line %s of %s', self.lines_read, self.current_file_path)
+
+            else:
+                # Skip blank lines
+                if not row:
+                    continue
+
+                # Buffer the row under its address, tagged with its line so later rows with the same address replace earlier ones
+                values = self.select_current_file_values(row)
+                icao24 = parse_icao24(values[key_column])
+
+                if icao24 is not None:
+                    self.buffer_record((icao24, self.lines_read, values), self.current_runs)
+                else:
+                    self.report_invalid_mode_s_id(self.current_file_path, values[key_column])
+
+            # Increment the number of lines read
+            self.lines_read += 1
+
+            yield
+
+        # Spill the remaining rows and close the current file
+        self.spill_buffer(self.current_runs)
+        self.current_file.close()
+
+    def merge_new_file(self) -> Tuple[float, bool]:
+        """Sorts the new file by ICAO address into spill files, then merge-joins it with the current file.
+
+        Returns:
+            Tuple[float, bool]: The percentage of the merge completed and whether the merge is still running.
+
+        Notes:
+            Reading the new file is reported as the first half of the merge and joining the files as the second half.
+        """
+        # Start the phase
+        if self.phase is None and self.new_file is not None and not self.new_file.closed:
+            self.records_joined = 0
+            self.phase = self.sort_and_join_new_file()
+
+        # Run the phase for one time slice
+        still_merging = self.run_phase_slice(constants.MERGE_NEW_FILE_PHASE)
+
+        # Calculate the progress
+        if self.new_file is None:
+            percentage = 0.0
+        elif not self.new_file.closed:
+            percentage = self.new_file.percentage_read() / 2
+        else:
+            records = sum(run.records for run in self.current_runs + self.new_runs)
+            percentage = 50 + self.percentage(self.records_joined, records) / 2
+
+        # Return the progress
+        return percentage, still_merging
+
+    def sort_and_join_new_file(self) -> Iterator[None]:
+        """Reads the new file into sorted spill files and then joins them with the current file, yielding after each row."""
+        while True:
+            try:
+                # Get the next row
+                new_row = next(self.new_file_reader)
+
+            except StopIteration:
+                break
+
+            except csv.Error:
+                # Ignore this line, log the error
+                logging.error(f'Error reading line {self.lines_read} of {self.new_file_path}')
+
+            else:
+                # Skip blank lines
+                if not new_row:
+                    continue
+
+                # Get the address
+                icao24 = self.merge_plan.key(new_row)
+
+                # Buffer the row, keeping only the mapped columns
+                if icao24 is not None:
+                    self.buffer_record((icao24, self.lines_read, new_row[:self.merge_plan.width]), self.new_runs)
+                else:
+                    self.report_invalid_mode_s_id(self.new_file_path, self.merge_plan.mode_s_id(new_row))
+
+            # Increment the number of lines read
+            self.lines_read += 1
+
+            yield
+
+        # Spill the remaining rows and close the new file
+        self.spill_buffer(self.new_runs)
+        self.new_file.close()
+
+        # Join the sorted files
+        yield from self.join_sorted_files()
+
+    def join_sorted_files(self) -> Iterator[None]:
+        """Merge-joins the sorted current and new files, spilling the merged rows tagged with their output position."""
+        # Merge the runs of each file into a single sorted stream
+        current_records = heapq.merge(*self.current_runs)
+        new_records = heapq.merge(*self.new_runs)
+
+        current_record = next(current_records, None)
+        new_record = next(new_records, None)
+
+        while current_record is not None or new_record is not None:
+            # Find the smallest address still to be joined
+            if new_record is None or (current_record is not None and current_record[0] <= new_record[0]):
+                icao24 = current_record[0]
+            else:
+                icao24 = new_record[0]
+
+            # The last current row with this address wins, but it keeps the position of the first one
+            position: Optional[Tuple[int, int]] = None
+            values: Optional[List[str]] = None
+
+            while current_record is not None and current_record[0] == icao24:
+                if position is None:
+                    position = (0, current_record[1])
+
+                values = current_record[2]
+                current_record = next(current_records, None)
+                self.records_joined += 1
+
+            # Merge each new row with this address in file order, rows not in the current file are added after all the current rows
+            while new_record is not None and new_record[0] == icao24:
+                if values is None:
+                    position = (1, new_record[1])
+                    values = [''] * len(self.current_file_data.fieldnames)
+
+                self.merge_plan.apply(new_record[2], values)
+                new_record = next(new_records, None)
+                self.records_joined += 1
+
+            # Buffer the merged row, tagged with its address if the output is sorted, otherwise with its position
+            self.buffer_record((icao24 if self.sorted_output else position, values), self.output_runs)
+
+            yield
+
+        # Spill the remaining rows
+        self.spill_buffer(self.output_runs)
+
+    def initialise_output_file(self) -> None:
+        """Initialises the output file."""
+        # Open the output file
+        self.output_file = open_output_file(self.output_file_path)
+
+        # Create the writer
+        self.output_file_writer = RowWriter(self.output_file, self.current_file_data.fieldnames, constants.DEFAULT_OUTPUT_FILE_DELIMITER)
+
+        # Write the header
+        self.output_file_writer.write_row(self.current_file_data.fieldnames)
+
+        # Index the rows as they are written if the output is sorted
+        self.output_index = self.output_file_writer.index = self.create_output_index()
+
+        # Initialise the number of lines written to 0
+        self.lines_written = 0
+
+    def write_output_file(self) -> Tuple[float, bool]:
+        """Writes the merged rows to the output file in their original order.
+
+        Returns:
+            Tuple[float, bool]: The percentage of the output file written and whether the output file is still being written.
+        """
+        # Start the phase
+        if self.phase is None and self.output_file is not None and not self.output_file.closed:
+            self.phase = self.write_sorted_rows()
+
+        # Run the phase for one time slice
+        still_writing = self.run_phase_slice(constants.WRITE_OUTPUT_FILE_PHASE)
+
+        # Return the progress
+        return self.percentage(self.lines_written, sum(run.records for run in self.output_runs)), still_writing
+
+    def write_sorted_rows(self) -> Iterator[None]:
+        """Writes the merged rows in position order, yielding after each batch."""
+        # Merge the runs back into position order
+        rows = (values for _, values in heapq.merge(*self.output_runs))
+
+        # Write the rows in batches
+        rows_written = self.output_file_writer.write_batch(rows)
+
+        while rows_written:
+            # Increment the number of lines written
+            self.lines_written += rows_written
+
+            yield
+
+            rows_written = self.output_file_writer.write_batch(rows)
+
+        # Close the output file, save its index and remove the spill files
+        self.output_file.close()
+        self.save_output_index()
+        self.spill_directory.cleanup()
+
+    def merge_pool(self) -> Optional[StringPool]:
+        """Gets the pool the merge plan shares the merged values through.
+
+        Returns:
+            Optional[StringPool]: None, the merged rows are written to the spill files rather than kept, so pooling their values would only grow the pool.
+        """
+        return None
+
+    def merged_rows(self) -> Optional[RowStore]:
+        """Gets the merged rows once the conversion has finished.
+
+        Returns:
+            Optional[RowStore]: None, the merged rows are only ever held in the spill files.
+        """
+        return None
+
+    def conversion_cancelled(self) -> None:
+        """Called when the user cancels the conversion."""
+        # Stop the current phase and close the files
+        super().conversion_cancelled()
+
+        # Remove the spill files
+        self.spill_directory.cleanup()
@@ -0,0 +1,42 @@
+"""Normalises Mode S IDs to the 24-bit ICAO addresses they hold.
+
+The Mode S ID of a row is the aircraft's 24-bit ICAO address written as hexadecimal. The files merged do not all write it the same way, some use lower case, some drop the leading zeros and some pad it with spaces, so the same aircraft can appear as 'a1b2c3', 'A1B2C3' and ' A1B2C3'. Converting the ID to an integer gives a single value for each aircraft which sorts in address order.
+
+Every engine keys its rows by the address, so rows of the current and new files with the same address are merged however their Mode S IDs are written, and rows whose Mode S ID is not a valid address are reported and skipped.
+
+Functions:
+    parse_icao24: Converts a Mode S ID to its 24-bit ICAO address.
+    format_icao24: Formats a 24-bit ICAO address as a Mode S ID.
+"""
+
+from typing import Optional
+
+import constants
+
+def parse_icao24(mode_s_id: str) -> Optional[int]:
+    """Converts a Mode S ID to its 24-bit ICAO address.
+
+    Args:
+        mode_s_id (str): The Mode S ID, up to six hexadecimal digits in either case, surrounding whitespace is ignored.
+
+    Returns:
+        Optional[int]: The address, None if the Mode S ID is not a valid address.
+    """
+    # Remove the padding, int also accepts signs, underscores and a 0x prefix, which are not valid in a Mode S ID
+    digits = mode_s_id.strip()
+
+    if not 0 < len(digits) <= constants.ICAO24_DIGITS or not constants.HEXADECIMAL_DIGITS.issuperset(digits):
+        return None
+
+    return int(digits, 16)
+
+def format_icao24(icao24: int) -> str:
+    """Formats a 24-bit ICAO address as a Mode S ID.
+
+    Args:
+        icao24 (int): The address.
+
+    Returns:
+        str: The Mode S ID, six uppercase hexadecimal digits.
+    """
+    return format(icao24, constants.ICAO24_FORMAT)
@@ -0,0 +1,647 @@
+"""Applies only the rows of the new file which have changed since the previous conversion.
+
+Classes:
+    IncrementalState: The state saved after a conversion, used to find the changes in the next new file.
+    IncrementalConverter: A Converter which only merges the rows of the new file which have changed.
+"""
+
+import csv
+import hashlib
+import io
+import logging
+import marshal
+import os
+from array import array
+from datetime import timedelta
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Set, Tuple
+
+from .converter import Converter
+from .row_store import RowStore
+from .streams import file_fingerprint, is_standard_stream
+from .writer import RowFormatter
+
+import constants
+
+class IncrementalState:
+    """The state saved after a conversion, used to find the changes in the next new file.
+
+    Args:
+        current_file (Tuple[str, int, int]): The fingerprint of the current file.
+        mapping (Dict[str, str]): The mapping used for the conversion.
+        output_file (Tuple[str, int, int]): The fingerprint of the output file.
+        keys (array): The ICAO address of each row of the output file, in order.
+        offsets (array): The byte offset of each row of the output file.
+        head_count (int): The number of rows of the output file which came from the current file, these are always the first rows.
+        digests (Dict[int, bytes]): A digest of the mapped values of the rows of the new file with each address.
+        bases (Dict[int, List[str]]): The values the current file had in the columns the mapping can change, for each row of the current file which was merged.
+    """
+    def __init__(
+            self,
+            current_file: Tuple[str, int, int],
+            mapping: Dict[str, str],
+            output_file: Tuple[str, int, int],
+            keys: array,
+            offsets: array,
+            head_count: int,
+            digests: Dict[int, bytes],
+            bases: Dict[int, List[str]]
+        ) -> None:
+        self.current_file = current_file
+        self.mapping = mapping
+        self.output_file = output_file
+        self.keys = keys
+        self.offsets = offsets
+        self.head_count = head_count
+        self.digests = digests
+        self.bases = bases
+
+    @classmethod
+    def load(cls, path: Path) -> Optional['IncrementalState']:
+        """Loads the state saved by a previous conversion.
+
+        Args:
+            path (Path): The path of the state file.
+
+        Returns:
+            Optional[IncrementalState]: The state, or None if there is no state file or it cannot be read.
+        """
+        try:
+            with path.open('rb') as state_file:
+                data = marshal.load(state_file)
+
+            # Ignore state files written in a different format
+            if data['version'] != constants.INCREMENTAL_STATE_VERSION:
+                return None
+
+            # Restore the addresses and offsets
+            keys = array('I')
+            keys.frombytes(data['keys'])
+            offsets = array('Q')
+            offsets.frombytes(data['offsets'])
+
+            # Return the state
+            return cls(tuple(data['current_file']), data['mapping'], tuple(data['output_file']), keys, offsets, data['head_count'], data['digests'], data['bases'])
+
+        except (OSError, EOFError, ValueError, TypeError, KeyError) as error:
+            # Log that the state could not be loaded
+            logging.info('No incremental state loaded from %s: %s', path, error)
+
+            return None
+
+    def save(self, path: Path) -> None:
+        """Saves the state for the next conversion.
+
+        Args:
+            path (Path): The path of the state file.
+        """
+        # Write to a temporary file first so a partial state file is never left behind
+        partial_path = path.with_name(path.name + constants.PARTIAL_OUTPUT_SUFFIX)
+
+        with partial_path.open('wb') as state_file:
+            marshal.dump({
+                'version': constants.INCREMENTAL_STATE_VERSION,
+                'current_file': self.current_file,
+                'mapping': self.mapping,
+                'output_file': self.output_file,
+                'keys': self.keys.tobytes(),
+                'offsets': self.offsets.tobytes(),
+                'head_count': self.head_count,
+                'digests': self.digests,
+                'bases': self.bases,
+            }, state_file)
+
+        # Replace the previous state
+        os.replace(partial_path, path)
+
+    def row_range(self, row: int, output_size: int) -> Tuple[int, int]:
+        """Gets the byte range of a row of the output file.
+
+        Args:
+            row (int): The index of the row.
+            output_size (int): The size of the output file in bytes.
+
+        Returns:
+            Tuple[int, int]: The offset of the start of the row and the offset of the end of the row.
+        """
+        return self.offsets[row], self.offsets[row + 1] if row + 1 < len(self.offsets) else output_size
+
+class IncrementalConverter(Converter):
+    """A Converter which only merges the rows of the new file which have changed.
+
+    After each conversion a state file is saved next to the output file. It holds a digest of the new file's rows for each address, the position of each row in the output file, and the values the mapping overwrote in rows of the current file.
+
+    If the next conversion uses the same current file and mapping and writes to the same, unmodified output file, the current file is not read at all. The new file is compared with the saved digests, rows whose digest has not changed are copied from the previous output file as they are, and only the added, changed and removed addresses are merged again. The output is identical to a full conversion.
+
+    Otherwise a full conversion is run and the state is saved for next time.
+
+    Args:
+        current_file_path (Path): The existing aircraft database file.
+        current_file_delimiter (str): The delimiter of the existing database file.
+        new_file_path (Path): The file containing new data to be merged into the existing database.
+        new_file_delimiter (str): The delimiter of the new file.
+        output_file_path (Path): The file to output the merged data to.
+        mapping (Dict[str, str]): The mapping of the new file's fieldnames to the current file's fieldnames.
+        time_slice (Optional[timedelta]): How long each call to a read, merge or write method runs for, None runs each phase to completion in a single call.
+        state_file_path (Optional[Path]): The file to store the state of the conversion in, None to store it next to the output file.
+        cache_directory (Optional[Path]): The directory the parsed rows of current files are cached in, None to always parse the current file.
+    """
+    # The spill files and the state file are built around a single new file
+    multiple_sources = False
+
+    # The rows are written in the order of the previous output file, so unchanged runs of it can be copied
+    sortable_output = False
+
+    def __init__(
+            self,
+            current_file_path: Path,
+            current_file_delimiter: str,
+            new_file_path: Path,
+            new_file_delimiter: str,
+            output_file_path: Path,
+            mapping: Dict[str, str],
+            time_slice: Optional[timedelta] = timedelta(milliseconds=constants.UI_REFRESH_TIME),
+            state_file_path: Optional[Path] = None,
+            cache_directory: Optional[Path] = constants.CACHE_PATH
+        ) -> None:
+        super().__init__(current_file_path, current_file_delimiter, new_file_path, new_file_delimiter, output_file_path, mapping, time_slice, cache_directory=cache_directory)
+
+        # Store the path of the state file
+        self.state_file_path = state_file_path or output_file_path.with_name(output_file_path.name + constants.INCREMENTAL_STATE_SUFFIX)
+
+        # Store the path the output file is written to before it replaces the previous output file
+        self.partial_output_file_path = output_file_path.with_name(output_file_path.name + constants.PARTIAL_OUTPUT_SUFFIX)
+
+        # Initialise the state of the previous conversion, this is only set if it can be used
+        self.previous: Optional[IncrementalState] = None
+
+        # Initialise the number of rows which came from the current file
+        self.head_count = 0
+
+        # Initialise the digests of the new file's rows and the values they overwrote in the current file
+        self.digests: Dict[int, bytes] = {}
+        self.bases: Dict[int, List[str]] = {}
+
+        # Initialise the rows of the new file for each changed address, and the rows merged again because of them
+        self.pending: Dict[int, List[List[str]]] = {}
+        self.changed_rows: Dict[int, List[str]] = {}
+
+        # Create the formatter used to format rows
+        self.row_formatter = RowFormatter(self.current_file_data.fieldnames, constants.DEFAULT_OUTPUT_FILE_DELIMITER)
+
+        # Initialise the binary output file
+        self.binary_output_file: Optional[BinaryIO] = None
+
+    def initialise_current_file(self) -> None:
+        """Loads the state of the previous conversion, falling back to reading the current file if it cannot be used."""
+        # The state can only be stored for files
+        if is_standard_stream(self.current_file_path) or is_standard_stream(self.output_file_path):
+            raise ValueError('Incremental conversions cannot read the current file from standard input or write the output file to standard output')
+
+        # Load the state of the previous conversion
+        previous = IncrementalState.load(self.state_file_path)
+
+        # Check the state describes this conversion and the output file has not changed since it was written
+        if (previous is not None
+                and previous.current_file == file_fingerprint(self.current_file_path)
+                and previous.mapping == self.mapping
+                and self.output_file_path.is_file()
+                and previous.output_file == file_fingerprint(self.output_file_path)):
+            # Use the previous conversion
+            self.previous = previous
+            self.head_count = previous.head_count
+
+            # Log that the conversion is incremental
+            logging.info('Applying the changes in %s to %s', self.new_file_path, self.output_file_path)
+
+            # Initialise the number of lines read to 0
+            self.lines_read = 0
+        else:
+            # Log that a full conversion is needed
+            logging.info('No usable incremental state for %s, running a full conversion', self.output_file_path)
+
+            # Read the current file
+            super().initialise_current_file()
+
+    def read_current_file(self) -> Tuple[float, bool]:
+        """Reads the current file, unless the previous conversion is being used.
+
+        Returns:
+            Tuple[float, bool]: The percentage of the current file read and whether the current file has been fully read.
+        """
+        # The current file is not needed for an incremental conversion
+        if self.previous is not None:
+            return 100, False
+
+        # Read the current file
+        percentage_read, still_reading = super().read_current_file()
+
+        # Every row in the store so far came from the current file
+        self.head_count = len(self.current_file_data)
+
+        # Return the progress
+        return percentage_read, still_reading
+
+    def merge_new_file(self) -> Tuple[float, bool]:
+        """Merges the new file, or the changes in it if the previous conversion is being used.
+
+        Returns:
+            Tuple[float, bool]: The percentage of the new file read and whether the new file is still being merged.
+        """
+        # Start the phase
+        if self.phase is None and self.new_file is not None and not self.new_file.closed:
+            self.phase = self.find_changes() if self.previous is not None else self.merge_and_fingerprint()
+
+        # Run the phase for one time slice
+        still_merging = self.run_phase_slice(constants.MERGE_NEW_FILE_PHASE)
+
+        # Return the progress
+        return self.new_file.percentage_read() if self.new_file is not None and still_merging else 100, still_merging
+
+    def read_new_rows(self) -> Iterator[Tuple[Optional[int], Optional[List[str]]]]:
+        """Reads the rows of the new file.
+
+        Returns:
+            Iterator[Tuple[Optional[int], Optional[List[str]]]]: The ICAO address and the row for each line read, both are None for lines which are skipped.
+        """
+        while True:
+            try:
+                # Get the next row
+                new_row = next(self.new_file_reader)
+
+            except StopIteration:
+                # Close the new file
+                self.new_file.close()
+
+                return
+
+            except csv.Error:
+                # Ignore this line, log the error
+                logging.error(f'Error reading line {self.lines_read} of {self.new_file_path}')
+
+                new_row = []
+
+            # Increment the number of lines read
+            self.lines_read += 1
+
+            # Skip blank lines
+            if not new_row:
+                yield None, None
+                continue
+
+            # Get the address
+            icao24 = self.merge_plan.key(new_row)
+
+            if icao24 is None:
+                self.report_invalid_mode_s_id(self.new_file_path, self.merge_plan.mode_s_id(new_row))
+
+            # Return the row, keeping only the mapped columns
+            yield (icao24, new_row[:self.merge_plan.width]) if icao24 is not None else (None, None)
+
+    def update_digest(self, icao24: int, new_row: List[str]) -> bytes:
+        """Adds a row of the new file to the digest of its address.
+
+        Args:
+            icao24 (int): The address of the row.
+            new_row (List[str]): The row of the new file.
+
+        Returns:
+            bytes: The updated digest.
+        """
+        digest = hashlib.blake2b(self.digests.get(icao24, b'') + marshal.dumps(self.merge_plan.mapped_values(new_row)), digest_size=constants.ROW_DIGEST_SIZE).digest()
+
+        self.digests[icao24] = digest
+
+        return digest
+
+    def merge_and_fingerprint(self) -> Iterator[None]:
+        """Merges every row of the new file, recording the digests and overwritten values, yielding after each row."""
+        # Get the columns the mapping can change
+        target_columns = self.merge_plan.target_columns
+
+        for icao24, new_row in self.read_new_rows():
+            if new_row is not None:
+                # Add the row to the digest of its address
+                self.update_digest(icao24, new_row)
+
+                # Find the row in the current file
+                position = self.current_file_data.position(icao24)
+
+                if position is None:
+                    # Add the row to the current file
+                    current_row = self.current_file_data.add_empty_row(icao24)
+
+                else:
+                    current_row = self.current_file_data.rows[position]
+
+                    if position < self.head_count and icao24 not in self.bases:
+                        # Record the values the current file had before they are overwritten
+                        self.bases[icao24] = [current_row[column] for column in target_columns]
+
+                # Merge the new row into the current row
+                self.merge_plan.apply(new_row, current_row)
+
+            yield
+
+    def find_changes(self) -> Iterator[None]:
+        """Compares the new file with the previous conversion and merges the changed rows, yielding after each row."""
+        # Get the digests of the previous new file
+        previous_digests = self.previous.digests
+
+        # Track the addresses whose rows were discarded before a later duplicate row changed their digest
+        discarded: Set[int] = set()
+        reread: Set[int] = set()
+
+        for icao24, new_row in self.read_new_rows():
+            if new_row is not None:
+                # Keep the rows for the address while its digest differs from the previous conversion
+                if self.update_digest(icao24, new_row) == previous_digests.get(icao24):
+                    self.pending.pop(icao24, None)
+                    discarded.add(icao24)
+                elif icao24 in discarded:
+                    reread.add(icao24)
+                else:
+                    self.pending.setdefault(icao24, []).append(new_row)
+
+            yield
+
+        # Read the rows of the addresses which changed after some of their rows were discarded
+        reread = {icao24 for icao24 in reread if self.digests[icao24] != previous_digests.get(icao24)}
+
+        if reread:
+            yield from self.reread_new_rows(reread)
+
+        # Discard the rows of addresses whose digest changed and then changed back
+        for icao24 in [icao24 for icao24 in self.pending if self.digests[icao24] == previous_digests.get(icao24)]:
+            del self.pending[icao24]
+
+        # Log the number of changes
+        removed = previous_digests.keys() - self.digests.keys()
+        logging.info('%s addresses added or changed, %s removed', len(self.pending), len(removed))
+
+        # Merge the changes into the rows of the previous output file
+        self.merge_changes(removed)
+
+    def reread_new_rows(self, addresses: Set[int]) -> Iterator[None]:
+        """Reads every row of the new file for the given addresses again, yielding after each row.
+
+        Args:
+            addresses (Set[int]): The addresses to read.
+        """
+        # Log the second pass
+        logging.info('Reading %s again for %s addresses with repeated rows', self.new_file_path, len(addresses))
+
+        # Reopen the new file
+        self.initialise_new_file()
+
+        # Discard the rows already kept for these addresses
+        for icao24 in addresses:
+            self.pending[icao24] = []
+
+        # Collect the rows
+        for icao24, new_row in self.read_new_rows():
+            if new_row is not None and icao24 in addresses:
+                self.pending[icao24].append(new_row)
+
+            yield
+
+    def merge_changes(self, removed: Set[int]) -> None:
+        """Merges the changed rows of the new file into the rows of the previous output file.
+
+        Args:
+            removed (Set[int]): The addresses which are no longer in the new file.
+        """
+        previous = self.previous
+        target_columns = self.merge_plan.target_columns
+        fieldnames = self.current_file_data.fieldnames
+        output_size = self.output_file_path.stat().st_size
+
+        # Find the row of each address in the previous output file
+        previous_rows = {icao24: row for row, icao24 in enumerate(previous.keys)}
+
+        with self.output_file_path.open('rb') as previous_output_file:
+            def read_previous_row(icao24: int) -> List[str]:
+                """Reads the row of an address from the previous output file."""
+                start, end = previous.row_range(previous_rows[icao24], output_size)
+                previous_output_file.seek(start)
+
+                return next(csv.reader(io.StringIO(previous_output_file.read(end - start).decode('utf-8'), newline=''), delimiter=constants.DEFAULT_OUTPUT_FILE_DELIMITER))
+
+            # Keep the overwritten values of the unchanged rows from the current file
+            self.bases = {icao24: base for icao24, base in previous.bases.items() if icao24 not in self.pending and icao24 not in removed}
+
+            # Merge the changed rows
+            for icao24, new_rows in self.pending.items():
+                row = previous_rows.get(icao24)
+
+                if row is not None and row < previous.head_count:
+                    # Restore the values the current file had before the previous new file was merged
+                    values = read_previous_row(icao24)
+                    base = previous.bases.get(icao24) or [values[column] for column in target_columns]
+
+                    for column, value in zip(target_columns, base):
+                        values[column] = value
+
+                    # Record the values the current file had
+                    self.bases[icao24] = base
+                else:
+                    # The address is not in the current file, so the row is built from the new file alone
+                    values = [''] * len(fieldnames)
+
+                # Merge the rows from the new file
+                for new_row in new_rows:
+                    self.merge_plan.apply(new_row, values)
+
+                self.changed_rows[icao24] = values
+
+            # Restore the rows from the current file which are no longer in the new file, rows not in the current file are dropped
+            for icao24 in removed:
+                row = previous_rows[icao24]
+
+                if row < previous.head_count:
+                    values = read_previous_row(icao24)
+
+                    for column, value in zip(target_columns, previous.bases[icao24]):
+                        values[column] = value
+
+                    self.changed_rows[icao24] = values
+
+        # The rows are no longer needed
+        self.pending = {}
+
+    def initialise_output_file(self) -> None:
+        """Initialises the output file."""
+        # Write to a partial file, which replaces the output file once it is complete
+        self.binary_output_file = self.partial_output_file_path.open('wb')
+        self.output_file = self.binary_output_file
+
+        # Write the header
+        self.binary_output_file.write(self.format_row(self.current_file_data.fieldnames))
+
+        # Initialise the keys and offsets of the rows written
+        self.output_keys = array('I')
+        self.output_offsets = array('Q')
+
+        # Initialise the number of lines written to 0
+        self.lines_written = 0
+
+    def format_row(self, values: List[str]) -> bytes:
+        """Formats a row of the output file.
+
+        Args:
+            values (List[str]): The values of the row.
+
+        Returns:
+            bytes: The encoded line, including the line terminator.
+        """
+        return (self.row_formatter.format_row(values) + self.row_formatter.line_terminator).encode('utf-8')
+
+    def write_output_file(self) -> Tuple[float, bool]:
+        """Writes the output file.
+
+        Returns:
+            Tuple[float, bool]: The percentage of the output file written and whether the output file is still being written.
+        """
+        # Start the phase
+        if self.phase is None and self.output_file is not None and not self.output_file.closed:
+            if self.previous is not None:
+                order = self.output_order()
+                self.rows_to_write = len(order)
+                self.phase = self.write_changes(order)
+            else:
+                self.rows_to_write = len(self.current_file_data)
+                self.phase = self.write_all_rows()
+
+        # Run the phase for one time slice
+        still_writing = self.run_phase_slice(constants.WRITE_OUTPUT_FILE_PHASE)
+
+        # Return the progress
+        return self.percentage(self.lines_written, self.rows_to_write) if still_writing else 100, still_writing
+
+    def write_line(self, icao24: int, line: bytes) -> None:
+        """Writes a line to the output file, recording its position.
+
+        Args:
+            icao24 (int): The address of the row.
+            line (bytes): The encoded line.
+        """
+        self.output_keys.append(icao24)
+        self.output_offsets.append(self.binary_output_file.tell())
+        self.binary_output_file.write(line)
+        self.lines_written += 1
+
+    def write_all_rows(self) -> Iterator[None]:
+        """Writes every row in the row store, yielding after each row."""
+        for icao24, values in zip(self.current_file_data, self.current_file_data.rows):
+            self.write_line(icao24, self.format_row(values))
+
+            yield
+
+        # Finish the output file
+        self.finish_output_file()
+
+    def output_order(self) -> List[int]:
+        """Gets the order of the rows of an incremental conversion.
+
+        Returns:
+            List[int]: The addresses of the rows from the current file in the same order as before, followed by the addresses only in the new file in the order they first appear.
+        """
+        previous = self.previous
+        head = set(previous.keys[:previous.head_count])
+
+        return previous.keys[:previous.head_count].tolist() + [icao24 for icao24 in self.digests if icao24 not in head]
+
+    def write_changes(self, order: List[int]) -> Iterator[None]:
+        """Writes the output file by copying the unchanged rows of the previous output file, yielding after each row.
+
+        Args:
+            order (List[int]): The addresses of the rows to write, in order.
+        """
+        previous = self.previous
+        previous_rows = {icao24: row for row, icao24 in enumerate(previous.keys)}
+        output_size = self.output_file_path.stat().st_size
+
+        with self.output_file_path.open('rb') as previous_output_file:
+            # Track the range of consecutive unchanged rows waiting to be copied
+            copy_start = copy_end = 0
+
+            def copy_rows() -> None:
+                """Copies the waiting range of unchanged rows."""
+                if copy_start == copy_end:
+                    return
+
+                # Read the rows
+                start = previous.offsets[copy_start]
+                end = previous.row_range(copy_end - 1, output_size)[1]
+                previous_output_file.seek(start)
+                data = previous_output_file.read(end - start)
+
+                # Record the position of each row in the new output file
+                shift = self.binary_output_file.tell() - start
+                self.output_keys.extend(previous.keys[copy_start:copy_end])
+                self.output_offsets.extend(offset + shift for offset in previous.offsets[copy_start:copy_end])
+
+                # Write the rows
+                self.binary_output_file.write(data)
+                self.lines_written += copy_end - copy_start
+
+            for icao24 in order:
+                row = previous_rows.get(icao24)
+
+                if icao24 in self.changed_rows or row is None:
+                    # Copy the waiting unchanged rows and write the changed row
+                    copy_rows()
+                    copy_start = copy_end = 0
+
+                    self.write_line(icao24, self.format_row(self.changed_rows[icao24]))
+
+                elif row == copy_end and previous.offsets[row] - previous.offsets[copy_start] < constants.COPY_CHUNK_SIZE:
+                    # Extend the range of unchanged rows
+                    copy_end += 1
+                else:
+                    # Start a new range of unchanged rows
+                    copy_rows()
+                    copy_start, copy_end = row, row + 1
+
+                yield
+
+            # Copy the remaining unchanged rows
+            copy_rows()
+
+        # Finish the output file
+        self.finish_output_file()
+
+    def finish_output_file(self) -> None:
+        """Replaces the output file with the new output file and saves the state for the next conversion."""
+        # Close the new output file and replace the previous one
+        self.binary_output_file.close()
+        os.replace(self.partial_output_file_path, self.output_file_path)
+
+        # Save the state
+        IncrementalState(
+            file_fingerprint(self.current_file_path),
+            self.mapping,
+            file_fingerprint(self.output_file_path),
+            self.output_keys,
+            self.output_offsets,
+            self.head_count,
+            self.digests,
+            self.bases
+        ).save(self.state_file_path)
+
+    def merged_rows(self) -> Optional[RowStore]:
+        """Gets the merged rows once the conversion has finished.
+
+        Returns:
+            Optional[RowStore]: The rows of a full conversion, None after an incremental conversion, which only holds the rows it merged again.
+        """
+        return self.current_file_data if self.previous is None else None
+
+    def conversion_cancelled(self) -> None:
+        """Called when the user cancels the conversion."""
+        # Stop the current phase and close the files
+        super().conversion_cancelled()
+
+        # Remove the partial output file
+        if self.partial_output_file_path.is_file():
+            self.partial_output_file_path.unlink()
@@ -0,0 +1,301 @@
+"""Records where the time and memory of a conversion go, when asked to.
+
+Instrumentation is opt-in. Nothing is recorded unless an Instrumentation is attached to a Converter, and the only cost left in the per-row loops when it is not attached is a check that the converter's step timer is None.
+
+Once attached it records:
+
+- a span for each phase, for opening its files and for each time slice
+- the time spent in each sub-step of the per-row loops (parsing, mapping, inserting into the row store and serialising), totalled over each time slice
+- optionally, a cProfile profile of the conversion
+- optionally, the memory allocated by the conversion using tracemalloc
+
+The spans can be saved as Chrome trace event JSON, which can be opened in chrome://tracing or https://ui.perfetto.dev, and the profile can be saved as a pstats file.
+
+Classes:
+    StepTimer: Totals the time spent in each sub-step of a per-row loop.
+    Instrumentation: Records spans, sub-step timings, a profile and memory use for a Converter.
+"""
+
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, TYPE_CHECKING
+
+import constants
+
+if TYPE_CHECKING:
+    from .converter import Converter
+
+class StepTimer:
+    """Totals the time spent in each sub-step of a per-row loop.
+
+    The loop calls lap after each sub-step, the time since the previous lap is added to that sub-step's total.
+    """
+    def __init__(self) -> None:
+        # Initialise the time of the last lap and the totals
+        self.last = time.perf_counter()
+        self.totals: Dict[str, float] = {}
+
+    def start(self) -> None:
+        """Starts timing, so time spent outside the loop is not counted."""
+        self.last = time.perf_counter()
+
+    def lap(self, step: str) -> None:
+        """Adds the time since the last lap to a sub-step.
+
+        Args:
+            step (str): The name of the sub-step which has just finished.
+        """
+        now = time.perf_counter()
+        self.totals[step] = self.totals.get(step, 0) + now - self.last
+        self.last = now
+
+    def reset(self) -> Dict[str, float]:
+        """Returns the totals and starts new ones.
+
+        Returns:
+            Dict[str, float]: The seconds spent in each sub-step since the last reset.
+        """
+        totals = self.totals
+        self.totals = {}
+
+        return totals
+
+class Instrumentation:
+    """Records spans, sub-step timings, a profile and memory use for a Converter.
+
+    Args:
+        profile (bool): True to profile the conversion with cProfile.
+        trace_memory (bool): True to trace the memory allocated by the conversion with tracemalloc.
+    """
+    def __init__(self, profile: bool = False, trace_memory: bool = False) -> None:
+        # Create the profiler
+        self.profiler = cProfile.Profile() if profile else None
+
+        # Store whether memory is traced
+        self.trace_memory = trace_memory
+        self.memory_snapshot: Optional[tracemalloc.Snapshot] = None
+
+        # Create the step timer shared with the converter
+        self.step_timer = StepTimer()
+
+        # Initialise the trace events and the time they are measured from
+        self.events: List[Dict[str, Any]] = []
+        self.origin = time.perf_counter()
+
+        # Initialise the start of the current phase
+        self.phase_start = self.origin
+
+        # Initialise the totals of each sub-step over the whole conversion
+        self.step_totals: Dict[str, float] = {}
+
+        # Initialise whether this instrumentation started tracing memory
+        self.started_tracing = False
+
+    def attach(self, converter: 'Converter') -> None:
+        """Attaches the instrumentation to a converter.
+
+        The phase methods of the converter are wrapped so every call is recorded, the converter is otherwise unchanged.
+
+        Args:
+            converter (Converter): The converter to instrument.
+        """
+        # Give the converter the step timer, the per-row loops only time their sub-steps when it is set
+        converter.step_timer = self.step_timer
+
+        # Start tracing memory
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+
+        # Wrap the phase methods
+        for phase, initialise, step in (
+            (constants.READ_CURRENT_FILE_PHASE, 'initialise_current_file', 'read_current_file'),
+            (constants.MERGE_NEW_FILE_PHASE, 'initialise_new_file', 'merge_new_file'),
+            (constants.WRITE_OUTPUT_FILE_PHASE, 'initialise_output_file', 'write_output_file'),
+        ):
+            setattr(converter, initialise, self.wrap_initialise(phase, getattr(converter, initialise)))
+            setattr(converter, step, self.wrap_step(phase, getattr(converter, step)))
+
+    def wrap_initialise(self, phase: str, initialise: Callable[[], None]) -> Callable[[], None]:
+        """Wraps the method which opens the files of a phase.
+
+        Args:
+            phase (str): The name of the phase.
+            initialise (Callable[[], None]): The method.
+
+        Returns:
+            Callable[[], None]: The wrapped method.
+        """
+        @functools.wraps(initialise)
+        def wrapper() -> None:
+            # Record the start of the phase
+            self.phase_start = time.perf_counter()
+
+            self.call(f'{phase}: open', 'open', initialise)
+
+        return wrapper
+
+    def wrap_step(self, phase: str, step: Callable[[], Any]) -> Callable[[], Any]:
+        """Wraps the method which runs a time slice of a phase.
+
+        Args:
+            phase (str): The name of the phase.
+            step (Callable[[], Any]): The method.
+
+        Returns:
+            Callable[[], Any]: The wrapped method.
+        """
+        @functools.wraps(step)
+        def wrapper() -> Any:
+            # Run the time slice, timing its sub-steps
+            self.step_timer.start()
+            start = time.perf_counter()
+            percentage, still_running = self.call(f'{phase}: slice', 'slice', step)
+
+            # Record the time spent in each sub-step as a counter, so the breakdown can be seen over time
+            totals = self.step_timer.reset()
+
+            if totals:
+                self.add_event({'name': f'{phase}: sub-steps', 'ph': 'C', 'ts': self.microseconds(start), 'args': {step_name: round(seconds * 1000, 3) for step_name, seconds in totals.items()}})
+
+                for step_name, seconds in totals.items():
+                    self.step_totals[step_name] = self.step_totals.get(step_name, 0) + seconds
+
+            # Record the whole phase once it has finished
+            if not still_running:
+                self.add_span(phase, 'phase', self.phase_start, time.perf_counter(), {})
+
+                # Take a snapshot of the allocations while the rows are still in memory
+                if self.trace_memory and tracemalloc.is_tracing() and phase == constants.WRITE_OUTPUT_FILE_PHASE:
+                    self.memory_snapshot = tracemalloc.take_snapshot()
+
+            return percentage, still_running
+
+        return wrapper
+
+    def call(self, name: str, category: str, function: Callable[[], Any]) -> Any:
+        """Calls a function, recording it as a span and profiling it if profiling is enabled.
+
+        Args:
+            name (str): The name of the span.
+            category (str): The category of the span.
+            function (Callable[[], Any]): The function.
+
+        Returns:
+            Any: The return value of the function.
+        """
+        # Profile the call, the profiler is enabled for each call as it only profiles the thread it is enabled on
+        if self.profiler is not None:
+            self.profiler.enable()
+
+        start = time.perf_counter()
+
+        try:
+            return function()
+        finally:
+            end = time.perf_counter()
+
+            if self.profiler is not None:
+                self.profiler.disable()
+
+            # Record the current and peak memory traced if memory is being traced
+            args = {}
+
+            if self.trace_memory and tracemalloc.is_tracing():
+                current, peak = tracemalloc.get_traced_memory()
+                args = {'traced_bytes': current, 'peak_traced_bytes': peak}
+
+            self.add_span(name, category, start, end, args)
+
+    def microseconds(self, timestamp: float) -> float:
+        """Converts a time from perf_counter to microseconds since the instrumentation was created.
+
+        Args:
+            timestamp (float): The time from perf_counter.
+
+        Returns:
+            float: The number of microseconds since the instrumentation was created.
+        """
+        return (timestamp - self.origin) * 1000000
+
+    def add_span(self, name: str, category: str, start: float, end: float, args: Dict[str, Any]) -> None:
+        """Records a span.
+
+        Args:
+            name (str): The name of the span.
+            category (str): The category of the span.
+            start (float): The start time from perf_counter.
+            end (float): The end time from perf_counter.
+            args (Dict[str, Any]): Extra values shown with the span.
+        """
+        self.add_event({'name': name, 'cat': category, 'ph': 'X', 'ts': self.microseconds(start), 'dur': (end - start) * 1000000, 'args': args})
+
+    def add_event(self, event: Dict[str, Any]) -> None:
+        """Records a trace event, adding the process and thread.
+
+        Args:
+            event (Dict[str, Any]): The event.
+        """
+        event.update(pid=os.getpid(), tid=threading.get_ident())
+        self.events.append(event)
+
+    def summary(self) -> Dict[str, float]:
+        """Totals the time spent in each sub-step over the whole conversion.
+
+        Returns:
+            Dict[str, float]: The number of seconds spent in each sub-step.
+        """
+        return dict(self.step_totals)
+
+    def save_trace(self, path: Path) -> None:
+        """Saves the spans as Chrome trace event JSON.
+
+        Args:
+            path (Path): The path of the file to write.
+        """
+        with path.open('w', encoding='utf-8') as trace_file:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, trace_file)
+
+    def save_profile(self, path: Path) -> None:
+        """Saves the profile as a pstats file.
+
+        Args:
+            path (Path): The path of the file to write.
+
+        Raises:
+            ValueError: If profiling was not enabled.
+        """
+        if self.profiler is None:
+            raise ValueError('Profiling was not enabled')
+
+        self.profiler.dump_stats(str(path))
+
+    def save_memory_report(self, path: Path, limit: int = constants.MEMORY_REPORT_LINES) -> None:
+        """Saves the lines of code which allocated the most memory still in use at the end of the conversion.
+
+        Args:
+            path (Path): The path of the file to write.
+            limit (int): The number of lines of code to include.
+
+        Raises:
+            ValueError: If memory was not traced or the conversion has not finished.
+        """
+        if self.memory_snapshot is None:
+            raise ValueError('Memory was not traced or the conversion has not finished')
+
+        # Write the lines of code allocating the most memory
+        with path.open('w', encoding='utf-8') as report_file:
+            for statistic in self.memory_snapshot.statistics('lineno')[:limit]:
+                report_file.write(f'{statistic}\n')
+
+    def stop(self) -> None:
+        """Stops tracing memory, if this instrumentation started it."""
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
@@ -0,0 +1,279 @@
+"""Looks up aircraft in a merged database without parsing the output file for each lookup.
+
+A service enriching messages with aircraft details makes millions of lookups, each one parsing the output file again would be far too slow. A lookup is built once, either from the rows a conversion has just merged or from an output file, and then answers point and batch lookups from its indexes.
+
+There are two kinds of lookup:
+
+- AircraftLookup holds every row in memory, using the index of the row store by ICAO address and an index by registration built once, so a lookup is a binary search of the sorted addresses of the row store or a single dictionary access
+- IndexedFileLookup reads the rows of a sorted output file from disk using its index, keeping the most recently used rows in memory, so a service can start without loading the whole database
+
+Both return each row as a read only dictionary view of its values, and take addresses as an integer or as a Mode S ID in any case.
+
+Classes:
+    AircraftLookup: Looks up aircraft in rows held in memory, by ICAO address or registration.
+    IndexedFileLookup: Looks up aircraft in a sorted output file using its index, caching the most recently used rows.
+
+Functions:
+    normalise_registration: Normalises a registration so lookups ignore case and surrounding whitespace.
+"""
+
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+from .converter import Converter
+from .icao import parse_icao24
+from .output_index import OutputIndex
+from .row_store import RowStore, RowView
+from .streams import is_standard_stream
+
+import constants
+
+def normalise_registration(registration: str) -> str:
+    """Normalises a registration so lookups ignore case and surrounding whitespace.
+
+    Args:
+        registration (str): The registration.
+
+    Returns:
+        str: The registration in upper case, without surrounding whitespace.
+    """
+    return registration.strip().upper()
+
+class AircraftLookup:
+    """Looks up aircraft in rows held in memory, by ICAO address or registration.
+
+    The row store is already keyed by address, so only the index by registration is built when the lookup is created. The index of the row store is compacted into its sorted entries, as a lookup is usually kept for much longer than the conversion which built it. A registration can match several rows as the same registration is used in more than one country.
+
+    Args:
+        rows (RowStore): The rows, which must not be changed while the lookup is used.
+
+    Raises:
+        KeyError: If the rows do not have the registration field.
+    """
+    def __init__(self, rows: RowStore) -> None:
+        self.rows = rows
+        self.schema = rows.schema
+
+        # No more rows are added, so index them with the sorted entries which take less memory than a dictionary
+        rows.compact()
+
+        registration_column = rows.schema[constants.REGISTRATION_KEY]
+
+        # Index the values of each row by its registration, rows without one cannot be looked up by registration
+        self.registrations: Dict[str, List[List[str]]] = {}
+
+        for values in rows.rows:
+            registration = normalise_registration(values[registration_column])
+
+            if registration:
+                self.registrations.setdefault(registration, []).append(values)
+
+    @classmethod
+    def from_converter(cls, converter: Converter) -> 'AircraftLookup':
+        """Creates a lookup from the result of a conversion.
+
+        Args:
+            converter (Converter): The converter, once its output file has been written.
+
+        Returns:
+            AircraftLookup: The lookup, using the merged rows in memory if the engine kept them, otherwise the rows of the output file.
+
+        Raises:
+            ValueError: If the engine did not keep the merged rows and the output file was written to standard output.
+        """
+        rows = converter.merged_rows()
+
+        if rows is not None:
+            return cls(rows)
+
+        # Read the rows back from the output file
+        if is_standard_stream(converter.output_file_path):
+            raise ValueError(f'The {type(converter).__name__} does not keep the merged rows in memory and the output file was written to standard output')
+
+        return cls.from_file(converter.output_file_path)
+
+    @classmethod
+    def from_file(cls, path: Path, delimiter: str = constants.DEFAULT_OUTPUT_FILE_DELIMITER, cache_directory: Optional[Path] = constants.CACHE_PATH) -> 'AircraftLookup':
+        """Creates a lookup from an output file, or any file with the IRCA fields.
+
+        Args:
+            path (Path): The path of the file.
+            delimiter (str): The delimiter of the file.
+            cache_directory (Optional[Path]): The directory the parsed rows of files are cached in, None to always parse the file.
+
+        Returns:
+            AircraftLookup: The lookup.
+
+        Raises:
+            OSError: If the file cannot be read.
+        """
+        # Read the file as the current file of a conversion, loading its rows from the cache if the file has been parsed before, the new and output files are never opened
+        converter = Converter(path, delimiter, path, delimiter, path, {}, time_slice=None, cache_directory=cache_directory)
+
+        try:
+            converter.initialise_current_file()
+
+            while converter.read_current_file()[1]:
+                pass
+
+        finally:
+            converter.conversion_cancelled()
+
+        return cls(converter.current_file_data)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, address: object) -> bool:
+        return isinstance(address, (int, str)) and self.get(address) is not None
+
+    def get(self, address: Union[int, str]) -> Optional[RowView]:
+        """Looks up an aircraft by its ICAO address.
+
+        Args:
+            address (Union[int, str]): The address, as an integer or a Mode S ID.
+
+        Returns:
+            Optional[RowView]: The row, None if there is no row with the address.
+        """
+        key = parse_icao24(address) if isinstance(address, str) else address
+
+        # A Mode S ID which is not a valid address has no row
+        if key is None:
+            return None
+
+        values = self.rows.get_row(key)
+
+        return RowView(self.schema, values) if values is not None else None
+
+    def get_many(self, addresses: Iterable[Union[int, str]]) -> List[Optional[RowView]]:
+        """Looks up many aircraft by their ICAO address in a single call.
+
+        Args:
+            addresses (Iterable[Union[int, str]]): The addresses, as integers or Mode S IDs.
+
+        Returns:
+            List[Optional[RowView]]: The row for each address, in the same order, None for the addresses without a row.
+        """
+        get_row = self.rows.get_row
+        schema = self.schema
+        rows: List[Optional[RowView]] = []
+
+        for address in addresses:
+            key = parse_icao24(address) if isinstance(address, str) else address
+            values = get_row(key) if key is not None else None
+            rows.append(RowView(schema, values) if values is not None else None)
+
+        return rows
+
+    def get_by_registration(self, registration: str) -> List[RowView]:
+        """Looks up aircraft by their registration.
+
+        Args:
+            registration (str): The registration, in any case.
+
+        Returns:
+            List[RowView]: The rows with the registration, in the order of the rows, empty if there are none.
+        """
+        return [RowView(self.schema, values) for values in self.registrations.get(normalise_registration(registration), ())]
+
+    def get_many_by_registration(self, registrations: Iterable[str]) -> List[List[RowView]]:
+        """Looks up aircraft by many registrations in a single call.
+
+        Args:
+            registrations (Iterable[str]): The registrations, in any case.
+
+        Returns:
+            List[List[RowView]]: The rows for each registration, in the same order, empty for the registrations without a row.
+        """
+        return [self.get_by_registration(registration) for registration in registrations]
+
+class IndexedFileLookup:
+    """Looks up aircraft in a sorted output file using its index, caching the most recently used rows.
+
+    Only the index is read when the lookup is created, each row is parsed from the output file the first time it is looked up. Addresses without a row are cached too, as a service is often asked about the same unknown aircraft many times.
+
+    The lookup can be used from several threads.
+
+    Args:
+        output_file_path (Path): The path of the sorted output file, with its index next to it.
+        cache_size (int): The number of addresses whose rows are kept in memory, the least recently used are dropped first.
+
+    Raises:
+        OSError: If the output file or its index cannot be opened.
+        ValueError: If the index cannot be read or the output file has changed since it was indexed.
+    """
+    def __init__(self, output_file_path: Path, cache_size: int = constants.LOOKUP_CACHE_SIZE) -> None:
+        self.index = OutputIndex(output_file_path)
+        self.schema = {field: column for column, field in enumerate(self.index.fieldnames)}
+
+        # Initialise the cached rows, most recently used last, and the lock protecting them
+        self.cache_size = cache_size
+        self.cache: 'OrderedDict[int, Optional[List[str]]]' = OrderedDict()
+        self.cache_lock = threading.Lock()
+
+    def __enter__(self) -> 'IndexedFileLookup':
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, address: object) -> bool:
+        return isinstance(address, (int, str)) and self.get(address) is not None
+
+    def get(self, address: Union[int, str]) -> Optional[RowView]:
+        """Looks up an aircraft by its ICAO address.
+
+        Args:
+            address (Union[int, str]): The address, as an integer or a Mode S ID.
+
+        Returns:
+            Optional[RowView]: The row, None if there is no row with the address.
+        """
+        icao24 = OutputIndex.to_icao24(address)
+
+        if icao24 is None:
+            return None
+
+        # Return the cached row if the address has been looked up recently
+        with self.cache_lock:
+            if icao24 in self.cache:
+                self.cache.move_to_end(icao24)
+                values = self.cache[icao24]
+
+                return RowView(self.schema, values) if values is not None else None
+
+        # Read the row from the output file
+        values = self.index.get(icao24)
+
+        # Cache the row, dropping the least recently used rows
+        with self.cache_lock:
+            self.cache[icao24] = values
+
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+        return RowView(self.schema, values) if values is not None else None
+
+    def get_many(self, addresses: Iterable[Union[int, str]]) -> List[Optional[RowView]]:
+        """Looks up many aircraft by their ICAO address in a single call.
+
+        Args:
+            addresses (Iterable[Union[int, str]]): The addresses, as integers or Mode S IDs.
+
+        Returns:
+            List[Optional[RowView]]: The row for each address, in the same order, None for the addresses without a row.
+        """
+        return [self.get(address) for address in addresses]
+
+    def close(self) -> None:
+        """Closes the output file and its index, and empties the cache."""
+        self.index.close()
+
+        with self.cache_lock:
+            self.cache.clear()
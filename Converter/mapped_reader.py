@@ -0,0 +1,193 @@
+"""Reads delimited files without quoting directly from a memory map.
+
+IRCA files are tab separated and do not quote their values, so csv.reader is not needed to split them. Splitting the lines and values with str.split is several times faster, this reader does that for as much of the file as it can.
+
+The file is decoded a chunk of whole lines at a time. If a chunk contains anything str.split would not handle the same way as csv.reader, such as a quote or a carriage return on its own, the rest of the file from the start of that chunk is read with csv.reader instead, so the rows are always the same as csv.reader would return.
+
+Classes:
+    MappedReader: Reads the rows of an unquoted delimited file from a memory map.
+"""
+
+import csv
+import mmap
+import os
+import stat
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional
+
+from .streams import InputFile, detect_compression, is_standard_stream, paused_gc
+
+import constants
+
+class MappedReader:
+    """Reads the rows of an unquoted delimited file from a memory map.
+
+    The reader is used in place of both the input file and the csv reader, it returns the same rows as csv.reader with the given delimiter and reports progress in the same way as an InputFile.
+
+    Args:
+        binary_file (BinaryIO): The file, opened in binary mode, which is closed with the reader.
+        size (int): The size of the file in bytes.
+        delimiter (str): The delimiter of the file.
+    """
+    def __init__(self, binary_file: BinaryIO, size: int, delimiter: str) -> None:
+        # Store the file and map it into memory
+        self.binary_file = binary_file
+        self.size = size
+        self.map = mmap.mmap(binary_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # Store the delimiter
+        self.delimiter = delimiter
+
+        # Initialise the position of the next chunk and the rows of the current chunk
+        self.position = 0
+        self.rows: Iterator[List[str]] = iter(())
+
+        # Initialise the fallback file and csv reader, which are only created if a chunk cannot be split directly
+        self.fallback_file: Optional[InputFile] = None
+        self.fallback_reader: Optional[Iterator[List[str]]] = None
+
+        # Initialise the percentage read, this is used to ensure the reported progress never goes backwards
+        self.last_percentage = 0.0
+        self.closed = False
+
+    @classmethod
+    def open(cls, path: Path, delimiter: str) -> Optional['MappedReader']:
+        """Opens a file with a mapped reader, if it can be mapped.
+
+        Args:
+            path (Path): The path of the file.
+            delimiter (str): The delimiter of the file.
+
+        Returns:
+            Optional[MappedReader]: The reader, or None if the file is not a regular, uncompressed, non-empty file or the delimiter could be confused with a quote or line ending.
+        """
+        # Standard input cannot be mapped, and a delimiter which is a quote or line ending needs csv.reader
+        if is_standard_stream(path) or len(delimiter) != 1 or delimiter in constants.MAPPED_READER_SPECIAL_CHARACTERS:
+            return None
+
+        binary_file = path.open('rb')
+
+        try:
+            # Only regular, non-empty files can be mapped
+            file_status = os.fstat(binary_file.fileno())
+
+            if not stat.S_ISREG(file_status.st_mode) or file_status.st_size == 0:
+                binary_file.close()
+                return None
+
+            # Compressed files have to be decompressed as they are read
+            if detect_compression(binary_file) is not None: # type: ignore[arg-type]
+                binary_file.close()
+                return None
+
+            return cls(binary_file, file_status.st_size, delimiter)
+
+        except BaseException:
+            binary_file.close()
+            raise
+
+    def __iter__(self) -> 'MappedReader':
+        return self
+
+    def __next__(self) -> List[str]:
+        while True:
+            # Return the next row of the current chunk
+            row = next(self.rows, None)
+
+            if row is not None:
+                return row
+
+            # Once the reader has fallen back to csv.reader every row comes from it, it raises StopIteration at the end of the file
+            if self.fallback_reader is not None:
+                return next(self.fallback_reader)
+
+            # Read the next chunk
+            if self.position >= self.size:
+                raise StopIteration
+
+            self.read_chunk()
+
+    def read_chunk(self) -> None:
+        """Splits the next chunk of whole lines into rows, or falls back to csv.reader if the chunk needs it."""
+        # Find the end of the last whole line in the chunk, the last line of the file does not need a line ending
+        end = min(self.position + constants.MAPPED_READER_CHUNK_SIZE, self.size)
+
+        if end < self.size:
+            end = self.map.rfind(b'\n', self.position, end) + 1
+
+            # Take at least one whole line, however long it is
+            if end == 0:
+                end = self.map.find(b'\n', self.position) + 1 or self.size
+
+        chunk = self.map[self.position:end]
+
+        # Quotes, NUL characters and carriage returns which do not end a line are handled differently by csv.reader
+        carriage_returns = chunk.count(b'\r')
+
+        if b'"' in chunk or b'\0' in chunk or (carriage_returns and carriage_returns != chunk.count(b'\r\n')):
+            self.fall_back()
+            return
+
+        # Decode the whole chunk at once, lines never split a multi-byte character as a newline byte cannot be part of one
+        text = chunk.decode('utf-8')
+
+        # Split the lines, if only some of them end with a carriage return remove them first
+        if not carriage_returns:
+            lines = text.split('\n')
+        elif carriage_returns == chunk.count(b'\n'):
+            lines = text.split('\r\n')
+        else:
+            lines = text.replace('\r\n', '\n').split('\n')
+
+        # Remove the empty string after the final line ending
+        if lines[-1] == '':
+            lines.pop()
+
+        # csv.reader limits the length of a value, fall back so a longer line raises the same error
+        if max(map(len, lines), default=0) > csv.field_size_limit():
+            self.fall_back()
+            return
+
+        # Split the values of each line, an empty line is an empty row as it is for csv.reader
+        delimiter = self.delimiter
+
+        # Pause the garbage collector while the rows are created
+        with paused_gc():
+            self.rows = iter([line.split(delimiter) if line else [] for line in lines])
+
+        # Move to the next chunk
+        self.position = end
+
+    def fall_back(self) -> None:
+        """Reads the rest of the file with csv.reader, starting from the current chunk."""
+        # Open the file again from the start of the chunk
+        binary_file = open(self.binary_file.fileno(), 'rb', closefd=False)
+        binary_file.seek(self.position)
+
+        self.fallback_file = InputFile(binary_file, self.size)
+        self.fallback_reader = csv.reader(self.fallback_file, delimiter=self.delimiter)
+
+    def percentage_read(self) -> float:
+        """Gets the percentage of the file read so far.
+
+        Returns:
+            float: The percentage of the file read.
+        """
+        if self.fallback_file is not None and not self.fallback_file.closed:
+            return self.fallback_file.percentage_read()
+
+        # Calculate the percentage from the end of the chunk being read
+        self.last_percentage = max(self.last_percentage, min(self.position / self.size, 1) * 100)
+
+        return self.last_percentage
+
+    def close(self) -> None:
+        """Closes the file."""
+        if self.fallback_file is not None:
+            # Record the progress of the fallback reader, so it is still reported once it has closed
+            self.last_percentage = self.fallback_file.percentage_read()
+            self.fallback_file.close()
+
+        self.map.close()
+        self.binary_file.close()
+        self.closed = True
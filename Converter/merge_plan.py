@@ -0,0 +1,186 @@
+"""Compiles the mapping into the operations needed to merge a row of the new file.
+
+Classes:
+    MergePlan: The mapping compiled against the header of the new file.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from .icao import parse_icao24
+
+import constants
+
+if TYPE_CHECKING:
+    from .row_store import StringPool
+
+class MergePlan:
+    """The mapping compiled against the header of the new file.
+
+    Most IRCA fields are not mapped, and several IRCA fields are often mapped to the same field in the new file, so the plan only holds each mapped column of the new file once along with the IRCA columns its value is copied to.
+
+    Args:
+        mapping (Dict[str, str]): The mapping of the IRCA fieldnames to the new file's fieldnames.
+        schema (Dict[str, int]): The mapping of the IRCA fieldnames to their columns in the row store.
+        header (List[str]): The fieldnames of the new file, in column order.
+        pool (Optional[StringPool]): The pool of repeated values of the row store, the values merged into its pooled columns are replaced by the pooled values, None to store them as they are.
+
+    Raises:
+        ValueError: If the Mode S field is not mapped or a mapped field is not in the new file.
+    """
+    def __init__(self, mapping: Dict[str, str], schema: Dict[str, int], header: List[str], pool: Optional['StringPool'] = None) -> None:
+        # Find the column of each field in the new file, if a fieldname is repeated the last column is used
+        header_columns = {field: column for column, field in enumerate(header)}
+
+        # Check the Mode S field is mapped
+        key_field = mapping.get(constants.MODE_S_ADDRESS_KEY, constants.NO_MAPPING_STRING)
+
+        if key_field == constants.NO_MAPPING_STRING:
+            raise ValueError(f'{constants.MODE_S_ADDRESS_KEY} field must be mapped')
+
+        # Check every mapped field is in the new file
+        missing_fields = sorted({field for field in mapping.values() if field != constants.NO_MAPPING_STRING and field not in header_columns})
+
+        if missing_fields:
+            raise ValueError(f'The new file does not contain the mapped fields {", ".join(missing_fields)}')
+
+        # Group the IRCA columns by the column of the new file they are copied from, skipping unmapped fields
+        targets: Dict[int, List[int]] = {}
+
+        for irca_field, new_field in mapping.items():
+            if new_field != constants.NO_MAPPING_STRING and irca_field in schema:
+                targets.setdefault(header_columns[new_field], []).append(schema[irca_field])
+
+        # Store the column holding the Mode S ID
+        self.key_column = header_columns[key_field]
+
+        # Store each mapped column along with the IRCA columns it is copied to
+        self.columns: List[Tuple[int, Tuple[int, ...]]] = [(column, tuple(irca_columns)) for column, irca_columns in targets.items()]
+
+        # Store the IRCA columns the plan can change
+        self.target_columns = sorted({irca_column for irca_columns in targets.values() for irca_column in irca_columns})
+
+        # Store the number of columns a row needs for every mapped column to be present
+        self.width = max([self.key_column] + list(targets)) + 1
+
+        # Store the pool of repeated values
+        self.pool = pool
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # The pool belongs to the row store of this process, so it is not sent to the processes parsing the new file
+        return dict(self.__dict__, pool=None)
+
+    def mode_s_id(self, new_row: List[str]) -> str:
+        """Gets the Mode S ID of a row of the new file, as it is written in the file.
+
+        Args:
+            new_row (List[str]): The row of the new file.
+
+        Returns:
+            str: The Mode S ID, empty if the row does not have one.
+        """
+        # Short rows have no Mode S ID
+        return new_row[self.key_column] if self.key_column < len(new_row) else ''
+
+    def key(self, new_row: List[str]) -> Optional[int]:
+        """Gets the ICAO address of a row of the new file.
+
+        The row is updated so its Mode S ID is merged without padding and in uppercase.
+
+        Args:
+            new_row (List[str]): The row of the new file.
+
+        Returns:
+            Optional[int]: The address, None if the row does not have a Mode S ID or it is not a valid address.
+        """
+        mode_s_id = self.mode_s_id(new_row)
+        icao24 = parse_icao24(mode_s_id)
+
+        # Ensure the Mode S ID is in uppercase
+        if icao24 is not None:
+            new_row[self.key_column] = mode_s_id.strip().upper()
+
+        # Return the address
+        return icao24
+
+    def mapped_values(self, new_row: List[str]) -> Tuple[str, ...]:
+        """Gets the values of the mapped columns of a row of the new file.
+
+        Args:
+            new_row (List[str]): The row of the new file.
+
+        Returns:
+            Tuple[str, ...]: The value of each mapped column in plan order, empty for columns missing from short rows.
+        """
+        return tuple(new_row[column] if column < len(new_row) else '' for column, _ in self.columns)
+
+    def apply(self, new_row: List[str], current_row: List[str]) -> int:
+        """Merges a row of the new file into a row of the row store.
+
+        Values from the new file overwrite the values in the current row unless they are empty.
+
+        Args:
+            new_row (List[str]): The row of the new file.
+            current_row (List[str]): The row of the row store, which is updated in place.
+
+        Returns:
+            int: The bit mask of the IRCA columns whose value changed, bit n is set if column n changed.
+        """
+        # Short rows have no value for the missing fields
+        if len(new_row) < self.width:
+            return self.apply_short_row(new_row, current_row)
+
+        changed = 0
+
+        # Copy each non-empty value to its IRCA columns, recording the columns whose value changes
+        for column, irca_columns in self.columns:
+            value = new_row[column]
+
+            if value:
+                for irca_column in irca_columns:
+                    if current_row[irca_column] != value:
+                        current_row[irca_column] = value
+                        changed |= 1 << irca_column
+
+        # Share the changed values which are repeated across rows
+        if changed and self.pool is not None:
+            self.pool.pool_changed_values(current_row, changed)
+
+        return changed
+
+    def apply_values(self, values: Tuple[str, ...], current_row: List[str]) -> int:
+        """Merges the mapped values of a row of the new file into a row of the row store.
+
+        Args:
+            values (Tuple[str, ...]): The values of the mapped columns in plan order, as returned by mapped_values.
+            current_row (List[str]): The row of the row store, which is updated in place.
+
+        Returns:
+            int: The bit mask of the IRCA columns whose value changed.
+        """
+        changed = 0
+
+        # Copy each non-empty value to its IRCA columns
+        for (_, irca_columns), value in zip(self.columns, values):
+            if value:
+                for irca_column in irca_columns:
+                    if current_row[irca_column] != value:
+                        current_row[irca_column] = value
+                        changed |= 1 << irca_column
+
+        # Share the changed values which are repeated across rows
+        if changed and self.pool is not None:
+            self.pool.pool_changed_values(current_row, changed)
+
+        return changed
+
+    def apply_short_row(self, new_row: List[str], current_row: List[str]) -> int:
+        """Merges a row of the new file which is missing some of the mapped columns.
+
+        Args:
+            new_row (List[str]): The row of the new file.
+            current_row (List[str]): The row of the row store, which is updated in place.
+
+        Returns:
+            int: The bit mask of the IRCA columns whose value changed.
+        """
+        return self.apply_values(self.mapped_values(new_row), current_row)
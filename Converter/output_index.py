@@ -0,0 +1,368 @@
+"""Writes and reads the index of an output file sorted by ICAO address.
+
+An output file sorted by ICAO address is written with an index file next to it, so a tool which needs a few aircraft can find them without parsing the whole output file. The index is a header followed by an entry for each row whose Mode S ID is a valid address, in address order. Each entry is a little endian 64-bit integer holding the address in its upper bits and the byte offset of the row in the output file in its lower bits.
+
+The reader memory maps both files, a point lookup is a binary search of the entries followed by parsing the one row at the offset found, a range scan parses only the rows in the range, which are next to each other in the output file.
+
+Classes:
+    OutputIndexWriter: Records the byte offset of each row as a sorted output file is written, and saves the index.
+    IndexEntries: The entries of an index file, read from its memory map as they are needed, on machines which are not little endian.
+    OutputIndex: Looks up the rows of a sorted output file using its index.
+
+Functions:
+    output_index_path: Gets the path of the index of an output file.
+"""
+
+import bisect
+import csv
+import mmap
+import os
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union, overload
+
+from .icao import parse_icao24
+from .writer import RowFormatter
+
+import constants
+
+# The header of an index file, the magic bytes, the format version, the number of offset bits in each entry, the number of entries and the size of the output file it indexes
+INDEX_HEADER = struct.Struct('<8sIIQQ')
+
+# An entry of an index file
+INDEX_ENTRY = struct.Struct('<Q')
+
+# The mask selecting the byte offset of an entry
+OFFSET_MASK = (1 << constants.OUTPUT_INDEX_OFFSET_BITS) - 1
+
+def output_index_path(output_file_path: Path) -> Path:
+    """Gets the path of the index of an output file.
+
+    Args:
+        output_file_path (Path): The path of the output file.
+
+    Returns:
+        Path: The path of the index file.
+    """
+    return output_file_path.with_name(output_file_path.name + constants.OUTPUT_INDEX_SUFFIX)
+
+class OutputIndexWriter:
+    """Records the byte offset of each row as a sorted output file is written, and saves the index.
+
+    The offsets are counted from the lengths of the encoded lines rather than the position of the output file, so the lines can be written through a text file or a writer thread.
+
+    Args:
+        path (Path): The path of the index file.
+        header_size (int): The number of bytes of the output file before its first row.
+        key_column (int): The column of the Mode S ID in each row.
+    """
+    def __init__(self, path: Path, header_size: int, key_column: int) -> None:
+        self.path = path
+        self.key_column = key_column
+
+        # Initialise the entries and the offset of the next row
+        self.entries = array('Q')
+        self.offset = header_size
+
+    def add_lines(self, keys: Iterable[str], lines: Iterable[str]) -> None:
+        """Records the offsets of the next lines of the output file.
+
+        Args:
+            keys (Iterable[str]): The Mode S ID of each line.
+            lines (Iterable[str]): The lines, without the line terminator, in the order they are written.
+        """
+        append_entry = self.entries.append
+        offset = self.offset
+        terminator_size = len(RowFormatter.line_terminator)
+
+        for key, line in zip(keys, lines):
+            # Only rows with a valid address are indexed, they are sorted before the others so the entries are in address order
+            icao24 = parse_icao24(key)
+
+            if icao24 is not None:
+                append_entry(icao24 << constants.OUTPUT_INDEX_OFFSET_BITS | offset)
+
+            # Most lines are ASCII, whose encoded length is the length of the line
+            offset += (len(line) if line.isascii() else len(line.encode('utf-8'))) + terminator_size
+
+        self.offset = offset
+
+    def add_rows(self, rows: Sequence[Sequence[str]], lines: Iterable[str]) -> None:
+        """Records the offsets of the next rows of the output file.
+
+        Args:
+            rows (Sequence[Sequence[str]]): The rows, in the order they are written.
+            lines (Iterable[str]): The line each row was formatted as, without the line terminator.
+        """
+        key_column = self.key_column
+
+        self.add_lines([row[key_column] for row in rows], lines)
+
+    def save(self) -> None:
+        """Saves the index, once every line of the output file has been added.
+
+        Raises:
+            ValueError: If the output file is too large for its offsets to fit in an entry.
+        """
+        if self.offset > OFFSET_MASK:
+            raise ValueError(f'The output file is too large to index, it is {self.offset} bytes')
+
+        # The entries are stored little endian whatever the byte order of this machine
+        entries = self.entries
+
+        if sys.byteorder != 'little':
+            entries = array('Q', entries)
+            entries.byteswap()
+
+        # Write to a temporary file first so a partial index is never left behind
+        partial_path = self.path.with_name(self.path.name + constants.PARTIAL_OUTPUT_SUFFIX)
+
+        with partial_path.open('wb') as index_file:
+            index_file.write(INDEX_HEADER.pack(constants.OUTPUT_INDEX_MAGIC, constants.OUTPUT_INDEX_VERSION, constants.OUTPUT_INDEX_OFFSET_BITS, len(entries), self.offset))
+            index_file.write(entries.tobytes())
+
+        # Replace the previous index
+        os.replace(partial_path, self.path)
+
+class IndexEntries(Sequence[int]):
+    """The entries of an index file, read from its memory map as they are needed, on machines which are not little endian.
+
+    On little endian machines the entries are searched in place through a memoryview, which is several times faster.
+
+    Args:
+        index_map (mmap.mmap): The memory map of the index file.
+        count (int): The number of entries.
+    """
+    def __init__(self, index_map: mmap.mmap, count: int) -> None:
+        self.index_map = index_map
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    @overload
+    def __getitem__(self, position: int) -> int: ...
+
+    @overload
+    def __getitem__(self, position: slice) -> Sequence[int]: ...
+
+    def __getitem__(self, position: Union[int, slice]) -> Union[int, Sequence[int]]:
+        if isinstance(position, slice):
+            return [self[item] for item in range(*position.indices(self.count))]
+
+        if position < 0:
+            position += self.count
+
+        if not 0 <= position < self.count:
+            raise IndexError('index entry out of range')
+
+        return INDEX_ENTRY.unpack_from(self.index_map, INDEX_HEADER.size + position * INDEX_ENTRY.size)[0]
+
+class OutputIndex:
+    """Looks up the rows of a sorted output file using its index.
+
+    Addresses can be given as an integer or as a Mode S ID, a Mode S ID which is not a valid address matches no rows. An address can match more than one row if the output file holds the same address written two ways, such as 'A1B2C3' and 'a1b2c3'.
+
+    Args:
+        output_file_path (Path): The path of the sorted output file.
+        index_file_path (Optional[Path]): The path of its index, None to use the index written next to the output file.
+
+    Raises:
+        OSError: If either file cannot be opened.
+        ValueError: If the index file is not an index, was written by an incompatible version, or the output file has changed since it was indexed.
+    """
+    def __init__(self, output_file_path: Path, index_file_path: Optional[Path] = None) -> None:
+        self.output_file_path = output_file_path
+        self.index_file_path = index_file_path if index_file_path is not None else output_index_path(output_file_path)
+
+        # Initialise the memory maps and the view of the entries, so they can be closed if opening either file fails
+        self.index_map: Optional[mmap.mmap] = None
+        self.output_map: Optional[mmap.mmap] = None
+        self.entry_views: List[memoryview] = []
+
+        # Map the index, checking it is an index this version can read
+        with self.index_file_path.open('rb') as index_file:
+            if os.fstat(index_file.fileno()).st_size < INDEX_HEADER.size:
+                raise ValueError(f'{self.index_file_path} is not an output index')
+
+            index_map = self.index_map = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, offset_bits, count, output_size = INDEX_HEADER.unpack_from(index_map)
+
+        if magic != constants.OUTPUT_INDEX_MAGIC or len(index_map) != INDEX_HEADER.size + count * INDEX_ENTRY.size:
+            self.close()
+            raise ValueError(f'{self.index_file_path} is not an output index')
+
+        if version != constants.OUTPUT_INDEX_VERSION or offset_bits != constants.OUTPUT_INDEX_OFFSET_BITS:
+            self.close()
+            raise ValueError(f'{self.index_file_path} was written by an incompatible version, version {version}')
+
+        # Search the entries in place if they are in the byte order of this machine, otherwise unpack each entry as it is read
+        self.entries: Union[memoryview, IndexEntries]
+
+        if sys.byteorder == 'little':
+            self.entry_views = [memoryview(index_map)]
+            self.entry_views.append(self.entry_views[0][INDEX_HEADER.size:].cast('Q'))
+            self.entries = self.entry_views[-1]
+        else:
+            self.entries = IndexEntries(index_map, count)
+
+        # Map the output file, checking it is the file which was indexed
+        with output_file_path.open('rb') as output_file:
+            if os.fstat(output_file.fileno()).st_size != output_size:
+                self.close()
+                raise ValueError(f'{output_file_path} has changed since {self.index_file_path} was written')
+
+            self.output_map = mmap.mmap(output_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # Read the header of the output file
+        self.fieldnames = self.read_row(0)
+
+    def __enter__(self) -> 'OutputIndex':
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, address: object) -> bool:
+        if not isinstance(address, (int, str)):
+            return False
+
+        first, last = self.find_address(address)
+
+        return first < last
+
+    @staticmethod
+    def to_icao24(address: Union[int, str]) -> Optional[int]:
+        """Converts an address given as an integer or a Mode S ID to an integer.
+
+        Args:
+            address (Union[int, str]): The address.
+
+        Returns:
+            Optional[int]: The address, None if it is a Mode S ID which is not a valid address.
+        """
+        return parse_icao24(address) if isinstance(address, str) else address
+
+    def find(self, first: int, last: int) -> Tuple[int, int]:
+        """Finds the entries of a range of addresses.
+
+        Args:
+            first (int): The first address of the range.
+            last (int): The address after the last address of the range.
+
+        Returns:
+            Tuple[int, int]: The position of the first entry in the range and the position after the last, equal if there are none.
+        """
+        bits = constants.OUTPUT_INDEX_OFFSET_BITS
+        low = bisect.bisect_left(self.entries, max(first, 0) << bits)
+
+        return low, bisect.bisect_left(self.entries, max(last, first, 0) << bits, low)
+
+    def find_address(self, address: Union[int, str]) -> Tuple[int, int]:
+        """Finds the entries of an address.
+
+        Args:
+            address (Union[int, str]): The address.
+
+        Returns:
+            Tuple[int, int]: The position of the first entry with the address and the position after the last, equal if there are none.
+        """
+        icao24 = self.to_icao24(address)
+
+        return self.find(icao24, icao24 + 1) if icao24 is not None else (0, 0)
+
+    def read_row(self, offset: int) -> List[str]:
+        """Parses the row of the output file starting at an offset.
+
+        Args:
+            offset (int): The byte offset of the row.
+
+        Returns:
+            List[str]: The values of the row.
+        """
+        output_map = self.output_map
+        assert output_map is not None
+
+        # Read up to the end of the row, a newline within a quoted value leaves an odd number of quotes before it
+        end = offset
+
+        while True:
+            newline = output_map.find(b'\n', end)
+            end = newline + 1 if newline != -1 else len(output_map)
+            line = output_map[offset:end]
+
+            if newline == -1 or line.count(b'"') % 2 == 0:
+                break
+
+        return next(csv.reader([line.decode('utf-8')], delimiter=constants.DEFAULT_OUTPUT_FILE_DELIMITER), [])
+
+    def get(self, address: Union[int, str]) -> Optional[List[str]]:
+        """Looks up the row of an address.
+
+        Args:
+            address (Union[int, str]): The address.
+
+        Returns:
+            Optional[List[str]]: The values of the first row with the address, in the order of fieldnames, None if there is no row with the address.
+        """
+        first, last = self.find_address(address)
+
+        return self.read_row(self.entries[first] & OFFSET_MASK) if first < last else None
+
+    def get_all(self, address: Union[int, str]) -> List[List[str]]:
+        """Looks up every row of an address.
+
+        Args:
+            address (Union[int, str]): The address.
+
+        Returns:
+            List[List[str]]: The values of each row with the address, in the order they appear in the output file.
+        """
+        return list(self.scan(*self.find_address(address)))
+
+    def range(self, start: Union[int, str], end: Union[int, str]) -> Iterator[List[str]]:
+        """Scans the rows of a range of addresses.
+
+        Args:
+            start (Union[int, str]): The first address of the range.
+            end (Union[int, str]): The address after the last address of the range.
+
+        Returns:
+            Iterator[List[str]]: The values of each row in the range, in address order, only the rows returned are parsed, empty if either address is a Mode S ID which is not a valid address.
+        """
+        first = self.to_icao24(start)
+        last = self.to_icao24(end)
+
+        if first is None or last is None:
+            return iter(())
+
+        return self.scan(*self.find(first, last))
+
+    def scan(self, first: int, last: int) -> Iterator[List[str]]:
+        """Parses the rows of a range of entries.
+
+        Args:
+            first (int): The position of the first entry.
+            last (int): The position after the last entry.
+
+        Returns:
+            Iterator[List[str]]: The values of each row.
+        """
+        for position in range(first, last):
+            yield self.read_row(self.entries[position] & OFFSET_MASK)
+
+    def close(self) -> None:
+        """Closes the memory maps of the index and output files."""
+        # Release the views of the entries first, a memory map cannot be closed while it is viewed
+        for view in reversed(self.entry_views):
+            view.release()
+
+        for memory_map in (self.index_map, self.output_map):
+            if memory_map is not None:
+                memory_map.close()
@@ -0,0 +1,247 @@
+"""Parses the new file in parallel across a pool of worker processes.
+
+The file is split into byte ranges which start and end on record boundaries, each range is parsed and reduced to a single update per ICAO address by a worker process, and the updates are merged in file order.
+
+Classes:
+    ChunkResult: The updates parsed from one byte range of the new file.
+    ParallelParser: Parses the new file in byte ranges across a pool of worker processes.
+
+Functions:
+    count_quotes: Counts the quote characters in part of a file.
+    find_record_boundary: Finds the first record boundary at or after an offset.
+    split_into_chunks: Splits a file into byte ranges which start and end on record boundaries.
+    parse_chunk: Parses one byte range of the new file, run in a worker process.
+"""
+
+import csv
+import io
+import logging
+import mmap
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .merge_plan import MergePlan
+
+import constants
+
+class ChunkResult(NamedTuple):
+    """The updates parsed from one byte range of the new file.
+
+    Attributes:
+        updates (Dict[int, Tuple[str, ...]]): The combined mapped values of the rows with each ICAO address, in the order the addresses first appear.
+        rows_read (int): The number of rows read.
+        size (int): The number of bytes in the range.
+        error (str): A description of the problem if the range could not be parsed safely, empty otherwise.
+        invalid_mode_s_ids (Tuple[str, ...]): The Mode S IDs of the rows skipped as they are not valid addresses, rows without a Mode S ID are not included.
+    """
+    updates: Dict[int, Tuple[str, ...]]
+    rows_read: int
+    size: int
+    error: str = ''
+    invalid_mode_s_ids: Tuple[str, ...] = ()
+
+def count_quotes(data: mmap.mmap, start: int, end: int) -> int:
+    """Counts the quote characters in part of a file.
+
+    Args:
+        data (mmap.mmap): The contents of the file.
+        start (int): The offset to start counting from.
+        end (int): The offset to stop counting at.
+
+    Returns:
+        int: The number of quote characters.
+    """
+    # Count a window at a time, so large ranges are not copied into memory at once
+    return sum(data[offset:min(offset + constants.COPY_CHUNK_SIZE, end)].count(b'"') for offset in range(start, end, constants.COPY_CHUNK_SIZE))
+
+def find_record_boundary(data: mmap.mmap, offset: int, quote_count: int, quote_offset: int) -> Tuple[int, int]:
+    """Finds the first record boundary at or after an offset.
+
+    A newline ends a record if an even number of quote characters come before it, otherwise it is inside a quoted field.
+
+    Args:
+        data (mmap.mmap): The contents of the file.
+        offset (int): The offset to start searching from.
+        quote_count (int): The number of quote characters before quote_offset.
+        quote_offset (int): The offset quote_count was counted up to, which must not be after offset.
+
+    Returns:
+        Tuple[int, int]: The offset of the start of the next record, or the end of the file, and the number of quote characters before it.
+    """
+    while True:
+        # Find the next newline
+        newline = data.find(b'\n', offset)
+
+        if newline == -1:
+            return len(data), quote_count + count_quotes(data, quote_offset, len(data))
+
+        # Count the quote characters up to the newline
+        quote_count += count_quotes(data, quote_offset, newline)
+        quote_offset = newline
+
+        # The newline ends a record if it is not inside a quoted field
+        if quote_count % 2 == 0:
+            return newline + 1, quote_count
+
+        offset = newline + 1
+
+def split_into_chunks(path: Path, chunk_count: int) -> List[Tuple[int, int]]:
+    """Splits a file into byte ranges which start and end on record boundaries.
+
+    Args:
+        path (Path): The path of the file.
+        chunk_count (int): The number of ranges to aim for.
+
+    Returns:
+        List[Tuple[int, int]]: The start and end offset of each range, the header is not included.
+    """
+    with path.open('rb') as new_file:
+        # Empty files cannot be mapped
+        if path.stat().st_size == 0:
+            return []
+
+        with mmap.mmap(new_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            # Skip the header
+            start, quote_count = find_record_boundary(data, 0, 0, 0)
+            quote_offset = start
+
+            # Work out the target size of each range
+            chunk_size = max((len(data) - start) // max(chunk_count, 1), constants.MINIMUM_CHUNK_SIZE)
+
+            # Find the record boundary after each target offset
+            chunks = []
+
+            while start < len(data):
+                end, quote_count = find_record_boundary(data, start + chunk_size, quote_count, quote_offset)
+                quote_offset = end
+                chunks.append((start, end))
+                start = end
+
+            return chunks
+
+def parse_chunk(path: Path, start: int, end: int, delimiter: str, plan: MergePlan, field_count: int) -> ChunkResult:
+    """Parses one byte range of the new file, run in a worker process.
+
+    The rows with the same ICAO address are combined into a single update, keeping the last non-empty value of each mapped column, which has the same effect as merging the rows one after another.
+
+    Args:
+        path (Path): The path of the new file.
+        start (int): The offset of the start of the range.
+        end (int): The offset of the end of the range.
+        delimiter (str): The delimiter of the new file.
+        plan (MergePlan): The mapping compiled against the header of the new file.
+        field_count (int): The number of fields in the header, rows with a different number of fields may mean the range does not start on a record boundary.
+
+    Returns:
+        ChunkResult: The updates parsed from the range.
+    """
+    # Read the range
+    with path.open('rb') as new_file:
+        new_file.seek(start)
+        text = new_file.read(end - start).decode('utf-8')
+
+    # Create a strict reader, so a range ending inside a quoted field is reported rather than silently accepted
+    reader = csv.reader(io.StringIO(text, newline=''), delimiter=delimiter, strict=True)
+
+    updates: Dict[int, Tuple[str, ...]] = {}
+    invalid_mode_s_ids: List[str] = []
+    rows_read = 0
+
+    try:
+        for new_row in reader:
+            # Skip blank lines
+            if not new_row:
+                continue
+
+            rows_read += 1
+
+            # Check the row has the same number of fields as the header
+            if len(new_row) != field_count:
+                return ChunkResult({}, rows_read, end - start, f'line {reader.line_num} of the range at {start} has {len(new_row)} fields, expected {field_count}')
+
+            # Get the address
+            icao24 = plan.key(new_row)
+
+            if icao24 is not None:
+                values = plan.mapped_values(new_row)
+                previous_values = updates.get(icao24)
+
+                # Combine the row with the earlier rows with the same address
+                updates[icao24] = values if previous_values is None else tuple(value or previous_value for value, previous_value in zip(values, previous_values))
+
+            elif plan.mode_s_id(new_row).strip():
+                # Keep the Mode S IDs which are not valid addresses to be reported by the main process
+                invalid_mode_s_ids.append(plan.mode_s_id(new_row))
+
+    except csv.Error as error:
+        return ChunkResult({}, rows_read, end - start, f'line {reader.line_num} of the range at {start}: {error}')
+
+    # Return the updates
+    return ChunkResult(updates, rows_read, end - start, invalid_mode_s_ids=tuple(invalid_mode_s_ids))
+
+class ParallelParser:
+    """Parses the new file in byte ranges across a pool of worker processes.
+
+    Args:
+        path (Path): The path of the new file.
+        delimiter (str): The delimiter of the new file.
+        plan (MergePlan): The mapping compiled against the header of the new file.
+        field_count (int): The number of fields in the header of the new file.
+        workers (int): The number of worker processes.
+    """
+    def __init__(self, path: Path, delimiter: str, plan: MergePlan, field_count: int, workers: int) -> None:
+        # Split the file into ranges, using several ranges per worker to balance the load
+        chunks = split_into_chunks(path, workers * constants.CHUNKS_PER_WORKER)
+
+        # Store the total size of the ranges
+        self.total_size = sum(end - start for start, end in chunks)
+        self.parsed_size = 0
+
+        # Log the split
+        logging.debug('Parsing %s in %s ranges with %s workers', path, len(chunks), workers)
+
+        # Start the workers and submit the ranges
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        self.futures: List[Future] = [self.executor.submit(parse_chunk, path, start, end, delimiter, plan, field_count) for start, end in chunks]
+
+    def next_result(self, timeout: Optional[float]) -> Optional[ChunkResult]:
+        """Gets the result of the next range in file order.
+
+        Args:
+            timeout (Optional[float]): The number of seconds to wait for the result, None to wait until it is ready.
+
+        Returns:
+            Optional[ChunkResult]: The result, or None if it is not ready yet.
+
+        Raises:
+            StopIteration: If every range has been returned.
+        """
+        # Check if every range has been returned
+        if not self.futures:
+            raise StopIteration
+
+        # Wait for the next range
+        try:
+            result: ChunkResult = self.futures[0].result(timeout)
+        except FutureTimeoutError:
+            return None
+
+        # Remove the range and record its size
+        self.futures.pop(0)
+        self.parsed_size += result.size
+
+        return result
+
+    def percentage_parsed(self) -> float:
+        """Calculates the percentage of the file which has been returned.
+
+        Returns:
+            float: The percentage returned.
+        """
+        return (self.parsed_size / self.total_size) * 100 if self.total_size else 100
+
+    def shutdown(self) -> None:
+        """Stops the workers, cancelling any ranges which have not started."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.futures = []
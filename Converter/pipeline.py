@@ -0,0 +1,414 @@
+"""Runs the stages of a conversion at the same time, connected by bounded queues.
+
+The in memory engine runs its phases one after another, so the new file is only opened once the whole current file has been read and the disk is idle while the output is formatted. The pipelined engine parses the new file on a background thread while the current file is read, and writes the formatted output on a background thread while the next rows are formatted.
+
+Each pair of stages is connected by a bounded queue. A stage which gets ahead waits for the next stage to catch up, so the new file is never held in memory as a whole and the output never builds up faster than it can be written.
+
+The rows of the new file are merged in the order they appear in the file and the output is written in the order of the row store, so the output is the same as the in memory engine's. Only one thread runs Python code at a time, the stages overlap where they wait for the disk, decompress an input file or encode and write the output.
+
+Classes:
+    RowProducer: Parses the rows of a file on a background thread, passing them on in batches through a bounded queue.
+    ChunkWriter: Writes text to a file on a background thread, taking it from a bounded queue.
+    PipelinedConverter: Merges the New File into the Current File with the reading, parsing and writing stages running at the same time.
+"""
+
+import csv
+import io
+import logging
+import queue
+import threading
+from datetime import timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, TextIO, Tuple, Union
+
+from .converter import Converter
+from .merge_plan import MergePlan
+from .sources import NewFileSource
+from .streams import open_input_file
+
+import constants
+
+# The item put on a queue after the last batch
+END_OF_STAGE = None
+
+class RowProducer:
+    """Parses the rows of a file on a background thread, passing them on in batches through a bounded queue.
+
+    The producer is used in place of both the input file and the csv reader, it returns the rows in file order and reports progress in the same way as an InputFile.
+
+    Args:
+        path (Path): The path of the file, or '-' for standard input.
+        delimiter (str): The delimiter of the file.
+        queue_size (int): The number of batches which can wait in the queue before the thread waits.
+        batch_rows (int): The number of rows in each batch.
+    """
+    def __init__(self, path: Path, delimiter: str, queue_size: int = constants.PIPELINE_QUEUE_SIZE, batch_rows: int = constants.PIPELINE_BATCH_ROWS) -> None:
+        # Store the file and the size of the batches
+        self.path = path
+        self.delimiter = delimiter
+        self.batch_rows = batch_rows
+
+        # Create the queue of batches, each is a list of rows and the percentage of the file read once it was parsed
+        self.queue: 'queue.Queue[Union[Tuple[List[List[str]], float], BaseException, None]]' = queue.Queue(maxsize=queue_size)
+
+        # Initialise the header, which is set before the first batch is queued
+        self.header: List[str] = []
+        self.header_event = threading.Event()
+
+        # Initialise the rows of the batch being returned and the percentage of the file they reach
+        self.rows: Iterator[List[str]] = iter(())
+        self.last_percentage = 0.0
+
+        # Initialise the error raised by the thread, the event used to stop it and whether the producer has been closed
+        self.error: Optional[BaseException] = None
+        self.stop_event = threading.Event()
+        self.finished = False
+        self.closed = False
+
+        # Start parsing the file
+        self.thread = threading.Thread(target=self.run, name=f'Parse {path.name}', daemon=True)
+        self.thread.start()
+
+    def run(self) -> None:
+        """Parses the file, runs on the background thread."""
+        try:
+            with open_input_file(self.path) as input_file:
+                # Read the header
+                reader = csv.reader(input_file, delimiter=self.delimiter)
+                self.header = next(reader, [])
+                self.header_event.set()
+
+                # Parse the rows in batches
+                batch: List[List[str]] = []
+                lines_read = 0
+
+                while True:
+                    try:
+                        batch.append(next(reader))
+
+                    except StopIteration:
+                        break
+
+                    except csv.Error:
+                        # Log the error and keep an empty row in its place, so the merge counts the lines as it would have
+                        logging.error('Error reading line %s of %s', lines_read, self.path)
+                        batch.append([])
+
+                    lines_read += 1
+
+                    # Pass the batch on once it is full, stopping if the producer has been closed
+                    if len(batch) >= self.batch_rows:
+                        if not self.put((batch, input_file.percentage_read())):
+                            return
+
+                        batch = []
+
+                # Pass on the last batch
+                if not self.put((batch, 100)):
+                    return
+
+            self.put(END_OF_STAGE)
+
+        except Exception as error: # pylint: disable=broad-except
+            # Pass the error on, it is raised when the next row is read
+            self.error = error
+            self.put(error)
+
+        finally:
+            self.header_event.set()
+
+    def put(self, item: Union[Tuple[List[List[str]], float], BaseException, None]) -> bool:
+        """Puts an item on the queue, waiting while the queue is full.
+
+        Args:
+            item (Union[Tuple[List[List[str]], float], BaseException, None]): The item.
+
+        Returns:
+            bool: True if the item was queued, False if the producer was closed while it waited.
+        """
+        while not self.stop_event.is_set():
+            try:
+                self.queue.put(item, timeout=constants.PIPELINE_POLL_TIME)
+                return True
+            except queue.Full:
+                continue
+
+        return False
+
+    def wait_for_header(self) -> List[str]:
+        """Waits for the header to be read.
+
+        Returns:
+            List[str]: The header, empty if the file is empty.
+
+        Raises:
+            Exception: The error raised by the thread, if the header could not be read.
+        """
+        self.header_event.wait()
+
+        if self.error is not None:
+            raise self.error
+
+        return self.header
+
+    def __iter__(self) -> 'RowProducer':
+        return self
+
+    def __next__(self) -> List[str]:
+        while True:
+            # Return the next row of the current batch
+            row = next(self.rows, None)
+
+            if row is not None:
+                return row
+
+            if self.finished or self.closed:
+                raise StopIteration
+
+            # Take the next batch, waiting for it to be parsed
+            item = self.queue.get()
+
+            if item is END_OF_STAGE:
+                self.finished = True
+                raise StopIteration
+
+            if isinstance(item, BaseException):
+                self.finished = True
+                raise item
+
+            batch, self.last_percentage = item
+            self.rows = iter(batch)
+
+    def percentage_read(self) -> float:
+        """Gets the percentage of the file read to parse the rows returned so far.
+
+        Returns:
+            float: The percentage of the file read.
+        """
+        return self.last_percentage
+
+    def close(self) -> None:
+        """Stops the thread and discards any rows which have not been returned."""
+        self.stop_event.set()
+        self.closed = True
+
+        # Empty the queue so the thread is not left waiting to add to it
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+
+        self.rows = iter(())
+
+class ChunkWriter(io.TextIOBase):
+    """Writes text to a file on a background thread, taking it from a bounded queue.
+
+    Each write is queued and the call returns straight away unless the queue is full. Closing the writer waits for the queued text to be written, then closes the file.
+
+    Args:
+        output_file (TextIO): The file, which is closed with the writer.
+        queue_size (int): The number of writes which can wait in the queue before a write waits.
+    """
+    def __init__(self, output_file: TextIO, queue_size: int = constants.PIPELINE_QUEUE_SIZE) -> None:
+        super().__init__()
+
+        # Store the file
+        self.output_file = output_file
+
+        # Create the queue of text to write
+        self.queue: 'queue.Queue[Optional[str]]' = queue.Queue(maxsize=queue_size)
+
+        # Initialise the error raised by the thread
+        self.error: Optional[BaseException] = None
+
+        # Start writing
+        self.thread = threading.Thread(target=self.run, name='Write Output File', daemon=True)
+        self.thread.start()
+
+    def run(self) -> None:
+        """Writes the queued text, runs on the background thread."""
+        try:
+            while (chunk := self.queue.get()) is not END_OF_STAGE:
+                self.output_file.write(chunk)
+
+        except Exception as error: # pylint: disable=broad-except
+            # Store the error, it is raised by the next write or when the writer is closed
+            self.error = error
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        """Queues text to be written, waiting while the queue is full.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            int: The number of characters queued.
+
+        Raises:
+            ValueError: If the writer is closed.
+            Exception: The error raised by the thread, if an earlier write failed.
+        """
+        if self.closed:
+            raise ValueError('I/O operation on closed file')
+
+        self.put(text)
+
+        return len(text)
+
+    def put(self, item: Optional[str]) -> None:
+        """Puts an item on the queue, waiting while the queue is full.
+
+        Args:
+            item (Optional[str]): The text, or END_OF_STAGE to stop the thread.
+
+        Raises:
+            Exception: The error raised by the thread, if it has stopped.
+        """
+        while True:
+            # Stop waiting if the thread has stopped because a write failed
+            if self.error is not None:
+                raise self.error
+
+            try:
+                self.queue.put(item, timeout=constants.PIPELINE_POLL_TIME)
+                return
+            except queue.Full:
+                continue
+
+    def close(self) -> None:
+        """Waits for the queued text to be written, then closes the file.
+
+        Raises:
+            Exception: The error raised by the thread, if a write failed.
+        """
+        if self.closed:
+            return
+
+        try:
+            # Tell the thread there is nothing more to write and wait for it
+            self.put(END_OF_STAGE)
+            self.thread.join()
+
+            if self.error is not None:
+                raise self.error
+
+        finally:
+            self.output_file.close()
+            super().close()
+
+    def abort(self) -> None:
+        """Discards the text which has not been written, stops the thread and closes the file."""
+        if self.closed:
+            return
+
+        # Empty the queue, then stop the thread, nothing else adds to the queue so there is room for the end of the stage
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+
+        if self.thread.is_alive():
+            self.queue.put(END_OF_STAGE)
+            self.thread.join()
+
+        self.output_file.close()
+        super().close()
+
+class PipelinedConverter(Converter):
+    """Merges the New File into the Current File with the reading, parsing and writing stages running at the same time.
+
+    The new file is parsed on a background thread from the start of the conversion, while the current file is read. The rows are passed on in batches through a bounded queue and merged in file order once the current file has been read. The output is formatted on the conversion thread and written on a background thread.
+
+    Args:
+        current_file_path (Path): The existing aircraft database file.
+        current_file_delimiter (str): The delimiter of the existing database file.
+        new_file_path (Path): The file containing new data to be merged into the existing database.
+        new_file_delimiter (str): The delimiter of the new file.
+        output_file_path (Path): The file to output the merged data to.
+        mapping (Dict[str, str]): The mapping of the new file's fieldnames to the current file's fieldnames.
+        time_slice (Optional[timedelta]): How long each call to a read, merge or write method runs for, None runs each phase to completion in a single call.
+        queue_size (int): The number of batches each queue between the stages holds before the stage filling it waits.
+        cache_directory (Optional[Path]): The directory the parsed rows of current files are cached in, None to always parse the current file.
+        additional_sources (Sequence[NewFileSource]): Further new files to merge after the new file, in order.
+        record_changes (bool): True to record the rows and fields each new file changes in source_changes.
+        sorted_output (bool): True to write the rows sorted by ICAO address, with an index next to the output file.
+    """
+    def __init__(
+            self,
+            current_file_path: Path,
+            current_file_delimiter: str,
+            new_file_path: Path,
+            new_file_delimiter: str,
+            output_file_path: Path,
+            mapping: Dict[str, str],
+            time_slice: Optional[timedelta] = timedelta(milliseconds=constants.UI_REFRESH_TIME),
+            queue_size: int = constants.PIPELINE_QUEUE_SIZE,
+            cache_directory: Optional[Path] = constants.CACHE_PATH,
+            additional_sources: Sequence[NewFileSource] = (),
+            record_changes: bool = False,
+            sorted_output: bool = False
+        ) -> None:
+        # The new file is parsed by the producer thread rather than by worker processes
+        super().__init__(current_file_path, current_file_delimiter, new_file_path, new_file_delimiter, output_file_path, mapping, time_slice, workers=1, cache_directory=cache_directory, additional_sources=additional_sources, record_changes=record_changes, sorted_output=sorted_output)
+
+        # Store the size of the queues
+        if queue_size < 1:
+            raise ValueError('The queue size must be at least 1')
+
+        self.queue_size = queue_size
+
+        # Initialise the producer parsing each new file
+        self.new_file_producers: List[RowProducer] = []
+
+    def initialise_current_file(self) -> None:
+        """Starts parsing the new files in the background, then initialises the current file."""
+        # Start parsing every new file, each producer only parses as far as its queue holds until its file is merged
+        self.new_file_producers = [RowProducer(source.path, source.delimiter, self.queue_size) for source in self.sources]
+
+        super().initialise_current_file()
+
+    def initialise_new_file(self) -> None:
+        """Takes the rows of the new file from the producer started with the read phase."""
+        # Log the details of the new file
+        self.log_probe(self.new_file_path)
+
+        # Start the producers if the read phase was skipped
+        if not self.new_file_producers:
+            self.new_file_producers = [RowProducer(source.path, source.delimiter, self.queue_size) for source in self.sources]
+
+        # The producer is both the file and the reader
+        new_file_producer = self.new_file_producers[self.source_index]
+        self.new_file = new_file_producer # type: ignore[assignment]
+        self.new_file_reader = new_file_producer
+
+        # Compile the mapping against the header once it has been read
+        self.merge_plan = MergePlan(self.mapping, self.current_file_data.schema, new_file_producer.wait_for_header(), self.merge_pool())
+
+        # Initialise the number of lines read to 0
+        self.lines_read = 0
+
+    def initialise_output_file(self) -> None:
+        """Initialises the output file, handing it to a writer thread once the header has been written."""
+        super().initialise_output_file()
+
+        if self.output_file is not None:
+            # Write the rows on the writer thread
+            self.output_file = ChunkWriter(self.output_file, self.queue_size) # type: ignore[assignment]
+            self.output_file_writer.output_file = self.output_file # type: ignore[assignment]
+
+    def conversion_cancelled(self) -> None:
+        """Called when the user cancels the conversion."""
+        # Stop the producers, they may not have been handed over to the merge
+        for new_file_producer in self.new_file_producers:
+            new_file_producer.close()
+
+        # Discard the output which has not been written
+        if isinstance(self.output_file, ChunkWriter):
+            self.output_file.abort()
+
+        super().conversion_cancelled()
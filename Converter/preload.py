@@ -0,0 +1,340 @@
+"""Parses the current and new files in the background as soon as they are selected.
+
+In the main window the files are selected some time before Convert is pressed, while the mapping dialog is open the CPU is otherwise idle. The current file is read into a row store and the rows of the new file are parsed while the user sets the mapping, so a conversion started once they have finished only has to merge and write.
+
+Each file is preloaded on its own thread. Selecting a different file cancels its preload, the thread stops within one time slice. A conversion only uses a preload if the file has the same path, size, modification time and delimiter as when the preload started, and takes it from the preloader so the rows it goes on to change are never used again.
+
+Classes:
+    PreloadedCurrentFile: The rows of a current file read in the background.
+    PreloadedNewFile: The header and rows of a new file parsed in the background.
+    PreloadedRows: Returns the preloaded rows of a new file in place of both the input file and the csv reader.
+    PreloadJob: Loads a file on a background thread.
+    Preloader: Starts, cancels and hands over the preloads of the current and new files.
+
+Functions:
+    load_current_file: Reads a current file into a row store, as the read phase of a conversion would.
+    load_new_file: Parses the rows of a new file.
+"""
+
+import csv
+import logging
+import threading
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Callable, List, NamedTuple, Optional
+
+from .row_store import RowStore
+from .streams import file_fingerprint, is_standard_stream, open_input_file
+
+import constants
+
+class PreloadedCurrentFile(NamedTuple):
+    """The rows of a current file read in the background.
+
+    Attributes:
+        data (RowStore): The rows of the current file.
+        lines_read (int): The number of lines read to parse the rows.
+    """
+    data: RowStore
+    lines_read: int
+
+class PreloadedNewFile(NamedTuple):
+    """The header and rows of a new file parsed in the background.
+
+    Attributes:
+        header (List[str]): The header of the new file.
+        rows (List[List[str]]): The rows following the header, a line which could not be parsed is an empty row.
+    """
+    header: List[str]
+    rows: List[List[str]]
+
+class PreloadedRows:
+    """Returns the preloaded rows of a new file in place of both the input file and the csv reader.
+
+    Args:
+        rows (List[List[str]]): The rows.
+    """
+    def __init__(self, rows: List[List[str]]) -> None:
+        self.rows = rows
+        self.position = 0
+        self.closed = False
+
+    def __iter__(self) -> 'PreloadedRows':
+        return self
+
+    def __next__(self) -> List[str]:
+        if self.position >= len(self.rows):
+            raise StopIteration
+
+        row = self.rows[self.position]
+        self.position += 1
+
+        return row
+
+    def percentage_read(self) -> float:
+        """Gets the percentage of the rows returned so far.
+
+        Returns:
+            float: The percentage of the rows returned.
+        """
+        return self.position / len(self.rows) * 100 if self.rows else 100
+
+    def close(self) -> None:
+        """Releases the rows."""
+        self.rows = []
+        self.closed = True
+
+class PreloadJob:
+    """Loads a file on a background thread.
+
+    Args:
+        path (Path): The path of the file.
+        delimiter (str): The delimiter of the file.
+        load (Callable[[PreloadJob], Any]): The function loading the file, it returns None if the job is cancelled before it finishes.
+
+    Raises:
+        OSError: If the file cannot be found.
+    """
+    def __init__(self, path: Path, delimiter: str, load: Callable[['PreloadJob'], Any]) -> None:
+        # Store the file and record its version, so a file which changes after the preload started is not used
+        self.path = path
+        self.delimiter = delimiter
+        self.fingerprint = file_fingerprint(path)
+
+        # Store the loading function
+        self.load = load
+
+        # Initialise the result and the percentage of the file loaded so far
+        self.result: Any = None
+        self.percentage = 0.0
+
+        # Create the events used to cancel the job and to wait for it to finish
+        self.cancel_event = threading.Event()
+        self.finished_event = threading.Event()
+
+        # Start loading the file
+        self.thread = threading.Thread(target=self.run, name=f'Preload {path.name}', daemon=True)
+        self.thread.start()
+
+    def run(self) -> None:
+        """Loads the file, runs on the background thread."""
+        try:
+            self.result = self.load(self)
+        except Exception as error: # pylint: disable=broad-except
+            # The file is read again by the conversion, which reports the error if it happens again
+            logging.warning('Could not preload %s: %s', self.path, error)
+        finally:
+            self.finished_event.set()
+
+    def cancel(self) -> None:
+        """Asks the job to stop, it stops within one time slice."""
+        self.cancel_event.set()
+
+    def wait(self, timeout: Optional[float]) -> bool:
+        """Waits for the job to finish.
+
+        Args:
+            timeout (Optional[float]): The longest time to wait in seconds, None to wait until it finishes.
+
+        Returns:
+            bool: True if the job has finished.
+        """
+        return self.finished_event.wait(timeout)
+
+    def matches(self, path: Path, delimiter: str) -> bool:
+        """Checks whether the job is loading a file as it is now.
+
+        Args:
+            path (Path): The path of the file.
+            delimiter (str): The delimiter of the file.
+
+        Returns:
+            bool: True if the job has not been cancelled and the file has not changed since the job started.
+        """
+        if self.cancel_event.is_set() or delimiter != self.delimiter or is_standard_stream(path):
+            return False
+
+        try:
+            return file_fingerprint(path) == self.fingerprint
+        except OSError:
+            return False
+
+def load_current_file(job: PreloadJob, cache_directory: Optional[Path]) -> Optional[PreloadedCurrentFile]:
+    """Reads a current file into a row store, as the read phase of a conversion would.
+
+    Args:
+        job (PreloadJob): The job loading the file.
+        cache_directory (Optional[Path]): The directory the parsed rows of current files are cached in, None to always parse the file.
+
+    Returns:
+        Optional[PreloadedCurrentFile]: The rows of the file, None if the job was cancelled.
+    """
+    # Import the converter here, as the preloader is created when the application starts
+    from .converter import Converter
+
+    # Read the file with a converter so the rows are exactly those of a conversion, loading them from the cache if the file has been parsed before, the new and output files are never opened
+    converter = Converter(job.path, job.delimiter, job.path, job.delimiter, job.path, {}, timedelta(milliseconds=constants.UI_REFRESH_TIME), cache_directory=cache_directory)
+
+    try:
+        converter.initialise_current_file()
+
+        # Read a time slice at a time, so a cancelled job stops promptly
+        while not job.cancel_event.is_set():
+            job.percentage, still_running = converter.read_current_file()
+
+            if not still_running:
+                return PreloadedCurrentFile(converter.current_file_data, converter.lines_read)
+
+        return None
+
+    finally:
+        converter.conversion_cancelled()
+
+def load_new_file(job: PreloadJob) -> Optional[PreloadedNewFile]:
+    """Parses the rows of a new file.
+
+    The rows are parsed before the mapping is known, so every column is kept.
+
+    Args:
+        job (PreloadJob): The job loading the file.
+
+    Returns:
+        Optional[PreloadedNewFile]: The header and rows of the file, None if the job was cancelled.
+    """
+    with open_input_file(job.path) as new_file:
+        # Read the header
+        reader = csv.reader(new_file, delimiter=job.delimiter)
+        header = next(reader, [])
+        rows: List[List[str]] = []
+
+        # Parse a batch of rows at a time, so a cancelled job stops promptly
+        while not job.cancel_event.is_set():
+            for _ in range(constants.PRELOAD_BATCH_ROWS):
+                try:
+                    rows.append(next(reader))
+
+                except StopIteration:
+                    return PreloadedNewFile(header, rows)
+
+                except csv.Error:
+                    # Log the error and keep an empty row in its place, so the merge counts the lines as it would have
+                    logging.error('Error reading line %s of %s', len(rows), job.path)
+                    rows.append([])
+
+            job.percentage = new_file.percentage_read()
+
+    return None
+
+class Preloader:
+    """Starts, cancels and hands over the preloads of the current and new files.
+
+    Args:
+        cache_directory (Optional[Path]): The directory the parsed rows of current files are cached in, None to always parse the current file.
+    """
+    def __init__(self, cache_directory: Optional[Path] = constants.CACHE_PATH) -> None:
+        self.cache_directory = cache_directory
+
+        # Initialise the jobs, and the lock protecting them as they are taken by the conversion thread
+        self.current_file_job: Optional[PreloadJob] = None
+        self.new_file_job: Optional[PreloadJob] = None
+        self.lock = threading.Lock()
+
+    def start(self, path: Path, delimiter: str, load: Callable[[PreloadJob], Any]) -> Optional[PreloadJob]:
+        """Starts preloading a file.
+
+        Args:
+            path (Path): The path of the file.
+            delimiter (str): The delimiter of the file.
+            load (Callable[[PreloadJob], Any]): The function loading the file.
+
+        Returns:
+            Optional[PreloadJob]: The job, None if the file is not a regular file.
+        """
+        if is_standard_stream(path) or not path.is_file():
+            return None
+
+        try:
+            return PreloadJob(path, delimiter, load)
+        except OSError as error:
+            logging.warning('Could not preload %s: %s', path, error)
+            return None
+
+    def preload_current_file(self, path: Path, delimiter: str) -> None:
+        """Cancels the preload of the previous current file and starts reading the new one.
+
+        Args:
+            path (Path): The path of the current file, an empty path only cancels the previous preload.
+            delimiter (str): The delimiter of the current file.
+        """
+        job = self.start(path, delimiter, lambda job: load_current_file(job, self.cache_directory))
+
+        with self.lock:
+            if self.current_file_job is not None:
+                self.current_file_job.cancel()
+
+            self.current_file_job = job
+
+    def preload_new_file(self, path: Path, delimiter: str) -> None:
+        """Cancels the preload of the previous new file and starts parsing the new one.
+
+        Args:
+            path (Path): The path of the new file, an empty path only cancels the previous preload.
+            delimiter (str): The delimiter of the new file.
+        """
+        job = self.start(path, delimiter, load_new_file)
+
+        with self.lock:
+            if self.new_file_job is not None:
+                self.new_file_job.cancel()
+
+            self.new_file_job = job
+
+    def take_current_file(self, path: Path, delimiter: str) -> Optional[PreloadJob]:
+        """Hands over the preload of a current file, if it is still valid.
+
+        Args:
+            path (Path): The path of the current file.
+            delimiter (str): The delimiter of the current file.
+
+        Returns:
+            Optional[PreloadJob]: The job, which may still be running, None if the file has not been preloaded as it is now.
+        """
+        with self.lock:
+            job, self.current_file_job = self.current_file_job, None
+
+        # Stop a preload of an earlier version of the file
+        if job is not None and not job.matches(path, delimiter):
+            job.cancel()
+            return None
+
+        return job
+
+    def take_new_file(self, path: Path, delimiter: str) -> Optional[PreloadJob]:
+        """Hands over the preload of a new file, if it is still valid.
+
+        Args:
+            path (Path): The path of the new file.
+            delimiter (str): The delimiter of the new file.
+
+        Returns:
+            Optional[PreloadJob]: The job, which may still be running, None if the file has not been preloaded as it is now.
+        """
+        with self.lock:
+            job, self.new_file_job = self.new_file_job, None
+
+        # Stop a preload of an earlier version of the file
+        if job is not None and not job.matches(path, delimiter):
+            job.cancel()
+            return None
+
+        return job
+
+    def cancel(self) -> None:
+        """Cancels both preloads."""
+        with self.lock:
+            for job in (self.current_file_job, self.new_file_job):
+                if job is not None:
+                    job.cancel()
+
+            self.current_file_job = None
+            self.new_file_job = None
@@ -0,0 +1,151 @@
+"""Probes a file once for the details needed before it is converted, and caches them.
+
+Every file is read as UTF-8. The main window needs the dialect and header of each file when it is selected, the mapping dialog needs the header of the New File and the Converter logs the size of each file. Opening a file on a network share can take seconds, so the start of each file is read once and the details are cached, keyed by the file's fingerprint so a file which changes is probed again.
+
+Classes:
+    FileProbe: The details of a file found by reading its start.
+
+Functions:
+    probe_file: Probes a file, or gets the cached probe if the file has not changed since it was probed.
+    cached_probe: Gets the cached probe of a file without opening it.
+    clear_probe_cache: Empties the cache of probes.
+"""
+
+import csv
+import io
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+
+from .streams import file_fingerprint, open_input_file
+
+import constants
+
+class FileProbe(NamedTuple):
+    """The details of a file found by reading its start.
+
+    Attributes:
+        fingerprint (Tuple[str, int, int]): The path, size and modification time of the file when it was probed.
+        size (int): The size of the file in bytes.
+        compression (Optional[str]): The compression format of the file, None if it is not compressed.
+        delimiter (Optional[str]): The delimiter found by csv.Sniffer, None if the dialect could not be determined.
+        sample (str): The text read from the start of the file.
+        estimated_rows (Optional[int]): The estimated number of rows in the file, excluding the header, exact if the whole file was read, None if the file is compressed and was not read to its end.
+    """
+    fingerprint: Tuple[str, int, int]
+    size: int
+    compression: Optional[str]
+    delimiter: Optional[str]
+    sample: str
+    estimated_rows: Optional[int]
+
+    def fieldnames(self, delimiter: Optional[str] = None) -> List[str]:
+        """Gets the fieldnames from the header of the file.
+
+        Args:
+            delimiter (Optional[str]): The delimiter of the file, None to use the delimiter found by the sniffer.
+
+        Returns:
+            List[str]: The fieldnames, empty if the file is empty or no delimiter is known.
+        """
+        delimiter = delimiter or self.delimiter
+
+        if delimiter is None:
+            return []
+
+        return next(csv.reader(io.StringIO(self.sample, newline=''), delimiter=delimiter), [])
+
+# The cached probes, most recently used last, and the lock protecting them as the Converter probes from the conversion thread
+probe_cache: 'OrderedDict[Tuple[str, int, int], FileProbe]' = OrderedDict()
+probe_cache_lock = threading.Lock()
+
+def probe_file(path: Path) -> FileProbe:
+    """Probes a file, or gets the cached probe if the file has not changed since it was probed.
+
+    Args:
+        path (Path): The path of the file, which cannot be standard input as reading it would consume it.
+
+    Returns:
+        FileProbe: The details of the file.
+
+    Raises:
+        OSError: If the file cannot be read.
+        UnicodeDecodeError: If the start of the file is not valid UTF-8.
+        ValueError: If the file is a zip archive which does not contain exactly one file.
+        EOFError, zipfile.BadZipFile, lzma.LZMAError, zlib.error: If the file is compressed and cannot be decompressed.
+    """
+    # Return the cached probe if the file has not changed
+    fingerprint = file_fingerprint(path)
+
+    with probe_cache_lock:
+        probe = probe_cache.get(fingerprint)
+
+        if probe is not None:
+            probe_cache.move_to_end(fingerprint)
+            return probe
+
+    # Read the start of the file, decompressing it if it is compressed
+    with open_input_file(path) as input_file:
+        sample = input_file.read(constants.SNIFFER_READ_SIZE)
+        whole_file = len(sample) < constants.SNIFFER_READ_SIZE
+        compression = input_file.compression
+
+    # Try to determine the delimiter
+    try:
+        delimiter: Optional[str] = csv.Sniffer().sniff(sample).delimiter
+    except csv.Error:
+        delimiter = None
+
+    # Count the rows in the sample, or estimate them from the average length of the lines read so far
+    lines = sample.count('\n')
+    estimated_rows: Optional[int]
+
+    if whole_file:
+        estimated_rows = max(lines - 1 + (not sample.endswith('\n') and sample != ''), 0)
+    elif compression is not None:
+        # The decompressors read ahead by whole blocks, so the compressed size of the sample is not known
+        estimated_rows = None
+    else:
+        # Scale the lines in the sample up to the size of the file
+        estimated_rows = max(round(lines * fingerprint[1] / len(sample.encode('utf-8'))) - 1, 0)
+
+    probe = FileProbe(
+        fingerprint,
+        fingerprint[1],
+        compression,
+        delimiter,
+        sample,
+        estimated_rows,
+    )
+
+    # Cache the probe, dropping the least recently used probes
+    with probe_cache_lock:
+        probe_cache[fingerprint] = probe
+
+        while len(probe_cache) > constants.PROBE_CACHE_SIZE:
+            probe_cache.popitem(last=False)
+
+    return probe
+
+def cached_probe(path: Path) -> Optional[FileProbe]:
+    """Gets the cached probe of a file without opening it, so callers which do not need the probe never read the file twice.
+
+    Args:
+        path (Path): The path of the file.
+
+    Returns:
+        Optional[FileProbe]: The probe, or None if the file has not been probed since it last changed or cannot be found.
+    """
+    try:
+        fingerprint = file_fingerprint(path)
+    except OSError:
+        return None
+
+    with probe_cache_lock:
+        return probe_cache.get(fingerprint)
+
+def clear_probe_cache() -> None:
+    """Empties the cache of probes."""
+    with probe_cache_lock:
+        probe_cache.clear()
@@ -0,0 +1,283 @@
+"""Stores the rows of the aircraft database in a compact form.
+
+Classes:
+    RowView: A read only dictionary view of a single row.
+    StringPool: Shares a single string object between the equal values of the columns which repeat the same few values.
+    RowStore: Stores rows as lists of values which share a single schema.
+"""
+
+from array import array
+from bisect import bisect_left
+from itertools import chain
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional
+
+import constants
+
+# The mask selecting the row position of a sorted index entry
+POSITION_MASK = (1 << constants.ROW_INDEX_POSITION_BITS) - 1
+
+class RowView(Mapping[str, str]):
+    """A read only dictionary view of a single row.
+
+    Args:
+        schema (Dict[str, int]): The mapping of fieldnames to column indexes.
+        row (List[str]): The values of the row.
+    """
+    __slots__ = ('schema', 'row')
+
+    def __init__(self, schema: Dict[str, int], row: List[str]) -> None:
+        self.schema = schema
+        self.row = row
+
+    def __getitem__(self, field: str) -> str:
+        return self.row[self.schema[field]]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.schema)
+
+    def __len__(self) -> int:
+        return len(self.schema)
+
+class StringPool:
+    """Shares a single string object between the equal values of the columns which repeat the same few values.
+
+    Fields such as the manufacturer, model and country hold a few thousand different values across hundreds of thousands of rows, but each value read from a file is a new string. Replacing each value with the first equal value seen keeps a single copy of it, and the marshal format of the parsed file cache stores a shared string once, so rows loaded from the cache share their values too.
+
+    Only the fields in constants.POOLED_FIELDS are pooled. The fields which identify a single aircraft or its owner and operator, such as the Mode S ID, registration, addresses and dates, are almost all different, so pooling them would keep a pool entry for almost every value.
+
+    Args:
+        fieldnames (Iterable[str]): The fieldnames of the rows, in column order.
+    """
+    def __init__(self, fieldnames: Iterable[str]) -> None:
+        # Find the pooled columns, as a list and as a bit mask with bit n set if column n is pooled
+        self.columns = [column for column, field in enumerate(fieldnames) if field in constants.POOLED_FIELDS]
+        self.mask = sum(1 << column for column in self.columns)
+
+        # Initialise the pooled values, each maps to itself
+        self.values: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def pool_row(self, values: List[str]) -> None:
+        """Replaces the values of the pooled columns of a row with the pooled values.
+
+        Args:
+            values (List[str]): The values of the row, which are replaced in place.
+        """
+        pool_value = self.values.setdefault
+
+        for column in self.columns:
+            value = values[column]
+            values[column] = pool_value(value, value)
+
+    def pool_changed_values(self, values: List[str], changed: int) -> None:
+        """Replaces the changed values of the pooled columns of a row with the pooled values.
+
+        Args:
+            values (List[str]): The values of the row, which are replaced in place.
+            changed (int): The bit mask of the columns whose value changed, bit n is set if column n changed.
+        """
+        pool_value = self.values.setdefault
+        columns = changed & self.mask
+
+        # Visit the set bits from the lowest
+        while columns:
+            bit = columns & -columns
+            column = bit.bit_length() - 1
+            value = values[column]
+            values[column] = pool_value(value, value)
+            columns ^= bit
+
+class RowStore:
+    """Stores rows as lists of values which share a single schema.
+
+    Storing each row as a dictionary repeats the fieldnames and a hash table for every row, a single schema mapping the fieldnames to column indexes is shared by all the rows instead.
+
+    Each row is keyed by the 24-bit ICAO address held in its Mode S ID, so rows whose Mode S IDs differ only in case or padding share a key.
+
+    Rows added one at a time, as the current file is read and the new file is merged, are indexed by a dictionary so each join is a single hash lookup. Rows restored from the cache or built by the columnar engine, and the rows of a store compacted for lookups, are indexed by a sorted array of entries instead, each holding an address in its high bits and the position of its row in the low bits, which is searched with bisect. The array takes 12 bytes per row with the address of each row in row order, a dictionary holds an int object for each address and each position as well as its hash table, about 90 bytes per row.
+
+    Rows are kept in the order their key was first added, replacing the row for an existing key keeps its position, which matches the behaviour of a dictionary.
+
+    The values of the fields which repeat the same few values are shared through a string pool by the code adding and changing rows, rows restored from another store are used as they are.
+
+    Args:
+        fieldnames (Iterable[str]): The fieldnames of the rows, in column order.
+    """
+    def __init__(self, fieldnames: Iterable[str]) -> None:
+        # Store the fieldnames and create the schema
+        self.fieldnames = list(fieldnames)
+        self.schema = {field: column for column, field in enumerate(self.fieldnames)}
+
+        # Create the pool of repeated values
+        self.pool = StringPool(self.fieldnames)
+
+        # Initialise the rows and the index of the keys of the rows added one at a time to their positions
+        self.rows: List[List[str]] = []
+        self.index: Dict[int, int] = {}
+
+        # Initialise the keys of the rows before them, in row order, and their sorted index entries, each the key shifted above the position of its row
+        self.keys = array('I')
+        self.entries = array('Q')
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, int) and self.position(key) is not None
+
+    def __iter__(self) -> Iterator[int]:
+        return chain(self.keys, self.index)
+
+    def __getitem__(self, key: int) -> RowView:
+        position = self.position(key)
+
+        if position is None:
+            raise KeyError(key)
+
+        return RowView(self.schema, self.rows[position])
+
+    def position(self, key: int) -> Optional[int]:
+        """Finds the position of a row in the store.
+
+        Args:
+            key (int): The ICAO address of the row.
+
+        Returns:
+            Optional[int]: The index of the row in rows, or None if there is no row with the key.
+        """
+        position = self.index.get(key)
+
+        return position if position is not None or not self.entries else self.find_entry(key)
+
+    def find_entry(self, key: int) -> Optional[int]:
+        """Finds the position of a row in the sorted index entries.
+
+        Args:
+            key (int): The ICAO address of the row.
+
+        Returns:
+            Optional[int]: The index of the row in rows, or None if there is no entry with the key.
+        """
+        # Search the sorted entries for the first entry with the address
+        entries = self.entries
+        index = bisect_left(entries, key << constants.ROW_INDEX_POSITION_BITS)
+
+        if index < len(entries):
+            entry = entries[index]
+
+            if entry >> constants.ROW_INDEX_POSITION_BITS == key:
+                return entry & POSITION_MASK
+
+        return None
+
+    def get_row(self, key: int) -> Optional[List[str]]:
+        """Gets the values of a row.
+
+        Args:
+            key (int): The ICAO address of the row.
+
+        Returns:
+            Optional[List[str]]: The values of the row, which can be modified in place, or None if there is no row with the key.
+        """
+        position = self.index.get(key)
+
+        if position is None and self.entries:
+            position = self.find_entry(key)
+
+        return None if position is None else self.rows[position]
+
+    def set_row(self, key: int, values: List[str]) -> None:
+        """Adds a row, replacing the existing row with the same key.
+
+        Args:
+            key (int): The ICAO address of the row.
+            values (List[str]): The values of the row, in schema order.
+        """
+        position = self.index.get(key)
+
+        if position is None and self.entries:
+            position = self.find_entry(key)
+
+        if position is None:
+            # Add the row to the end of the store
+            self.index[key] = len(self.rows)
+            self.rows.append(values)
+        else:
+            # Replace the existing row
+            self.rows[position] = values
+
+    def restore_rows(self, rows: List[List[str]], keys: Iterable[int]) -> None:
+        """Replaces the rows with rows taken from another store with the same fieldnames, indexing them with sorted entries.
+
+        Args:
+            rows (List[List[str]]): The rows, in order, with one row for each key.
+            keys (Iterable[int]): The ICAO address of each row, in the same order, with no address repeated.
+        """
+        self.rows = rows
+        self.index = {}
+        self.keys = array('I', keys)
+
+        # Sort the index entries of the rows
+        bits = constants.ROW_INDEX_POSITION_BITS
+        self.entries = array('Q', sorted([key << bits | position for position, key in enumerate(self.keys)]))
+
+    def compact(self) -> None:
+        """Moves the rows added one at a time into the sorted index entries, once no more rows will be added, so the index takes less memory."""
+        if not self.index:
+            return
+
+        # Append the keys in row order and merge the new entries into the sorted entries
+        bits = constants.ROW_INDEX_POSITION_BITS
+        self.keys.extend(self.index)
+        entries = self.entries.tolist()
+        entries.extend([key << bits | position for key, position in self.index.items()])
+        entries.sort()
+
+        # Replace the sorted entries and empty the dictionary
+        self.entries = array('Q', entries)
+        self.index = {}
+
+    def positions_in_key_order(self) -> List[int]:
+        """Gets the position of each row, in order of their ICAO addresses.
+
+        Returns:
+            List[int]: The positions of the rows, sorted by address.
+        """
+        # Each row is indexed by either the dictionary or the sorted entries, a store built one row at a time only has the dictionary
+        if not self.entries:
+            return [position for _, position in sorted(self.index.items())]
+
+        bits = constants.ROW_INDEX_POSITION_BITS
+        entries = self.entries.tolist()
+        entries.extend([key << bits | position for key, position in self.index.items()])
+        entries.sort()
+
+        return [entry & POSITION_MASK for entry in entries]
+
+    def add_empty_row(self, key: int) -> List[str]:
+        """Adds a row with every value empty.
+
+        Args:
+            key (int): The ICAO address of the row, which must not already be in the store.
+
+        Returns:
+            List[str]: The values of the new row, which can be modified in place.
+        """
+        values = [''] * len(self.fieldnames)
+
+        self.index[key] = len(self.rows)
+        self.rows.append(values)
+
+        return values
+
+    def values(self) -> Iterator[RowView]:
+        """Iterates over dictionary views of the rows.
+
+        Returns:
+            Iterator[RowView]: A view of each row, in order.
+        """
+        schema = self.schema
+
+        return (RowView(schema, values) for values in self.rows)
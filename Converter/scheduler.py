@@ -0,0 +1,176 @@
+"""Splits each time slice of the Converter into batches sized from the measured throughput.
+
+Checking the clock after every row costs more than some of the rows themselves, so the phases process rows in batches and only check the clock between batches. The size of each batch is worked out from how long the previous batches took, so each time slice still ends close to its target.
+
+Classes:
+    SliceStats: The durations of the time slices run for a phase.
+    BatchScheduler: Splits each time slice into batches sized from the measured throughput.
+"""
+
+import time
+from datetime import timedelta
+from typing import Dict, Optional
+
+import constants
+
+class SliceStats:
+    """The durations of the time slices run for a phase.
+
+    Attributes:
+        slices (int): The number of time slices run.
+        total (float): The total duration of the time slices in seconds.
+        shortest (float): The duration of the shortest time slice in seconds.
+        longest (float): The duration of the longest time slice in seconds.
+        overruns (int): The number of time slices which ran for longer than the target plus the allowed overrun.
+        units (int): The number of units of work, such as rows, processed.
+    """
+    def __init__(self) -> None:
+        self.slices = 0
+        self.total = 0.0
+        self.shortest = 0.0
+        self.longest = 0.0
+        self.overruns = 0
+        self.units = 0
+
+    @property
+    def mean(self) -> float:
+        """The mean duration of the time slices in seconds, 0 if none have been run."""
+        return self.total / self.slices if self.slices else 0
+
+    def record(self, duration: float, units: int, overrun: bool) -> None:
+        """Records a completed time slice.
+
+        Args:
+            duration (float): The duration of the time slice in seconds.
+            units (int): The number of units of work processed in the time slice.
+            overrun (bool): Whether the time slice ran for too long.
+        """
+        self.shortest = duration if self.slices == 0 else min(self.shortest, duration)
+        self.longest = max(self.longest, duration)
+        self.slices += 1
+        self.total += duration
+        self.units += units
+        self.overruns += overrun
+
+    def __str__(self) -> str:
+        return f'{self.slices} slices, mean {self.mean * 1000:.1f} ms, shortest {self.shortest * 1000:.1f} ms, longest {self.longest * 1000:.1f} ms, {self.overruns} overruns, {self.units} units'
+
+class BatchScheduler:
+    """Splits each time slice into batches sized from the measured throughput.
+
+    One scheduler is shared by all the phases of a Converter, the throughput is measured separately for each phase as the cost of a row differs between them.
+
+    Args:
+        time_slice (Optional[timedelta]): The target duration of each time slice, None runs each phase to completion in a single slice.
+
+    Attributes:
+        batch_size (int): The number of units of work to process in the current batch.
+        stats (Dict[str, SliceStats]): The durations of the time slices run for each phase.
+    """
+    def __init__(self, time_slice: Optional[timedelta]) -> None:
+        # Store the target duration of a time slice in seconds
+        self.target = time_slice.total_seconds() if time_slice is not None else None
+
+        # Initialise the throughput measurements
+        self.phase = ''
+        self.batch_size = constants.INITIAL_BATCH_SIZE
+        self.seconds_per_unit: Optional[float] = None
+
+        # Initialise the times of the current slice and batch
+        self.slice_start = 0.0
+        self.batch_start = 0.0
+        self.slice_units = 0
+        self.batch_running = False
+
+        # Initialise the stats of each phase
+        self.stats: Dict[str, SliceStats] = {}
+
+    def start_slice(self, phase: str) -> None:
+        """Starts a time slice.
+
+        Args:
+            phase (str): The name of the phase the slice belongs to, the throughput measurements are reset when the phase changes.
+        """
+        # Reset the throughput measurements if this is a new phase
+        if phase != self.phase:
+            self.phase = phase
+            self.batch_size = constants.INITIAL_BATCH_SIZE if self.target is not None else constants.MAX_BATCH_SIZE
+            self.seconds_per_unit = None
+            self.stats.setdefault(phase, SliceStats())
+
+        # Record the start of the slice
+        self.slice_start = time.monotonic()
+        self.slice_units = 0
+        self.batch_running = False
+
+    def next_batch(self) -> bool:
+        """Finishes the current batch and decides whether to run another.
+
+        The previous batch is assumed to have processed batch_size units, if it processed fewer the phase has usually finished and the loop will stop anyway.
+
+        Returns:
+            bool: True if another batch should be run, with batch_size set to its size, False if the time slice is over.
+        """
+        # Get the time
+        now = time.monotonic()
+
+        # Measure the throughput of the batch which has just finished
+        if self.batch_running:
+            self.slice_units += self.batch_size
+            seconds_per_unit = (now - self.batch_start) / self.batch_size
+
+            # Smooth the measurement to avoid reacting to a single slow batch
+            if self.seconds_per_unit is None:
+                self.seconds_per_unit = seconds_per_unit
+            else:
+                self.seconds_per_unit += (seconds_per_unit - self.seconds_per_unit) * constants.BATCH_SMOOTHING
+
+            # Work out the size of the next batch
+            if self.target is not None:
+                # Check if the slice is over
+                remaining = self.target - (now - self.slice_start)
+
+                if remaining <= 0:
+                    return False
+
+                # Aim for several batches per slice, with the last batch ending close to the end of the slice
+                batch_time = min(remaining, self.target * constants.BATCH_TARGET_FRACTION)
+                batch_size = int(batch_time / self.seconds_per_unit) if self.seconds_per_unit > 0 else constants.MAX_BATCH_SIZE
+
+                # Grow the batch gradually, but shrink it straight away
+                self.batch_size = max(1, min(batch_size, self.batch_size * 2, constants.MAX_BATCH_SIZE))
+
+        # Start the next batch
+        self.batch_start = now
+        self.batch_running = True
+
+        return True
+
+    def time_remaining(self) -> Optional[float]:
+        """Calculates how much of the time slice is left.
+
+        Returns:
+            Optional[float]: The number of seconds left in the slice, None if there is no time slice.
+        """
+        if self.target is None:
+            return None
+
+        return max(self.target - (time.monotonic() - self.slice_start), 0)
+
+    def end_slice(self, units: Optional[int] = None) -> None:
+        """Ends the time slice and records its duration.
+
+        Args:
+            units (Optional[int]): The number of units of work processed in the slice, None to use the number counted from the batches.
+        """
+        # Measure the slice
+        duration = time.monotonic() - self.slice_start
+        overrun = self.target is not None and duration > self.target * (1 + constants.ALLOWED_SLICE_OVERRUN)
+
+        # Count the final batch, which may have been cut short
+        if units is None:
+            units = self.slice_units + (self.batch_size if self.batch_running else 0)
+
+        # Record the slice
+        self.stats[self.phase].record(duration, units, overrun)
+        self.batch_running = False
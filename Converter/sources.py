@@ -0,0 +1,170 @@
+"""Describes the new files merged by a conversion and records the changes each of them made.
+
+A conversion can merge several new files into the current file, for example OpenSky and two other registries. The current file is read once, each new file is merged in turn and the output is written once, which gives the same output as running a conversion for each new file with the output of one as the current file of the next.
+
+Classes:
+    NewFileSource: A new file merged into the current file, with its delimiter and mapping.
+    SourceChanges: The rows and fields of the current file changed by one new file.
+"""
+
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, NamedTuple, Sequence, Set, TYPE_CHECKING
+
+from .icao import format_icao24
+
+if TYPE_CHECKING:
+    from .row_store import RowStore
+
+class NewFileSource(NamedTuple):
+    """A new file merged into the current file, with its delimiter and mapping.
+
+    Attributes:
+        path (Path): The path of the new file, or '-' for standard input.
+        delimiter (str): The delimiter of the new file.
+        mapping (Dict[str, str]): The mapping of the IRCA fieldnames to the new file's fieldnames.
+    """
+    path: Path
+    delimiter: str
+    mapping: Dict[str, str]
+
+class SourceChanges:
+    """The rows and fields of the current file changed by one new file.
+
+    The fields changed in each row are held as a bit mask of the columns of the row store, so recording a change is a single dictionary update however many fields it covers.
+
+    Rows are identified by their ICAO address, and reported with their address as a Mode S ID of six uppercase hexadecimal digits.
+
+    A field only counts as changed if its value once the new file has been merged differs from its value before, so an address which appears several times in the new file and changes a value back is not recorded, however the rows of the new file are grouped as they are merged.
+
+    Args:
+        source (NewFileSource): The new file.
+        fieldnames (List[str]): The fieldnames of the row store, in column order.
+
+    Attributes:
+        added (List[int]): The addresses of the rows the new file added, in the order they were added.
+        changed (Dict[int, int]): The bit mask of the columns whose value the new file changed, for each address.
+        previous_rows (Dict[int, Sequence[str]]): The values of each row before the new file first merged into it, empty for the rows it added, only held until finish is called.
+        lines_read (int): The number of lines of the new file merged.
+    """
+    def __init__(self, source: NewFileSource, fieldnames: List[str]) -> None:
+        self.source = source
+        self.fieldnames = fieldnames
+
+        # Initialise the rows added and the fields changed in each row
+        self.added: List[int] = []
+        self.changed: Dict[int, int] = {}
+        self.previous_rows: Dict[int, Sequence[str]] = {}
+
+        # Initialise the addresses changed more than once, only these can have been changed back
+        self.repeated: Set[int] = set()
+
+        # Create the values of an added row before the new file was merged, shared by every added row
+        self.empty_row = [''] * len(fieldnames)
+
+        # Initialise the number of lines merged
+        self.lines_read = 0
+
+    def add_row(self, key: int) -> None:
+        """Records a row added by the new file.
+
+        Args:
+            key (int): The ICAO address of the row.
+        """
+        self.added.append(key)
+        self.previous_rows[key] = self.empty_row
+
+    def change_fields(self, key: int, columns: int) -> None:
+        """Records the fields of a row changed by the new file.
+
+        Args:
+            key (int): The ICAO address of the row.
+            columns (int): The bit mask of the columns whose value changed, bit n is set if column n changed.
+        """
+        previous_columns = self.changed.get(key)
+
+        if previous_columns is None:
+            self.changed[key] = columns
+        else:
+            self.changed[key] = previous_columns | columns
+            self.repeated.add(key)
+
+    def finish(self, rows: 'RowStore', target_columns: List[int]) -> None:
+        """Removes the changes which were undone by a later row of the new file, once it has been merged.
+
+        Args:
+            rows (RowStore): The row store the new file was merged into.
+            target_columns (List[int]): The columns the mapping of the new file can change.
+        """
+        for key in self.repeated:
+            previous_values = self.previous_rows[key]
+            current_values = rows.get_row(key) or previous_values
+
+            # Keep the columns whose value still differs from the value before the new file was merged
+            columns = sum(1 << column for column in target_columns if previous_values[column] != current_values[column])
+
+            if columns:
+                self.changed[key] = columns
+            else:
+                del self.changed[key]
+
+        # Release the previous values
+        self.previous_rows = {}
+        self.repeated = set()
+
+    @staticmethod
+    def columns(mask: int) -> Iterator[int]:
+        """Gets the columns set in a bit mask.
+
+        Args:
+            mask (int): The bit mask.
+
+        Returns:
+            Iterator[int]: The index of each column whose bit is set, in order.
+        """
+        column = 0
+
+        while mask:
+            if mask & 1:
+                yield column
+
+            mask >>= 1
+            column += 1
+
+    def changed_fields(self, key: int) -> List[str]:
+        """Gets the fields of a row changed by the new file.
+
+        Args:
+            key (int): The ICAO address of the row.
+
+        Returns:
+            List[str]: The fieldnames, in column order, empty if the new file did not change the row.
+        """
+        return [self.fieldnames[column] for column in self.columns(self.changed.get(key, 0))]
+
+    def field_counts(self) -> Dict[str, int]:
+        """Counts the rows in which the new file changed each field.
+
+        Returns:
+            Dict[str, int]: The number of rows changed for each field the new file changed, in column order.
+        """
+        counts = [0] * len(self.fieldnames)
+
+        for columns in self.changed.values():
+            for column in self.columns(columns):
+                counts[column] += 1
+
+        return {field: count for field, count in zip(self.fieldnames, counts) if count}
+
+    def report(self) -> Dict[str, Any]:
+        """Gets the changes as a dictionary which can be saved as JSON.
+
+        Returns:
+            Dict[str, Any]: The new file, the number of lines merged, the Mode S IDs of the rows added, the number of rows changed for each field and the fields changed in each row, sorted by address so every engine gives the same report.
+        """
+        return {
+            'new_file': str(self.source.path),
+            'lines_read': self.lines_read,
+            'rows_added': [format_icao24(key) for key in self.added],
+            'field_counts': self.field_counts(),
+            'rows_changed': {format_icao24(key): self.changed_fields(key) for key in sorted(self.changed)},
+        }
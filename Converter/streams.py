@@ -0,0 +1,287 @@
+"""Opens the files read and written by the Converter.
+
+A path of '-' refers to standard input or standard output, this allows the Converter to be used in shell pipelines.
+
+Input files can be compressed with zip, gzip, bzip2 or xz, the format is detected from the first bytes of the file and the file is decompressed as it is read rather than extracted to disk first.
+
+The rows read from a file are created in bulk by the readers and the cache, paused_gc pauses the garbage collector while they are.
+
+Classes:
+    CountingReader: A binary file which counts the bytes read from it.
+    InputFile: A text file opened for reading which reports how much of it has been read.
+
+Functions:
+    is_standard_stream: Checks if a path refers to standard input or standard output.
+    file_fingerprint: Identifies the version of a file from its path, size and modification time.
+    detect_compression: Detects the compression format of a file from its first bytes.
+    open_decompressed: Opens a stream which decompresses a compressed file as it is read.
+    open_input_file: Opens an input file for reading.
+    open_output_file: Opens the output file for writing.
+    paused_gc: Pauses the garbage collector while many rows are created at once.
+"""
+
+import bz2
+import gc
+import gzip
+import io
+import lzma
+import os
+import stat
+import sys
+import zipfile
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional, TextIO, Tuple
+
+import constants
+
+# The errors raised when a compressed file is corrupt, in addition to OSError and ValueError
+DECOMPRESSION_ERRORS = (EOFError, zipfile.BadZipFile, lzma.LZMAError, zlib.error)
+
+class CountingReader(io.RawIOBase):
+    """A binary file which counts the bytes read from it.
+
+    Used to report the progress of reading a compressed file from the number of compressed bytes consumed by the decompressor.
+
+    Args:
+        binary_file (BinaryIO): The file to read from.
+    """
+    def __init__(self, binary_file: BinaryIO) -> None:
+        super().__init__()
+
+        # Store the file and initialise the number of bytes read
+        self.binary_file = binary_file
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: bytearray) -> int: # type: ignore[override]
+        # Read from the file, counting the bytes read
+        bytes_read = self.binary_file.readinto(buffer) # type: ignore[attr-defined]
+        self.bytes_read += bytes_read
+
+        return bytes_read
+
+    def seekable(self) -> bool:
+        return self.binary_file.seekable()
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        return self.binary_file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self.binary_file.tell()
+
+class InputFile(io.TextIOWrapper):
+    """A text file opened for reading which reports how much of it has been read.
+
+    Progress is calculated from the position of the underlying binary file, so the file does not have to be read in advance to count its lines. For compressed files it is calculated from the number of compressed bytes read.
+
+    Args:
+        binary_file (BinaryIO): The binary file to decode.
+        size (int): The size of the file in bytes, 0 if it is not known.
+        compression (Optional[str]): The compression format of the file, None if it is not compressed.
+        counter (Optional[CountingReader]): Counts the compressed bytes read, if the file is compressed.
+        underlying_files (Optional[List[BinaryIO]]): Files to close along with this one, such as the compressed file.
+    """
+    def __init__(self, binary_file: BinaryIO, size: int, compression: Optional[str] = None, counter: Optional[CountingReader] = None, underlying_files: Optional[List[BinaryIO]] = None) -> None:
+        super().__init__(binary_file, encoding='utf-8', newline='')
+
+        # Store the size of the file
+        self.size = size
+
+        # Store the compression format and the counter of compressed bytes
+        self.compression = compression
+        self.counter = counter
+
+        # Store the files to close along with this one
+        self.underlying_files = underlying_files or []
+
+        # Initialise the percentage read, this is used to ensure the reported progress never goes backwards
+        self.last_percentage = 0.0
+
+    def close(self) -> None:
+        """Closes the file along with any underlying files."""
+        super().close()
+
+        for underlying_file in self.underlying_files:
+            underlying_file.close()
+
+    def percentage_read(self) -> float:
+        """Calculates the percentage of the file that has been read.
+
+        Returns:
+            float: The percentage of the file read, 0 until the file is closed if the size of the file is not known.
+        """
+        # The whole file has been read once it is closed
+        if self.closed:
+            return 100
+
+        # The size of pipes is not known
+        if self.size == 0:
+            return 0
+
+        # Calculate the percentage from the number of bytes consumed by the decoder, or by the decompressor for compressed files
+        position = self.counter.bytes_read if self.counter is not None else self.buffer.tell()
+        percentage = min(position / self.size, 1) * 100
+
+        # Never report less progress than last time
+        self.last_percentage = max(self.last_percentage, percentage)
+
+        # Return the percentage
+        return self.last_percentage
+
+def is_standard_stream(path: Path) -> bool:
+    """Checks if a path refers to standard input or standard output.
+
+    Args:
+        path (Path): The path to check.
+
+    Returns:
+        bool: True if the path refers to standard input or standard output, False otherwise.
+    """
+    return str(path) == constants.STANDARD_STREAM_PATH
+
+def file_fingerprint(path: Path) -> Tuple[str, int, int]:
+    """Identifies the version of a file from its path, size and modification time.
+
+    Args:
+        path (Path): The path of the file.
+
+    Returns:
+        Tuple[str, int, int]: The absolute path, the size in bytes and the modification time in nanoseconds.
+    """
+    file_status = path.stat()
+
+    return str(path.resolve()), file_status.st_size, file_status.st_mtime_ns
+
+def detect_compression(binary_file: io.BufferedReader) -> Optional[str]:
+    """Detects the compression format of a file from its first bytes.
+
+    Args:
+        binary_file (io.BufferedReader): The file, which is not moved.
+
+    Returns:
+        Optional[str]: The compression format, one of the values of constants.COMPRESSION_SIGNATURES, None if the file is not compressed.
+    """
+    # Look at the start of the file without consuming it, this also works for pipes
+    start = binary_file.peek(max(len(signature) for signature in constants.COMPRESSION_SIGNATURES))
+
+    for signature, compression in constants.COMPRESSION_SIGNATURES.items():
+        if start.startswith(signature):
+            return compression
+
+    return None
+
+def open_decompressed(path: Path, counter: CountingReader, compression: str) -> Tuple[BinaryIO, List[BinaryIO]]:
+    """Opens a stream which decompresses a compressed file as it is read.
+
+    Args:
+        path (Path): The path of the file, used in error messages.
+        counter (CountingReader): The compressed file.
+        compression (str): The compression format of the file.
+
+    Returns:
+        Tuple[BinaryIO, List[BinaryIO]]: The decompressed stream and any files which need closing along with it.
+
+    Raises:
+        ValueError: If a zip archive is read from standard input or does not contain exactly one file.
+    """
+    if compression == constants.GZIP_COMPRESSION:
+        return gzip.GzipFile(fileobj=counter, mode='rb'), [] # type: ignore[return-value]
+
+    if compression == constants.BZIP2_COMPRESSION:
+        return bz2.BZ2File(counter, mode='rb'), [] # type: ignore[return-value]
+
+    if compression == constants.XZ_COMPRESSION:
+        return lzma.LZMAFile(counter, mode='rb'), [] # type: ignore[return-value]
+
+    # The directory of a zip archive is at the end, so the archive has to be seekable
+    if not counter.seekable():
+        raise ValueError('Zip archives cannot be read from standard input')
+
+    archive = zipfile.ZipFile(counter) # type: ignore[arg-type]
+
+    # Find the file in the archive, ignoring directories and the resource forks added by macOS
+    members = [member for member in archive.infolist() if not member.is_dir() and not member.filename.startswith('__MACOSX/') and not Path(member.filename).name.startswith('.')]
+
+    if len(members) != 1:
+        archive.close()
+        raise ValueError(f'{path} must contain exactly one file, it contains {len(members)}')
+
+    return archive.open(members[0]), [archive] # type: ignore[return-value]
+
+def open_input_file(path: Path) -> InputFile:
+    """Opens an input file for reading.
+
+    Compressed files are decompressed as they are read.
+
+    Args:
+        path (Path): The path of the file, or '-' for standard input.
+
+    Returns:
+        InputFile: The opened file.
+    """
+    # Open the file in binary mode, wrapping standard input without taking ownership of the file descriptor
+    if is_standard_stream(path):
+        binary_file = open(sys.stdin.fileno(), 'rb', closefd=False)
+    else:
+        binary_file = open(path, 'rb')
+
+    # Get the size of the file, standard input may be a pipe which has no size
+    file_status = os.fstat(binary_file.fileno())
+    size = file_status.st_size if stat.S_ISREG(file_status.st_mode) else 0
+
+    # Check if the file is compressed
+    compression = detect_compression(binary_file)
+
+    if compression is None:
+        # Return the file wrapped for reading as text
+        return InputFile(binary_file, size)
+
+    # Decompress the file as it is read, counting the compressed bytes read to report progress
+    counter = CountingReader(binary_file)
+
+    try:
+        decompressed_file, underlying_files = open_decompressed(path, counter, compression)
+    except BaseException:
+        binary_file.close()
+        raise
+
+    # Return the decompressed file wrapped for reading as text
+    return InputFile(decompressed_file, size, compression, counter, underlying_files + [binary_file])
+
+def open_output_file(path: Path) -> TextIO:
+    """Opens the output file for writing.
+
+    Args:
+        path (Path): The path of the file, or '-' for standard output.
+
+    Returns:
+        TextIO: The opened file.
+    """
+    # Wrap standard output without taking ownership of the file descriptor
+    if is_standard_stream(path):
+        return open(sys.stdout.fileno(), 'w', encoding='utf-8', newline='', closefd=False)
+
+    # Open the file
+    return open(path, 'w', encoding='utf-8', newline='')
+
+@contextmanager
+def paused_gc() -> Iterator[None]:
+    """Pauses the garbage collector while many rows are created at once.
+
+    Each new list counts towards the next collection, so creating hundreds of thousands of rows would otherwise start many collections which repeatedly scan the lists already created.
+
+    Returns:
+        Iterator[None]: A context manager, the garbage collector is enabled again on leaving it if it was enabled on entering it.
+    """
+    gc_enabled = gc.isenabled()
+    gc.disable()
+
+    try:
+        yield
+    finally:
+        if gc_enabled:
+            gc.enable()
@@ -0,0 +1,115 @@
+"""Runs a conversion on a background thread.
+
+Classes:
+    WorkerMessage: A progress or completion message sent by the worker.
+    ConversionWorker: Runs the phases of a Converter on a background thread.
+"""
+
+import logging
+import queue
+import threading
+from typing import Callable, NamedTuple, Tuple
+
+from .converter import Converter
+
+import constants
+
+class WorkerMessage(NamedTuple):
+    """A progress or completion message sent by the worker.
+
+    Attributes:
+        phase (str): The phase the message relates to, one of the phase or conversion constants.
+        percentage (float): The percentage of the phase that has been completed.
+        error (str): A description of the error if the conversion failed.
+    """
+    phase: str
+    percentage: float = 0
+    error: str = ''
+
+class ConversionWorker(threading.Thread):
+    """Runs the phases of a Converter on a background thread.
+
+    Progress is reported by putting WorkerMessages on the message queue after each time slice of the converter, so cancelling stops the worker within one time slice.
+
+    Args:
+        converter (Converter): The converter to run.
+        message_queue (queue.Queue[WorkerMessage]): The queue to send progress and completion messages to.
+    """
+    def __init__(self, converter: Converter, message_queue: 'queue.Queue[WorkerMessage]') -> None:
+        super().__init__(name='ConversionWorker', daemon=True)
+
+        # Store the converter and the queue
+        self.converter = converter
+        self.message_queue = message_queue
+
+        # Create the event used to cancel the conversion
+        self.cancel_event = threading.Event()
+
+    def cancel(self) -> None:
+        """Asks the worker to stop at the end of the current time slice."""
+        self.cancel_event.set()
+
+    def run(self) -> None:
+        """Runs the conversion, sending a completion message when it ends."""
+        try:
+            # Run each of the phases in turn
+            for phase, initialise, step in (
+                (constants.READ_CURRENT_FILE_PHASE, self.converter.initialise_current_file, self.converter.read_current_file),
+                (constants.MERGE_NEW_FILE_PHASE, self.converter.initialise_new_file, self.converter.merge_new_file),
+                (constants.WRITE_OUTPUT_FILE_PHASE, self.converter.initialise_output_file, self.converter.write_output_file),
+            ):
+                if not self.run_phase(phase, initialise, step):
+                    # Close the files
+                    self.converter.conversion_cancelled()
+
+                    # Tell the dialog the conversion has been cancelled
+                    self.message_queue.put(WorkerMessage(constants.CONVERSION_CANCELLED))
+
+                    return
+
+        except Exception as error: # pylint: disable=broad-except
+            # Log the error
+            logging.exception('Conversion failed')
+
+            # Close the files
+            self.converter.conversion_cancelled()
+
+            # Tell the dialog the conversion has failed
+            self.message_queue.put(WorkerMessage(constants.CONVERSION_FAILED, error=str(error)))
+
+        else:
+            # Tell the dialog the conversion is complete
+            self.message_queue.put(WorkerMessage(constants.CONVERSION_COMPLETE, 100))
+
+    def run_phase(self, phase: str, initialise: Callable[[], None], step: Callable[[], Tuple[float, bool]]) -> bool:
+        """Runs one phase of the conversion.
+
+        Args:
+            phase (str): The name of the phase.
+            initialise (Callable[[], None]): Initialises the phase.
+            step (Callable[[], Tuple[float, bool]]): Runs one time slice of the phase.
+
+        Returns:
+            bool: True if the phase completed, False if it was cancelled.
+        """
+        # Initialise the phase
+        initialise()
+
+        while not self.cancel_event.is_set():
+            # Run one time slice
+            percentage, still_running = step()
+
+            if still_running:
+                # Report the progress
+                self.message_queue.put(WorkerMessage(phase, percentage))
+            else:
+                # Report that the phase is complete
+                self.message_queue.put(WorkerMessage(phase, 100))
+
+                # Log how closely the time slices matched their target
+                logging.debug('%s time slices: %s', phase, self.converter.batch_scheduler.stats.get(phase, 'none'))
+
+                return True
+
+        # The phase was cancelled
+        return False
@@ -0,0 +1,140 @@
+"""Writes the rows of the output file in batches.
+
+Classes:
+    RowFormatter: Formats rows of the output file as lines of text.
+    RowWriter: Writes rows to the output file in batches.
+"""
+
+import csv
+import io
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Sequence, TextIO, TYPE_CHECKING
+
+import constants
+
+if TYPE_CHECKING:
+    from .output_index import OutputIndexWriter
+
+class RowFormatter:
+    """Formats rows of the output file as lines of text.
+
+    The output matches csv.writer with the default dialect and the given delimiter. Most rows contain no quotes, newlines or delimiters within their values, so they are joined directly, only the remaining rows are passed through csv.writer.
+
+    Args:
+        fieldnames (Sequence[str]): The fieldnames of the output file, every row is expected to have one value for each.
+        delimiter (str): The delimiter of the output file.
+
+    Raises:
+        ValueError: If the delimiter is not a single character or there are no fieldnames.
+    """
+    # The line terminator written by csv.writer
+    line_terminator = '\r\n'
+
+    def __init__(self, fieldnames: Sequence[str], delimiter: str) -> None:
+        # Check the schema once, rather than on every row
+        if len(delimiter) != 1:
+            raise ValueError(f'The output delimiter must be a single character, not {delimiter!r}')
+
+        if not fieldnames:
+            raise ValueError('The output file must have at least one field')
+
+        # Store the delimiter and the number of delimiters in a line whose values do not contain the delimiter
+        self.delimiter = delimiter
+        self.delimiter_count = len(fieldnames) - 1
+
+        # Create the csv writer used for rows which need quoting
+        self.line_buffer = io.StringIO()
+        self.line_writer = csv.writer(self.line_buffer, delimiter=delimiter, lineterminator=self.line_terminator)
+
+    def format_row(self, row: Sequence[str]) -> str:
+        """Formats a row as a line, without the line terminator.
+
+        Args:
+            row (Sequence[str]): The values of the row in fieldname order.
+
+        Returns:
+            str: The line.
+        """
+        # Join the values directly
+        line = self.delimiter.join(row)
+
+        # Use the line as it is unless a value needs quoting or the row is the wrong length
+        if line.count(self.delimiter) == self.delimiter_count and '"' not in line and '\n' not in line and '\r' not in line:
+            return line
+
+        # Let csv.writer quote the values
+        self.line_buffer.seek(0)
+        self.line_buffer.truncate()
+        self.line_writer.writerow(row)
+
+        return self.line_buffer.getvalue()[:-len(self.line_terminator)]
+
+    def format_rows(self, rows: Iterable[Sequence[str]]) -> str:
+        """Formats several rows as lines.
+
+        Args:
+            rows (Iterable[Sequence[str]]): The rows.
+
+        Returns:
+            str: The lines, each followed by the line terminator.
+        """
+        lines = [self.format_row(row) for row in rows]
+
+        # Return the lines with a terminator after each, including the last
+        return self.line_terminator.join(lines) + self.line_terminator if lines else ''
+
+class RowWriter(RowFormatter):
+    """Writes rows to the output file in batches.
+
+    Args:
+        output_file (TextIO): The output file, opened with newline=''.
+        fieldnames (Sequence[str]): The fieldnames of the output file.
+        delimiter (str): The delimiter of the output file.
+        batch_size (int): The number of rows formatted and written in each batch.
+
+    Attributes:
+        index (Optional[OutputIndexWriter]): The index recording the offset of each row written, None if the rows are not indexed.
+    """
+    def __init__(self, output_file: TextIO, fieldnames: Sequence[str], delimiter: str, batch_size: int = constants.OUTPUT_BATCH_ROWS) -> None:
+        super().__init__(fieldnames, delimiter)
+
+        # Store the output file and the batch size
+        self.output_file = output_file
+        self.batch_size = batch_size
+
+        # Initialise the index, which is only set when a sorted output file is written
+        self.index: Optional['OutputIndexWriter'] = None
+
+    def write_row(self, row: Sequence[str]) -> None:
+        """Writes a single row, used for the header.
+
+        Args:
+            row (Sequence[str]): The values of the row.
+        """
+        self.output_file.write(self.format_row(row) + self.line_terminator)
+
+    def write_batch(self, rows: Iterator[List[str]], batch_size: Optional[int] = None) -> int:
+        """Writes the next batch of rows.
+
+        Args:
+            rows (Iterator[List[str]]): The rows still to be written, at most one batch is taken from it.
+            batch_size (Optional[int]): The number of rows in the batch, None to use the writer's batch size.
+
+        Returns:
+            int: The number of rows written, 0 once the rows are exhausted.
+        """
+        # Take the next batch from the iterator
+        batch = list(islice(rows, self.batch_size if batch_size is None else batch_size))
+
+        # Write the batch in a single call
+        if self.index is None:
+            self.output_file.write(self.format_rows(batch))
+        else:
+            # Keep the lines so the offset of each row can be recorded
+            lines = [self.format_row(row) for row in batch]
+            self.index.add_rows(batch, lines)
+
+            self.output_file.write(''.join(line + self.line_terminator for line in lines))
+
+        # Return the number of rows written
+        return len(batch)
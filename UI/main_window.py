@@ -10,7 +10,8 @@ import shutil
 import csv
 from pathlib import Path
 import logging
-import webbrowser
+import threading
+from typing import Optional, TYPE_CHECKING
 
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
@@ -20,6 +21,9 @@ from . import MappingDialog, ProgressDialog, ResetToDefaultsDialog
 
 import constants
 
+if TYPE_CHECKING:
+    from Converter.preload import Preloader
+
 class MainWindow:
     """Creates the main window.
 
@@ -124,6 +128,32 @@ class MainWindow:
         self.current_file_delimiter = constants.DEFAULT_CURRENT_FILE_DELIMITER
         self.new_file_delimiter = constants.DEFAULT_NEW_FILE_DELIMITER
 
+        # Initialise the preloader, which reads each file in the background as soon as it is selected, it is created when the first file is selected
+        self.preloader: Optional['Preloader'] = None
+
+        # Disable the buttons which need the default files until they have been unpacked
+        self.unpacking = True
+        self.unpacking_error: Optional[Exception] = None
+        self.current_file_button.configure(state=tk.DISABLED)
+        self.reset_to_defaults_button.configure(state=tk.DISABLED)
+
+        # Unpack the default files on a background thread so the window is shown straight away
+        self.unpack_thread = threading.Thread(target=self.unpack_default_files, name='Unpack Default Files', daemon=True)
+        self.unpack_thread.start()
+
+        # Start polling for the unpacking to finish
+        self.root.after(constants.UNPACK_POLL_TIME, self.poll_unpacking)
+
+    def unpack_default_files(self) -> None:
+        """Unpacks the Original IRCA Input file and the default mapping file if they have not been unpacked, runs on a background thread."""
+        try:
+            self.unpack_archives()
+        except (OSError, ValueError) as error:
+            # Store the error so it can be reported on the main thread
+            self.unpacking_error = error
+
+    def unpack_archives(self) -> None:
+        """Unpacks the Original IRCA Input file and the default mapping file if they have not been unpacked."""
         # Copy the Original IRCA Input file to the database folder if it doesn't exist
         if not Path(constants.DATABASE_PATH, constants.ORIGINAL_IRCA_INPUT_FILENAME).exists():
             # Create the database folder if it doesn't exist
@@ -148,6 +178,33 @@ class MainWindow:
             # Unzip and copy the file
             shutil.unpack_archive(constants.ORIGINAL_MAPPING_PATH, constants.DEFAULTS_PATH)
 
+    def poll_unpacking(self) -> None:
+        """Enables the buttons which need the default files once they have been unpacked."""
+        # Keep polling until the unpacking has finished
+        if self.unpack_thread.is_alive():
+            self.root.after(constants.UNPACK_POLL_TIME, self.poll_unpacking)
+            return
+
+        # Set unpacking to False
+        self.unpacking = False
+
+        if self.unpacking_error is not None:
+            # Log that the default files could not be unpacked
+            logging.error(f'The default files could not be unpacked: {self.unpacking_error}')
+
+            # Display a message box
+            messagebox.showerror('Error', f'The default files could not be unpacked.\n\n{self.unpacking_error}')
+        else:
+            # Log that the default files are ready
+            logging.debug('Default files unpacked')
+
+        # Enable the buttons
+        self.current_file_button.configure(state=tk.NORMAL)
+        self.reset_to_defaults_button.configure(state=tk.NORMAL)
+
+        # Check if the other buttons should be enabled or disabled
+        self.check_enable_buttons()
+
     def setup_menu_bar(self) -> None:
         """Sets up the menu bar."""
         # Create the menu bar
@@ -219,6 +276,9 @@ class MainWindow:
         # Log the documentation path
         logging.debug(f'Documentation path: {docs_path}')
 
+        # Import the web browser module only when it is needed, as it is slow to import
+        import webbrowser
+
         # Open the documentation
         webbrowser.open(f'file://{docs_path}', new=2, autoraise=True)
 
@@ -231,8 +291,8 @@ class MainWindow:
                 # Enable the output file button
                 self.output_file_button.configure(state=tk.NORMAL)
 
-                # Check if the output file has been selected
-                if self.output_file_path.name:
+                # Check if the output file has been selected, the mapping needs the default mapping file so also wait for it to be unpacked
+                if self.output_file_path.name and not self.unpacking:
                     # Check if the output file is the same as the current file or new file
                     if self.output_file_path != self.current_file_path and self.output_file_path != self.new_file_path:
                         # Enable the set mapping button
@@ -259,57 +319,65 @@ class MainWindow:
     def select_current_file(self) -> None:
         """Selects the current file."""
         # Get the filename
-        filename = filedialog.askopenfilename(initialdir=constants.DATABASE_PATH, title='Select Current File', filetypes=(('Text Files', '*.txt'), ('All Files', '*.*')))
+        filename = filedialog.askopenfilename(initialdir=constants.DATABASE_PATH, title='Select Current File', filetypes=(('Text Files', '*.txt'), constants.COMPRESSED_FILE_TYPES, ('All Files', '*.*')))
 
         # Check if a filename was selected
         if filename:
-            # Check the dialect of the current file
-            with open(filename, newline='', encoding='utf8') as csvfile:
-                try:
-                    # Try to determine the dialect of the current file
-                    dialect = csv.Sniffer().sniff(csvfile.read(constants.SNIFFER_READ_SIZE))
+            # Import the errors raised by compressed files now they are needed rather than when the application starts
+            from Converter.streams import DECOMPRESSION_ERRORS
 
-                    # Set the current file delimiter
-                    self.current_file_delimiter = dialect.delimiter
-                except csv.Error:
-                    # Log that the dialect of the current file could not be determined
-                    logging.error(f'The dialect of the Current File {filename} could not be determined')
+            # Check the dialect of the current file
+            try:
+                # Try to determine the delimiter of the current file
+                self.current_file_delimiter = self.sniff_delimiter(filename)
+            except csv.Error:
+                # Log that the dialect of the current file could not be determined
+                logging.error(f'The dialect of the Current File {filename} could not be determined')
+
+                # Display a message box
+                messagebox.showerror('Error', 'The dialect of the Current File could not be determined.\n\nPlease select a different file.')
+
+                # Clear the filename
+                filename = ''
+            except UnicodeDecodeError:
+                # Log that the current file does not look like a valid text file
+                logging.error(f'{filename} does not look like a valid text file')
+
+                # Display a message box
+                messagebox.showerror('Error', 'The Current File does not look like a valid text file\n\nPlease select a different file.')
+
+                # Clear the filename
+                filename = ''
+            except (OSError, ValueError) + DECOMPRESSION_ERRORS as error:
+                # Log that the current file could not be read
+                logging.error(f'{filename} could not be read: {error}')
+
+                # Display a message box
+                messagebox.showerror('Error', f'The Current File could not be read.\n\n{error}\n\nPlease select a different file.')
+
+                # Clear the filename
+                filename = ''
+            else:
+                # Check that the delimiter is a tab
+                if self.current_file_delimiter != constants.DEFAULT_CURRENT_FILE_DELIMITER:
+                    # Log that the delimiter of the current file is not a tab
+                    logging.error(f'The delimiter of the Current File {filename} is not a tab')
 
                     # Display a message box
-                    messagebox.showerror('Error', 'The dialect of the Current File could not be determined.\n\nPlease select a different file.')
+                    messagebox.showerror('Error', 'The delimiter of the Current File is not a tab.\n\nPlease select a different file.')
 
                     # Clear the filename
                     filename = ''
-                except UnicodeDecodeError:
-                    # Log that the current file does not look like a valid text file
-                    logging.error(f'{filename} does not look like a valid text file')
-
+                # Check the field names in the current file match the field names in the default mapping
+                elif not self.check_field_names(filename):
                     # Display a message box
-                    messagebox.showerror('Error', 'The Current File does not look like a valid text file\n\nPlease select a different file.')
+                    messagebox.showerror('Error', 'The field names in the Current File do not match the field names in the default mapping.\n\nPlease select a different file.')
+
+                    # Log that the field names in the current file do not match the field names in the default mapping
+                    logging.error(f'The field names in the current file {filename} do not match the field names in the default mapping')
 
                     # Clear the filename
                     filename = ''
-                else:
-                    # Check that the delimiter is a tab
-                    if self.current_file_delimiter != constants.DEFAULT_CURRENT_FILE_DELIMITER:
-                        # Log that the delimiter of the current file is not a tab
-                        logging.error(f'The delimiter of the Current File {filename} is not a tab')
-
-                        # Display a message box
-                        messagebox.showerror('Error', 'The delimiter of the Current File is not a tab.\n\nPlease select a different file.')
-
-                        # Clear the filename
-                        filename = ''
-                    # Check the field names in the current file match the field names in the default mapping
-                    elif not self.check_field_names(filename):
-                        # Display a message box
-                        messagebox.showerror('Error', 'The field names in the Current File do not match the field names in the default mapping.\n\nPlease select a different file.')
-
-                        # Log that the field names in the current file do not match the field names in the default mapping
-                        logging.error(f'The field names in the current file {filename} do not match the field names in the default mapping')
-
-                        # Clear the filename
-                        filename = ''
 
             # Set the current file path
             self.current_file_path = Path(filename)
@@ -317,9 +385,48 @@ class MainWindow:
             # Set the current file text
             self.current_file_text.set(self.current_file_path.name)
 
+            # Start reading the current file in the background, cancelling the read of any previous selection
+            self.get_preloader().preload_current_file(self.current_file_path, self.current_file_delimiter)
+
             # Check if the buttons should be enabled or disabled
             self.check_enable_buttons()
 
+    def get_preloader(self) -> 'Preloader':
+        """Gets the preloader, creating it the first time it is needed.
+
+        Returns:
+            Preloader: The preloader.
+        """
+        if self.preloader is None:
+            # Import the preloader now it is needed rather than when the application starts, so the main window appears sooner
+            from Converter.preload import Preloader
+
+            self.preloader = Preloader()
+
+        return self.preloader
+
+    def sniff_delimiter(self, filename: str) -> str:
+        """Gets the delimiter of a file from its probe, which is cached so the file is only read once.
+
+        Args:
+            filename: The filename of the file.
+
+        Returns:
+            The delimiter of the file.
+
+        Raises:
+            csv.Error: If the dialect of the file could not be determined.
+        """
+        # Import the probe now it is needed rather than when the application starts
+        from Converter.probe import probe_file
+
+        delimiter = probe_file(Path(filename)).delimiter
+
+        if delimiter is None:
+            raise csv.Error('Could not determine delimiter')
+
+        return delimiter
+
     def check_field_names(self, filename: str) -> bool:
         """Checks the field names in the current file match the field names in the default mapping.
 
@@ -329,60 +436,66 @@ class MainWindow:
         Returns:
             True if the field names match, False otherwise.
         """
-        # Open the current file
-        with open(filename, 'r', encoding='utf-8', newline='') as current_file:
-            # Create a dictionary reader
-            reader = csv.DictReader(current_file, delimiter=self.current_file_delimiter)
+        # Import the probe now it is needed rather than when the application starts
+        from Converter.probe import probe_file
+
+        # Get the field names from the probe of the current file
+        field_names = probe_file(Path(filename)).fieldnames(self.current_file_delimiter)
 
-            # Get the field names
-            field_names = reader.fieldnames
+        if not field_names:
+            # Return False
+            return False
 
-            if field_names is None:
+        for default_field_name in constants.ORIGINAL_IRCA_MAPPING.keys():
+            # Check if the default field name is not in the field names
+            if default_field_name not in field_names:
                 # Return False
                 return False
 
-            for default_field_name in constants.ORIGINAL_IRCA_MAPPING.keys():
-                # Check if the default field name is not in the field names
-                if default_field_name not in field_names:
-                    # Return False
-                    return False
-                
         # Return True
         return True
 
     def select_new_file(self) -> None:
         """Selects the new file."""
         # Get the filename
-        filename = filedialog.askopenfilename(initialdir=constants.DATABASE_PATH, title='Select New File', filetypes=(('CSV Files', '*.csv'), ('All Files', '*.*')))
+        filename = filedialog.askopenfilename(initialdir=constants.DATABASE_PATH, title='Select New File', filetypes=(('CSV Files', '*.csv'), constants.COMPRESSED_FILE_TYPES, ('All Files', '*.*')))
 
         # Check if a filename was selected
         if filename:
+            # Import the errors raised by compressed files now they are needed rather than when the application starts
+            from Converter.streams import DECOMPRESSION_ERRORS
+
             # Check the dialect of the current file
-            with open(filename, newline='', encoding='utf8') as csvfile:
-                try:
-                    # Try to determine the dialect of the current file
-                    dialect = csv.Sniffer().sniff(csvfile.read(constants.SNIFFER_READ_SIZE))
+            try:
+                # Try to determine the delimiter of the new file
+                self.new_file_delimiter = self.sniff_delimiter(filename)
+            except csv.Error:
+                # Log that the dialect of the current file could not be determined
+                logging.error(f'The dialect of the New File {filename} could not be determined')
 
-                    # Set the current file delimiter
-                    self.new_file_delimiter = dialect.delimiter
-                except csv.Error:
-                    # Log that the dialect of the current file could not be determined
-                    logging.error(f'The dialect of the New File {filename} could not be determined')
+                # Display a message box
+                messagebox.showerror('Error', 'The dialect of the New File could not be determined.\n\nPlease select a different file.')
 
-                    # Display a message box
-                    messagebox.showerror('Error', 'The dialect of the New File could not be determined.\n\nPlease select a different file.')
+                # Clear the filename
+                filename = ''
+            except UnicodeDecodeError:
+                # Log that the new file does not look like a valid text file
+                logging.error(f'{filename} does not look like a valid text file')
 
-                    # Clear the filename
-                    filename = ''
-                except UnicodeDecodeError:
-                    # Log that the new file does not look like a valid text file
-                    logging.error(f'{filename} does not look like a valid text file')
+                # Display a message box
+                messagebox.showerror('Error', 'The New File does not look like a valid text file.\n\nPlease select a different file.')
 
-                    # Display a message box
-                    messagebox.showerror('Error', 'The New File does not look like a valid text file.\n\nPlease select a different file.')
+                # Clear the filename
+                filename = ''
+            except (OSError, ValueError) + DECOMPRESSION_ERRORS as error:
+                # Log that the new file could not be read
+                logging.error(f'{filename} could not be read: {error}')
 
-                    # Clear the filename
-                    filename = ''
+                # Display a message box
+                messagebox.showerror('Error', f'The New File could not be read.\n\n{error}\n\nPlease select a different file.')
+
+                # Clear the filename
+                filename = ''
 
             # Set the new file path
             self.new_file_path = Path(filename)
@@ -390,6 +503,9 @@ class MainWindow:
             # Set the new file text
             self.new_file_text.set(self.new_file_path.name)
 
+            # Start parsing the new file in the background, cancelling the parse of any previous selection
+            self.get_preloader().preload_new_file(self.new_file_path, self.new_file_delimiter)
+
             # Check if the buttons should be enabled or disabled
             self.check_enable_buttons()
 
@@ -438,7 +554,8 @@ class MainWindow:
                 self.new_file_path,
                 self.new_file_delimiter,
                 self.output_file_path,
-                self.mapping_dialog.mapping
+                self.mapping_dialog.mapping,
+                self.preloader
             )
         else:
             # Display a message box
@@ -7,7 +7,6 @@ Classes:
 """
 
 
-import csv
 import json
 from pathlib import Path
 from typing import Dict, Union
@@ -52,11 +51,11 @@ class MappingDialog:
         # Create an empty dictionary to store the combobox variables
         self.combobox_dict: Dict[str, tk.StringVar] = {}
 
-        # Read the fieldnames from the new file
-        with new_file_path.open('r', encoding='utf8', newline='') as new_file:
-            reader = csv.DictReader(new_file, delimiter=new_file_delimeter)
+        # Import the probe now it is needed rather than when the application starts
+        from Converter.probe import probe_file
 
-            self.fieldnames = reader.fieldnames
+        # Get the fieldnames from the probe of the new file, which was cached when the file was selected
+        self.fieldnames = probe_file(new_file_path).fieldnames(new_file_delimeter)
 
         # If there are fieldnames, create the dialog
         if self.fieldnames:
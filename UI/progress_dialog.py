@@ -1,19 +1,25 @@
 """Creates a progress dialog for the user to see the progress of the conversion.
+
+The conversion runs on a background thread, the dialog polls the queue the worker reports its progress on so the window stays responsive.
 """
 
 import logging
+import os
+import queue
 from pathlib import Path
 from tkinter import messagebox
-from typing import Dict
+from typing import Dict, Optional, TYPE_CHECKING
 
 import tkinter as tk
 from tkinter import ttk
 from tkinter.simpledialog import _setup_dialog # type: ignore
 
-from Converter import Converter
-
 import constants
 
+if TYPE_CHECKING:
+    from Converter import Instrumentation, WorkerMessage
+    from Converter.preload import Preloader
+
 class ProgressDialog:
     """Creates the progress dialog.
 
@@ -25,6 +31,7 @@ class ProgressDialog:
         new_file_delimiter (str): The delimiter of the new file.
         output_file_path (Path): The path to the output file.
         mapping (Dict[str, str]): The mapping of the fields.
+        preloader (Optional[Preloader]): The preloader which may already have read the files in the background.
     """
     def __init__(
             self, parent: tk.Tk,
@@ -33,7 +40,8 @@ class ProgressDialog:
             new_file_path: Path,
             new_file_delimiter: str,
             output_file_path: Path,
-            mapping: Dict[str, str]
+            mapping: Dict[str, str],
+            preloader: Optional['Preloader'] = None
         ) -> None:
         # Store the parent window
         self.parent = parent
@@ -94,6 +102,9 @@ class ProgressDialog:
         # Initialise conversion cancelled to False
         self.conversion_cancelled = False
 
+        # Import the converter now it is needed rather than when the application starts, so the main window appears sooner
+        from Converter import Converter, ConversionWorker, Instrumentation
+
         # Create the converter
         self.converter = Converter(
             current_file_path,
@@ -101,103 +112,121 @@ class ProgressDialog:
             new_file_path,
             new_file_delimiter,
             output_file_path,
-            mapping
+            mapping,
+            preloader=preloader
         )
 
-        # Initialise the current file
-        self.converter.initialise_current_file()
+        # Instrument the conversion if a directory to save traces to has been set in the environment
+        trace_directory = os.environ.get(constants.TRACE_DIRECTORY_VARIABLE)
+        self.trace_directory = Path(trace_directory) if trace_directory else None
+        self.instrumentation: Optional['Instrumentation'] = None
+
+        if self.trace_directory is not None:
+            self.instrumentation = Instrumentation(profile=True)
+            self.instrumentation.attach(self.converter)
 
-        # Start reading the current file
-        self.read_current_file()
+        # Map each phase to its progress bar
+        self.progress_bars = {
+            constants.READ_CURRENT_FILE_PHASE: self.current_file_progress_bar,
+            constants.MERGE_NEW_FILE_PHASE: self.new_file_progress_bar,
+            constants.WRITE_OUTPUT_FILE_PHASE: self.output_file_progress_bar,
+        }
+
+        # Create the queue the worker reports progress on
+        self.message_queue: 'queue.Queue[WorkerMessage]' = queue.Queue()
+
+        # Start the conversion on a background thread
+        self.worker = ConversionWorker(self.converter, self.message_queue)
+        self.worker.start()
+
+        # Start polling for progress
+        self.parent.after(constants.UI_REFRESH_TIME, self.poll_worker)
 
         # Log the the progress dialog has been created
         logging.debug('Progress Dialog Created')
 
-    def read_current_file(self) -> None:
-        """Reads the current file."""
-        # Check if the conversion has been cancelled
-        if not self.conversion_cancelled:
-            # Read the current file
-            percentage_read, still_reading = self.converter.read_current_file()
+    def poll_worker(self) -> None:
+        """Updates the progress bars with the messages sent by the worker."""
+        # Stop polling if the conversion has been cancelled
+        if self.conversion_cancelled:
+            return
 
-            # Log the progress
-            logging.debug(f'Current File: {percentage_read:3.2f}%, Still Reading: {still_reading}')
+        # Handle all the messages sent since the last poll
+        while True:
+            try:
+                message = self.message_queue.get_nowait()
+            except queue.Empty:
+                break
 
-            # Update the progress bar
-            self.current_file_progress_bar.configure(value=percentage_read)
+            if message.phase in self.progress_bars:
+                # Log the progress
+                logging.debug(f'{message.phase}: {message.percentage:3.2f}%')
 
-            if still_reading:
-                # Continue reading the current file
-                self.parent.after(1, self.read_current_file)
-            else:
-                # Set the progress bar to 100%
-                self.current_file_progress_bar.configure(value=100)
+                # Update the progress bar
+                self.progress_bars[message.phase].configure(value=message.percentage)
 
-                # Initialise the new file
-                self.converter.initialise_new_file()
+            elif message.phase == constants.CONVERSION_COMPLETE:
+                # Finish the conversion
+                self.conversion_finished()
 
-                # Start merging the new file
-                self.parent.after(1, self.merge_new_file)
+                return
 
-    def merge_new_file(self) -> None:
-        """Merges the new file."""
-        # Check if the conversion has been cancelled
-        if not self.conversion_cancelled:
-            # Merge the new file
-            percentage_merged, still_merging = self.converter.merge_new_file()
+            elif message.phase == constants.CONVERSION_FAILED:
+                # Finish the conversion, showing the error
+                self.conversion_finished(message.error)
 
-            # Log the progress
-            logging.debug(f'New File: {percentage_merged:3.2f}%, Still Merging: {still_merging}')
+                return
 
-            # Update the progress bar
-            self.new_file_progress_bar.configure(value=percentage_merged)
+        # Poll again
+        self.parent.after(constants.UI_REFRESH_TIME, self.poll_worker)
 
-            if still_merging:
-                # Continue merging the new file
-                self.parent.after(1, self.merge_new_file)
-            else:
-                # Set the progress bar to 100%
-                self.new_file_progress_bar.configure(value=100)
+    def conversion_finished(self, error: str = '') -> None:
+        """Called when the worker has finished the conversion.
 
-                # Initialise the output file
-                self.converter.initialise_output_file()
+        Args:
+            error (str): A description of the error if the conversion failed.
+        """
+        # Emit the enable menu items event
+        self.parent.event_generate(constants.ENABLE_MENU_ITEMS_EVENT)
 
-                # Start writing the output file
-                self.parent.after(1, self.write_output_file)
+        # Save the trace and profile if the conversion was instrumented
+        self.save_instrumentation()
 
-    def write_output_file(self) -> None:
-        """Writes the output file."""
-        # Check if the conversion has been cancelled
-        if not self.conversion_cancelled:
-            # Write the output file
-            percentage_written, still_writing = self.converter.write_output_file()
+        # Change the cancel button to close
+        self.cancel_button.configure(text='Close')
 
-            # Log the progress
-            logging.debug(f'Output File: {percentage_written:3.2f}%, Still Writing: {still_writing}')
+        if error:
+            # Show the conversion failed message
+            messagebox.showerror('Conversion Failed', f'The conversion failed.\n\n{error}')
+        else:
+            # Set the progress bars to 100%
+            for progress_bar in self.progress_bars.values():
+                progress_bar.configure(value=100)
 
-            # Update the progress bar
-            self.output_file_progress_bar.configure(value=percentage_written)
+            # Show the conversion complete message
+            messagebox.showinfo('Conversion Complete', 'The conversion has been completed successfully.')
 
-            if still_writing:
-                # Continue writing the output file
-                self.parent.after(1, self.write_output_file)
-            else:
-                # Emit the enable menu items event
-                self.parent.event_generate(constants.ENABLE_MENU_ITEMS_EVENT)
+    def save_instrumentation(self) -> None:
+        """Saves the trace and profile of the conversion to the trace directory, if the conversion was instrumented."""
+        if self.instrumentation is None or self.trace_directory is None:
+            return
 
-                # Set the progress bar to 100%
-                self.output_file_progress_bar.configure(value=100)
+        try:
+            # Save the trace and profile
+            self.trace_directory.mkdir(parents=True, exist_ok=True)
+            self.instrumentation.save_trace(self.trace_directory / constants.TRACE_FILENAME)
+            self.instrumentation.save_profile(self.trace_directory / constants.PROFILE_FILENAME)
 
-                # Change the cancel button to close
-                self.cancel_button.configure(text='Close')
+            # Log where they were saved
+            logging.info(f'Conversion trace and profile saved to {self.trace_directory}')
 
-                # Show the conversion complete message
-                messagebox.showinfo('Conversion Complete', 'The conversion has been completed successfully.')
+        except OSError as error:
+            logging.error(f'Could not save the conversion trace: {error}')
 
     def cancel(self) -> None:
         """Cancels the conversion."""
-        # Close the files
-        self.converter.conversion_cancelled()
+        # Stop the worker, it closes the files at the end of its current time slice
+        self.worker.cancel()
 
         # Set conversion cancelled to True
         self.conversion_cancelled = True
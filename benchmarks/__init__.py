@@ -0,0 +1,11 @@
+"""Benchmarks for the Converter.
+
+Run from the root of the repository, for example:
+
+    python -m benchmarks.run_benchmarks --scales 10000 100000
+
+Modules:
+    data_generator: Generates synthetic IRCA current files and OpenSky new files.
+    run_benchmarks: Times each phase of a conversion and saves the results as JSON.
+    reader_benchmark: Compares reading a current file with csv.reader and with the memory mapped reader.
+"""
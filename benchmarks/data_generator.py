@@ -0,0 +1,306 @@
+"""Generates synthetic IRCA current files and OpenSky new files for benchmarking.
+
+The current file uses the IRCA fields in ORIGINAL_IRCA_MAPPING and is tab separated, the new file uses the columns of the OpenSky aircraft database and is comma separated. A configurable fraction of the new file's icao24 values are taken from the current file, so the merge updates existing rows as well as adding new ones.
+
+The files are generated from a seed, so the same arguments always produce the same files.
+
+Functions:
+    make_pool: Makes a pool of distinct values to pick from.
+    generate_keys: Generates the Mode S IDs of the current file and the new file.
+    generate_current_file: Generates a synthetic IRCA current file.
+    generate_new_file: Generates a synthetic OpenSky new file.
+    generate_files: Generates a current file and a new file which overlap.
+    main: Parses the command line arguments and generates the files.
+"""
+
+import argparse
+import csv
+import random
+import string
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import constants
+
+# The columns of the OpenSky aircraft database
+OPENSKY_FIELDNAMES = [
+    'icao24', 'registration', 'manufacturericao', 'manufacturername', 'model', 'typecode', 'serialnumber', 'linenumber',
+    'icaoaircrafttype', 'operator', 'operatorcallsign', 'operatoricao', 'operatoriata', 'owner', 'testreg', 'registered',
+    'reguntil', 'status', 'built', 'firstflightdate', 'seatconfiguration', 'engines', 'modes', 'adsb', 'acars', 'notes',
+    'categoryDescription',
+]
+
+# The number of distinct Mode S IDs
+MODE_S_ID_COUNT = 1 << 24
+
+# Registration prefixes, weighted roughly by the size of each register
+REGISTRATION_PREFIXES = ['N'] * 8 + ['G-', 'D-', 'F-', 'C-', 'VH-', 'JA', 'EC-', 'I-', 'PH-', 'OE-', 'HB-', 'SE-', 'ZS-', 'PR-']
+
+# The fraction of optional fields left empty
+EMPTY_FIELD_FRACTION = 0.6
+
+def make_pool(rng: random.Random, size: int, min_words: int, max_words: int) -> List[str]:
+    """Makes a pool of distinct values to pick from.
+
+    Real databases repeat a few thousand manufacturers, models and owners across every row, so values are picked from pools rather than generated for each row.
+
+    Args:
+        rng (random.Random): The random number generator.
+        size (int): The number of values in the pool.
+        min_words (int): The fewest words in a value.
+        max_words (int): The most words in a value.
+
+    Returns:
+        List[str]: The values.
+    """
+    def word() -> str:
+        return rng.choice(string.ascii_uppercase) + ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9)))
+
+    return [' '.join(word() for _ in range(rng.randint(min_words, max_words))) for _ in range(size)]
+
+def generate_keys(current_rows: int, new_rows: int, overlap: float, seed: int) -> Tuple[List[int], List[int]]:
+    """Generates the Mode S IDs of the current file and the new file.
+
+    Args:
+        current_rows (int): The number of rows in the current file.
+        new_rows (int): The number of rows in the new file.
+        overlap (float): The fraction of the new file's Mode S IDs which are also in the current file.
+        seed (int): The seed of the random number generator.
+
+    Returns:
+        Tuple[List[int], List[int]]: The Mode S IDs of the current file and of the new file.
+
+    Raises:
+        ValueError: If the overlap is not between 0 and 1 or there are not enough Mode S IDs.
+    """
+    # Check the arguments
+    if not 0 <= overlap <= 1:
+        raise ValueError('The overlap must be between 0 and 1')
+
+    shared_rows = min(int(new_rows * overlap), current_rows)
+    added_rows = new_rows - shared_rows
+
+    if current_rows + added_rows > MODE_S_ID_COUNT:
+        raise ValueError(f'There are only {MODE_S_ID_COUNT} Mode S IDs')
+
+    # Pick distinct Mode S IDs for the current file and the rows only in the new file
+    rng = random.Random(seed)
+    keys = rng.sample(range(MODE_S_ID_COUNT), current_rows + added_rows)
+    current_keys, added_keys = keys[:current_rows], keys[current_rows:]
+
+    # Mix rows from the current file with the added rows, in a random order
+    new_keys = rng.sample(current_keys, shared_rows) + added_keys
+    rng.shuffle(new_keys)
+
+    return current_keys, new_keys
+
+def optional(rng: random.Random, pool: Sequence[str]) -> Callable[[], str]:
+    """Creates a generator for a field which is often empty.
+
+    Args:
+        rng (random.Random): The random number generator.
+        pool (Sequence[str]): The values to pick from.
+
+    Returns:
+        Callable[[], str]: Returns the next value of the field.
+    """
+    return lambda: rng.choice(pool) if rng.random() >= EMPTY_FIELD_FRACTION else ''
+
+def registration(rng: random.Random) -> str:
+    """Generates a registration mark.
+
+    Args:
+        rng (random.Random): The random number generator.
+
+    Returns:
+        str: The registration mark.
+    """
+    prefix = rng.choice(REGISTRATION_PREFIXES)
+
+    if prefix == 'N':
+        return f'N{rng.randint(1, 99999)}{"".join(rng.choices(string.ascii_uppercase, k=rng.randint(0, 2)))}'
+
+    return prefix + ''.join(rng.choices(string.ascii_uppercase, k=4))
+
+def generate_current_file(path: Path, keys: Sequence[int], seed: int) -> None:
+    """Generates a synthetic IRCA current file.
+
+    Args:
+        path (Path): The path of the file to write.
+        keys (Sequence[int]): The Mode S ID of each row.
+        seed (int): The seed of the random number generator.
+    """
+    rng = random.Random(seed)
+
+    # Create the pools of repeated values
+    manufacturers = make_pool(rng, 300, 1, 3)
+    models = make_pool(rng, 3000, 1, 2)
+    owners = make_pool(rng, 20000, 2, 4)
+    addresses = make_pool(rng, 20000, 2, 5)
+    countries = make_pool(rng, 200, 1, 2)
+    airports = make_pool(rng, 2000, 1, 3)
+    descriptions = make_pool(rng, 50, 1, 3)
+    engines = make_pool(rng, 1000, 1, 2)
+    years = [str(year) for year in range(1950, 2024)]
+    dates = [f'{year}-{month:02d}-{day:02d}' for year in range(1990, 2024) for month in range(1, 13) for day in (1, 9, 17, 25)]
+    numbers = [str(number) for number in range(1, 1000)]
+
+    # Pick the pool for each field from its name
+    generators: Dict[str, Callable[[], str]] = {}
+
+    for field in constants.ORIGINAL_IRCA_MAPPING:
+        if 'Registration' in field and 'Dt' not in field:
+            generators[field] = lambda: registration(rng)
+        elif field.endswith('Dt'):
+            generators[field] = optional(rng, dates)
+        elif 'Year' in field:
+            generators[field] = optional(rng, years)
+        elif 'Manufacturer' in field:
+            generators[field] = optional(rng, manufacturers)
+        elif 'Model' in field or 'Make' in field or 'Serie' in field or field == 'CellPopularName':
+            generators[field] = optional(rng, models)
+        elif 'Country' in field:
+            generators[field] = optional(rng, countries)
+        elif 'Address' in field:
+            generators[field] = optional(rng, addresses)
+        elif field in ('OwnerName', 'OperatorName'):
+            generators[field] = optional(rng, owners)
+        elif field == 'AirportName':
+            generators[field] = optional(rng, airports)
+        elif 'Engine' in field:
+            generators[field] = optional(rng, engines)
+        elif 'Desc' in field or 'Category' in field:
+            generators[field] = optional(rng, descriptions)
+        else:
+            generators[field] = optional(rng, numbers)
+
+    fieldnames = list(constants.ORIGINAL_IRCA_MAPPING)
+    key_column = fieldnames.index(constants.MODE_S_ADDRESS_KEY)
+    field_generators = [generators[field] for field in fieldnames]
+
+    # Write the file
+    with path.open('w', encoding='utf-8', newline='') as current_file:
+        writer = csv.writer(current_file, delimiter=constants.DEFAULT_CURRENT_FILE_DELIMITER)
+        writer.writerow(fieldnames)
+
+        for key in keys:
+            row = [generate() for generate in field_generators]
+            row[key_column] = f'{key:06X}'
+            writer.writerow(row)
+
+def generate_new_file(path: Path, keys: Sequence[int], seed: int) -> None:
+    """Generates a synthetic OpenSky new file.
+
+    Args:
+        path (Path): The path of the file to write.
+        keys (Sequence[int]): The Mode S ID of each row.
+        seed (int): The seed of the random number generator.
+    """
+    rng = random.Random(seed + 1)
+
+    # Create the pools of repeated values, owners include commas and quotes so some fields need quoting
+    manufacturer_codes = [''.join(rng.choices(string.ascii_uppercase, k=rng.randint(3, 8))) for _ in range(300)]
+    manufacturer_names = make_pool(rng, 300, 1, 3)
+    models = make_pool(rng, 3000, 1, 2)
+    typecodes = [''.join(rng.choices(string.ascii_uppercase + string.digits, k=4)) for _ in range(2000)]
+    owners = make_pool(rng, 20000, 2, 4) + [f'{name}, Inc.' for name in make_pool(rng, 2000, 1, 2)] + [f'"{name}" Flying Club' for name in make_pool(rng, 200, 1, 1)]
+    operators = make_pool(rng, 2000, 1, 3)
+    engines = make_pool(rng, 1000, 1, 2)
+    categories = make_pool(rng, 20, 2, 4)
+    years = [str(year) for year in range(1950, 2024)]
+    dates = [f'{year}-{month:02d}-{day:02d}' for year in range(1990, 2024) for month in range(1, 13) for day in (1, 9, 17, 25)]
+    numbers = [str(number) for number in range(1, 100000)]
+    flags = ['true', 'false']
+
+    generators: List[Callable[[], str]] = [
+        lambda: '',
+        lambda: registration(rng),
+        optional(rng, manufacturer_codes),
+        optional(rng, manufacturer_names),
+        optional(rng, models),
+        optional(rng, typecodes),
+        optional(rng, numbers),
+        optional(rng, numbers),
+        optional(rng, typecodes),
+        optional(rng, operators),
+        optional(rng, operators),
+        optional(rng, typecodes),
+        optional(rng, typecodes),
+        optional(rng, owners),
+        lambda: '',
+        optional(rng, dates),
+        optional(rng, dates),
+        lambda: '',
+        optional(rng, years),
+        optional(rng, dates),
+        lambda: '',
+        optional(rng, engines),
+        optional(rng, flags),
+        optional(rng, flags),
+        optional(rng, flags),
+        lambda: '',
+        optional(rng, categories),
+    ]
+
+    # Write the file
+    with path.open('w', encoding='utf-8', newline='') as new_file:
+        writer = csv.writer(new_file, delimiter=constants.DEFAULT_NEW_FILE_DELIMITER)
+        writer.writerow(OPENSKY_FIELDNAMES)
+
+        for key in keys:
+            row = [generate() for generate in generators]
+            row[0] = f'{key:06x}'
+            writer.writerow(row)
+
+def generate_files(directory: Path, current_rows: int, new_rows: int, overlap: float, seed: int) -> Tuple[Path, Path]:
+    """Generates a current file and a new file which overlap.
+
+    The files are named after the arguments, and are only generated if they do not already exist.
+
+    Args:
+        directory (Path): The directory to write the files to.
+        current_rows (int): The number of rows in the current file.
+        new_rows (int): The number of rows in the new file.
+        overlap (float): The fraction of the new file's Mode S IDs which are also in the current file.
+        seed (int): The seed of the random number generator.
+
+    Returns:
+        Tuple[Path, Path]: The paths of the current file and the new file.
+    """
+    # Name the files after the arguments, so files generated with different arguments are not reused
+    name = f'{current_rows}_{new_rows}_{overlap:g}_{seed}'
+    current_file_path = directory / f'current_{name}.txt'
+    new_file_path = directory / f'new_{name}.csv'
+
+    if not current_file_path.exists() or not new_file_path.exists():
+        directory.mkdir(parents=True, exist_ok=True)
+
+        # Generate the keys then the files
+        current_keys, new_keys = generate_keys(current_rows, new_rows, overlap, seed)
+        generate_current_file(current_file_path, current_keys, seed)
+        generate_new_file(new_file_path, new_keys, seed)
+
+    return current_file_path, new_file_path
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Parses the command line arguments and generates the files.
+
+    Args:
+        argv (Optional[List[str]]): The command line arguments, None to use sys.argv.
+    """
+    parser = argparse.ArgumentParser(description='Generates a synthetic IRCA current file and OpenSky new file.')
+    parser.add_argument('directory', type=Path, help='directory to write the files to')
+    parser.add_argument('--current-rows', type=int, default=100000, help='rows in the current file (default: 100000)')
+    parser.add_argument('--new-rows', type=int, help='rows in the new file (default: half the current rows)')
+    parser.add_argument('--overlap', type=float, default=0.8, help='fraction of the new rows whose icao24 is in the current file (default: 0.8)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random number generator (default: 0)')
+
+    args = parser.parse_args(argv)
+
+    current_file_path, new_file_path = generate_files(args.directory, args.current_rows, args.new_rows if args.new_rows is not None else args.current_rows // 2, args.overlap, args.seed)
+
+    print(current_file_path)
+    print(new_file_path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Compares reading a current file with csv.reader and with the memory mapped reader.
+
+The rows are kept in a list, as the Converter keeps them, but are not otherwise processed, so the time is the time spent opening, decoding and splitting the file.
+
+Run from the root of the repository, for example:
+
+    python -m benchmarks.reader_benchmark --scales 100000 1000000 --repeat 3
+
+Functions:
+    read_with_csv: Reads every row of a file with csv.reader.
+    read_with_mapped_reader: Reads every row of a file with the memory mapped reader.
+    time_reader: Times the fastest of several reads of a file.
+    main: Parses the command line arguments and runs the benchmark.
+"""
+
+import argparse
+import csv
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from Converter.mapped_reader import MappedReader
+from Converter.streams import open_input_file
+
+from .data_generator import generate_files
+
+import constants
+
+def read_with_csv(path: Path) -> int:
+    """Reads every row of a file with csv.reader.
+
+    Args:
+        path (Path): The file.
+
+    Returns:
+        int: The number of rows read.
+    """
+    with open_input_file(path) as input_file:
+        return len(list(csv.reader(input_file, delimiter=constants.DEFAULT_CURRENT_FILE_DELIMITER)))
+
+def read_with_mapped_reader(path: Path) -> int:
+    """Reads every row of a file with the memory mapped reader.
+
+    Args:
+        path (Path): The file.
+
+    Returns:
+        int: The number of rows read.
+
+    Raises:
+        ValueError: If the file cannot be memory mapped.
+    """
+    reader = MappedReader.open(path, constants.DEFAULT_CURRENT_FILE_DELIMITER)
+
+    if reader is None:
+        raise ValueError(f'{path} cannot be memory mapped')
+
+    try:
+        return len(list(reader))
+    finally:
+        reader.close()
+
+def time_reader(read: Callable[[Path], int], path: Path, repeat: int) -> float:
+    """Times the fastest of several reads of a file.
+
+    Args:
+        read (Callable[[Path], int]): The function reading the file.
+        path (Path): The file.
+        repeat (int): The number of reads.
+
+    Returns:
+        float: The duration of the fastest read in seconds.
+    """
+    durations = []
+
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        read(path)
+        durations.append(time.perf_counter() - start_time)
+
+    return min(durations)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Parses the command line arguments and runs the benchmark.
+
+    Args:
+        argv (Optional[List[str]]): The command line arguments, None to use sys.argv.
+    """
+    parser = argparse.ArgumentParser(description='Compares reading a current file with csv.reader and with the memory mapped reader.')
+    parser.add_argument('--scales', type=int, nargs='+', default=[100000, 1000000], help='rows in the current file of each benchmark (default: 100000 1000000)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the data generator (default: 0)')
+    parser.add_argument('--repeat', type=int, default=3, help='reads of each file, the fastest is reported (default: 3)')
+    parser.add_argument('--data-dir', type=Path, default=Path(tempfile.gettempdir()) / 'aircraft-db-converter-benchmarks', help='directory the generated files are kept in between runs')
+
+    args = parser.parse_args(argv)
+
+    for scale in args.scales:
+        # Generate the current file, or reuse it from an earlier run, the new file is not used
+        current_file_path, _ = generate_files(args.data_dir, scale, scale // 2, 0.8, args.seed)
+
+        # Time both readers
+        csv_seconds = time_reader(read_with_csv, current_file_path, args.repeat)
+        mapped_seconds = time_reader(read_with_mapped_reader, current_file_path, args.repeat)
+
+        # Report the result
+        print(f'{scale:>9,} rows: csv.reader {csv_seconds:.2f} s ({scale / csv_seconds:,.0f} rows/s), mapped reader {mapped_seconds:.2f} s ({scale / mapped_seconds:,.0f} rows/s), {csv_seconds / mapped_seconds:.1f}x')
+
+if __name__ == '__main__':
+    main()
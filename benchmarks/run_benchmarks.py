@@ -0,0 +1,228 @@
+"""Times each phase of a conversion and saves the results as JSON.
+
+Each conversion runs in a fresh process, so the peak memory reported is the peak of that conversion alone and nothing is cached between runs.
+
+Run from the root of the repository, for example:
+
+    python -m benchmarks.run_benchmarks --scales 10000 100000 1000000 --repeat 3
+
+Functions:
+    peak_memory: Gets the peak resident memory of the current process.
+    run_conversion: Runs one conversion and times each phase, run in a child process.
+    run_in_child: Runs one conversion in a fresh process.
+    summarise: Picks the fastest of several runs.
+    git_revision: Gets the git revision of the repository, if there is one.
+    main: Parses the command line arguments and runs the benchmarks.
+"""
+
+import argparse
+import json
+import multiprocessing
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from Converter import ENGINES, create_converter
+
+from .data_generator import generate_files
+
+import constants
+
+try:
+    import resource
+except ImportError: # pragma: no cover - resource is not available on Windows
+    resource = None # type: ignore[assignment]
+
+# The directory the results are saved to by default
+RESULTS_PATH = Path(__file__).parent / 'results'
+
+def peak_memory() -> Optional[int]:
+    """Gets the peak resident memory of the current process.
+
+    Returns:
+        Optional[int]: The peak resident memory in bytes, None if it cannot be measured on this platform.
+    """
+    if resource is None:
+        return None
+
+    # Linux reports the peak in kilobytes, macOS in bytes
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def run_conversion(current_file_path: Path, new_file_path: Path, output_file_path: Path, engine: str, engine_options: Dict[str, Any]) -> Dict[str, Any]:
+    """Runs one conversion and times each phase, run in a child process.
+
+    Args:
+        current_file_path (Path): The current file.
+        new_file_path (Path): The new file.
+        output_file_path (Path): The output file.
+        engine (str): The conversion engine.
+        engine_options (Dict[str, Any]): Options specific to the engine.
+
+    Returns:
+        Dict[str, Any]: The duration, rows, throughput and peak memory of each phase and of the whole conversion.
+    """
+    # Create the converter, running each phase to completion
+    converter = create_converter(
+        current_file_path,
+        constants.DEFAULT_CURRENT_FILE_DELIMITER,
+        new_file_path,
+        constants.DEFAULT_NEW_FILE_DELIMITER,
+        output_file_path,
+        dict(constants.ORIGINAL_IRCA_MAPPING),
+        time_slice=None,
+        engine=engine,
+        **engine_options
+    )
+
+    phases: Dict[str, Dict[str, Any]] = {}
+    start_time = time.perf_counter()
+
+    # Run and time each phase
+    for phase, initialise, step, rows in (
+        (constants.READ_CURRENT_FILE_PHASE, converter.initialise_current_file, converter.read_current_file, lambda: converter.lines_read),
+        (constants.MERGE_NEW_FILE_PHASE, converter.initialise_new_file, converter.merge_new_file, lambda: converter.lines_read),
+        (constants.WRITE_OUTPUT_FILE_PHASE, converter.initialise_output_file, converter.write_output_file, lambda: converter.lines_written),
+    ):
+        phase_start_time = time.perf_counter()
+
+        initialise()
+
+        while step()[1]:
+            pass
+
+        duration = time.perf_counter() - phase_start_time
+
+        phases[phase] = {
+            'seconds': duration,
+            'rows': rows(),
+            'rows_per_second': rows() / duration if duration > 0 else 0,
+            'peak_memory_bytes': peak_memory(),
+        }
+
+    duration = time.perf_counter() - start_time
+    input_rows = phases[constants.READ_CURRENT_FILE_PHASE]['rows'] + phases[constants.MERGE_NEW_FILE_PHASE]['rows']
+
+    # Return the results
+    return {
+        'seconds': duration,
+        'input_rows': input_rows,
+        'output_rows': phases[constants.WRITE_OUTPUT_FILE_PHASE]['rows'],
+        'rows_per_second': input_rows / duration if duration > 0 else 0,
+        'peak_memory_bytes': peak_memory(),
+        'phases': phases,
+    }
+
+def run_in_child(current_file_path: Path, new_file_path: Path, output_file_path: Path, engine: str, engine_options: Dict[str, Any]) -> Dict[str, Any]:
+    """Runs one conversion in a fresh process.
+
+    Args:
+        current_file_path (Path): The current file.
+        new_file_path (Path): The new file.
+        output_file_path (Path): The output file.
+        engine (str): The conversion engine.
+        engine_options (Dict[str, Any]): Options specific to the engine.
+
+    Returns:
+        Dict[str, Any]: The results of run_conversion.
+    """
+    # Spawn rather than fork, so the child does not inherit the memory of this process
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(run_conversion, current_file_path, new_file_path, output_file_path, engine, engine_options).result()
+
+def summarise(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Picks the fastest of several runs.
+
+    Args:
+        runs (List[Dict[str, Any]]): The results of each run.
+
+    Returns:
+        Dict[str, Any]: The fastest run, along with the duration of every run.
+    """
+    fastest = min(runs, key=lambda run: run['seconds'])
+
+    return dict(fastest, all_seconds=[run['seconds'] for run in runs])
+
+def git_revision() -> Optional[str]:
+    """Gets the git revision of the repository, if there is one.
+
+    Returns:
+        Optional[str]: The revision, None if it cannot be found.
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True, cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Parses the command line arguments and runs the benchmarks.
+
+    Args:
+        argv (Optional[List[str]]): The command line arguments, None to use sys.argv.
+    """
+    parser = argparse.ArgumentParser(description='Times each phase of a conversion on synthetic data.')
+    parser.add_argument('--scales', type=int, nargs='+', default=[10000, 100000, 1000000], help='rows in the current file for each benchmark (default: 10000 100000 1000000)')
+    parser.add_argument('--new-ratio', type=float, default=0.5, help='rows in the new file as a fraction of the rows in the current file (default: 0.5)')
+    parser.add_argument('--overlap', type=float, default=0.8, help='fraction of the new rows whose icao24 is in the current file (default: 0.8)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the data generator (default: 0)')
+    parser.add_argument('--engine', choices=list(ENGINES), default=constants.IN_MEMORY_ENGINE, help=f'conversion engine (default: {constants.IN_MEMORY_ENGINE})')
+    parser.add_argument('--workers', type=int, help=f'processes parsing the new file with the {constants.IN_MEMORY_ENGINE} engine')
+    parser.add_argument('--cache', action='store_true', help=f'cache the parsed current file in --data-dir, so every run after the first loads it from the cache, not used by the {constants.EXTERNAL_SORT_ENGINE} or {constants.COLUMNAR_ENGINE} engines')
+    parser.add_argument('--repeat', type=int, default=1, help='runs of each benchmark, the fastest is reported (default: 1)')
+    parser.add_argument('--data-dir', type=Path, default=Path(tempfile.gettempdir()) / 'aircraft-db-converter-benchmarks', help='directory the generated files are kept in between runs')
+    parser.add_argument('--output', type=Path, help='file to save the results to (default: a timestamped file in benchmarks/results)')
+
+    args = parser.parse_args(argv)
+
+    # Only the in memory engine supports parallel parsing
+    engine_options: Dict[str, Any] = {'workers': args.workers} if args.workers is not None else {}
+
+    # Parse the current file on every run unless the cache is being benchmarked, the external sort and columnar engines never use the cache
+    if args.engine not in (constants.EXTERNAL_SORT_ENGINE, constants.COLUMNAR_ENGINE):
+        engine_options['cache_directory'] = args.data_dir / 'cache' if args.cache else None
+
+    results: Dict[str, Any] = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': multiprocessing.cpu_count(),
+        'engine': args.engine,
+        'engine_options': engine_options,
+        'new_ratio': args.new_ratio,
+        'overlap': args.overlap,
+        'seed': args.seed,
+        'benchmarks': [],
+    }
+
+    for scale in args.scales:
+        # Generate the files, or reuse them from an earlier run
+        current_file_path, new_file_path = generate_files(args.data_dir, scale, int(scale * args.new_ratio), args.overlap, args.seed)
+        output_file_path = args.data_dir / f'output_{scale}.txt'
+
+        # Run the conversion
+        runs = [run_in_child(current_file_path, new_file_path, output_file_path, args.engine, engine_options) for _ in range(args.repeat)]
+        result = dict(summarise(runs), current_rows=scale, current_file_bytes=current_file_path.stat().st_size, new_file_bytes=new_file_path.stat().st_size)
+        results['benchmarks'].append(result)
+
+        # Report the result
+        peak = f'{result["peak_memory_bytes"] / 2 ** 20:,.0f} MB' if result['peak_memory_bytes'] is not None else 'unknown'
+        phases = ', '.join(f'{phase} {values["seconds"]:.2f} s ({values["rows_per_second"]:,.0f} rows/s)' for phase, values in result['phases'].items())
+        print(f'{scale:>9,} rows: {result["seconds"]:.2f} s ({result["rows_per_second"]:,.0f} rows/s), peak memory {peak} - {phases}')
+
+    # Save the results
+    output_path = args.output or RESULTS_PATH / f'{datetime.now().strftime("%Y%m%d-%H%M%S")}-{args.engine}.json'
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(json.dumps(results, indent=4, default=str), encoding='utf-8')
+
+    print(f'Results saved to {output_path}')
+
+if __name__ == '__main__':
+    main()
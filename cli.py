@@ -0,0 +1,373 @@
+"""Runs a conversion from the command line without the user interface.
+
+The three phases of the conversion are run back to back and the throughput of each phase is reported on standard error.
+
+Any of the file paths can be '-' to read from standard input or write to standard output, for example:
+
+    zcat aircraftDatabase.csv.gz | python cli.py "IRCA.txt" - - | gzip > merged.txt.gz
+
+Further new files can be merged in the same conversion with --source, each overwriting the values merged from the files before it:
+
+    python cli.py "IRCA.txt" aircraftDatabase.csv merged.txt --source registry.txt tab registry_mapping.json --changes changes.json
+
+Functions:
+    parse_delimiter: Converts a delimiter argument into a single character.
+    load_mapping: Loads and validates the mapping to use for the conversion.
+    parse_sources: Converts the --source arguments into the additional new files to merge.
+    save_changes: Saves the rows and fields each new file changed.
+    run_phase: Runs one phase of the conversion to completion.
+    save_instrumentation: Saves the trace, profile and memory report of a conversion.
+    main: Parses the command line arguments and runs the conversion.
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from Converter import ENGINES, Instrumentation, NewFileSource, SourceChanges, create_converter, default_engine
+from Converter.columnar import columnar_available
+from Converter.streams import DECOMPRESSION_ERRORS, is_standard_stream
+
+import constants
+
+def parse_delimiter(value: str) -> str:
+    """Converts a delimiter argument into a single character.
+
+    Args:
+        value (str): The delimiter, either a single character, 'tab' or '\\t'.
+
+    Returns:
+        str: The delimiter character.
+
+    Raises:
+        argparse.ArgumentTypeError: If the delimiter is not a single character.
+    """
+    # Allow tabs to be given without having to quote a literal tab character
+    if value.lower() in ('tab', '\\t'):
+        return '\t'
+
+    # Ensure the delimiter is a single character
+    if len(value) != 1:
+        raise argparse.ArgumentTypeError(f'delimiter must be a single character, not {value!r}')
+
+    # Return the delimiter
+    return value
+
+def load_mapping(mapping_path: Optional[Path]) -> Dict[str, str]:
+    """Loads and validates the mapping to use for the conversion.
+
+    Args:
+        mapping_path (Optional[Path]): The mapping JSON file, None to use the default mapping.
+
+    Returns:
+        Dict[str, str]: The mapping of the IRCA fieldnames to the new file's fieldnames.
+
+    Raises:
+        ValueError: If the mapping is not valid.
+    """
+    # Use the user's default mapping if there is one, otherwise use the original mapping
+    if mapping_path is None:
+        if constants.DEFAULT_MAPPING_PATH.is_file():
+            mapping_path = constants.DEFAULT_MAPPING_PATH
+        else:
+            return dict(constants.ORIGINAL_IRCA_MAPPING)
+
+    # Read the mapping file
+    with mapping_path.open('r', encoding='utf8') as mapping_file:
+        mapping = json.load(mapping_file)
+
+    # Check the mapping is a dictionary of strings
+    if not isinstance(mapping, dict) or not all(isinstance(key, str) and isinstance(value, str) for key, value in mapping.items()):
+        raise ValueError(f'{mapping_path} does not contain a mapping of field names')
+
+    # Check the Mode S field is mapped
+    if mapping.get(constants.MODE_S_ADDRESS_KEY, constants.NO_MAPPING_STRING) == constants.NO_MAPPING_STRING:
+        raise ValueError(f'{constants.MODE_S_ADDRESS_KEY} field must be mapped')
+
+    # Return the mapping
+    return mapping
+
+def parse_sources(source_arguments: List[List[str]], new_delimiter: str, mapping: Dict[str, str]) -> List[NewFileSource]:
+    """Converts the --source arguments into the additional new files to merge.
+
+    Args:
+        source_arguments (List[List[str]]): The values given to each --source, the file optionally followed by its delimiter and mapping JSON file.
+        new_delimiter (str): The delimiter of the new file, used for sources which do not give a delimiter.
+        mapping (Dict[str, str]): The mapping of the new file, used for sources which do not give a mapping.
+
+    Returns:
+        List[NewFileSource]: The new files, in the order they were given.
+
+    Raises:
+        argparse.ArgumentTypeError: If a source has too many values or an invalid delimiter.
+        OSError, ValueError: If the mapping of a source cannot be loaded.
+    """
+    sources = []
+
+    for values in source_arguments:
+        if len(values) > 3:
+            raise argparse.ArgumentTypeError(f'--source takes a file, a delimiter and a mapping, not {" ".join(values)}')
+
+        # Use the new file's delimiter and mapping for any which are not given
+        path = Path(values[0])
+        delimiter = parse_delimiter(values[1]) if len(values) > 1 else new_delimiter
+        source_mapping = load_mapping(Path(values[2])) if len(values) > 2 else mapping
+
+        sources.append(NewFileSource(path, delimiter, source_mapping))
+
+    return sources
+
+def save_changes(source_changes: List[SourceChanges], changes_path: Optional[Path], quiet: bool) -> None:
+    """Saves the rows and fields each new file changed.
+
+    Args:
+        source_changes (List[SourceChanges]): The changes made by each new file, in the order they were merged.
+        changes_path (Optional[Path]): The JSON file to save the changes to, None to only report them.
+        quiet (bool): True to suppress the report of the number of rows each new file added and changed.
+    """
+    # Report the number of rows each new file added and changed
+    if not quiet:
+        for changes in source_changes:
+            print(f'{changes.source.path}: {changes.lines_read} rows merged, {len(changes.added)} rows added, {len(changes.changed)} rows changed', file=sys.stderr)
+
+    if changes_path is None:
+        return
+
+    # Save the changes
+    try:
+        with changes_path.open('w', encoding='utf8') as changes_file:
+            json.dump([changes.report() for changes in source_changes], changes_file, indent=4)
+
+    except OSError as error:
+        logging.error('Could not save the changes: %s', error)
+
+def run_phase(name: str, initialise: Callable[[], None], step: Callable[[], Tuple[float, bool]], rows: Callable[[], int], quiet: bool) -> None:
+    """Runs one phase of the conversion to completion.
+
+    Args:
+        name (str): The name of the phase, used in the report.
+        initialise (Callable[[], None]): Initialises the phase.
+        step (Callable[[], Tuple[float, bool]]): Runs the phase, returning the percentage complete and whether it is still running.
+        rows (Callable[[], int]): Returns the number of rows processed by the phase.
+        quiet (bool): True to suppress the report.
+    """
+    # Get the start time
+    start_time = time.perf_counter()
+
+    # Initialise and run the phase
+    initialise()
+
+    while step()[1]:
+        pass
+
+    # Calculate the throughput
+    elapsed = time.perf_counter() - start_time
+    rows_processed = rows()
+    rows_per_second = rows_processed / elapsed if elapsed > 0 else 0
+
+    # Report the throughput
+    if not quiet:
+        print(f'{name}: {rows_processed} rows in {elapsed:.2f} s ({rows_per_second:,.0f} rows/s)', file=sys.stderr)
+
+def save_instrumentation(instrumentation: Instrumentation, trace_path: Optional[Path], profile_path: Optional[Path], memory_report_path: Optional[Path], quiet: bool) -> None:
+    """Saves the trace, profile and memory report of a conversion.
+
+    Args:
+        instrumentation (Instrumentation): The instrumentation attached to the converter.
+        trace_path (Optional[Path]): The file to save the Chrome trace to, None to not save it.
+        profile_path (Optional[Path]): The file to save the pstats to, None to not save them.
+        memory_report_path (Optional[Path]): The file to save the memory report to, None to not save it.
+        quiet (bool): True to suppress the report of the time spent in each sub-step.
+    """
+    try:
+        if trace_path is not None:
+            instrumentation.save_trace(trace_path)
+
+        if profile_path is not None:
+            instrumentation.save_profile(profile_path)
+
+        if memory_report_path is not None:
+            instrumentation.save_memory_report(memory_report_path)
+
+    except (OSError, ValueError) as error:
+        logging.error('Could not save the instrumentation: %s', error)
+
+    finally:
+        instrumentation.stop()
+
+    # Report the time spent in each sub-step
+    if not quiet and instrumentation.summary():
+        print('Sub-steps: ' + ', '.join(f'{step} {seconds:.2f} s' for step, seconds in instrumentation.summary().items()), file=sys.stderr)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Parses the command line arguments and runs the conversion.
+
+    Args:
+        argv (Optional[List[str]]): The command line arguments, None to use sys.argv.
+
+    Returns:
+        int: The exit code.
+    """
+    # Set up the argument parser
+    parser = argparse.ArgumentParser(description=f'{constants.APPLICATION_NAME} - merges a New File into the Current File without the user interface.')
+    parser.add_argument('current_file', type=Path, help="the current IRCA file, '-' for standard input")
+    parser.add_argument('new_file', type=Path, help="the file to merge into the current file, '-' for standard input")
+    parser.add_argument('output_file', type=Path, help="the file to write the merged data to, '-' for standard output")
+    parser.add_argument('--current-delimiter', type=parse_delimiter, default=constants.DEFAULT_CURRENT_FILE_DELIMITER, help='delimiter of the current file (default: tab)')
+    parser.add_argument('--new-delimiter', type=parse_delimiter, default=constants.DEFAULT_NEW_FILE_DELIMITER, help='delimiter of the new file (default: ,)')
+    parser.add_argument('--mapping', type=Path, help='mapping JSON file (default: the saved default mapping)')
+    parser.add_argument('--source', action='append', nargs='+', default=[], metavar='FILE', help="another file to merge after the new file, optionally followed by its delimiter and mapping JSON file (default: those of the new file), can be repeated, each file overwrites the values merged from the files before it")
+    parser.add_argument('--changes', type=Path, metavar='FILE', help='save the rows and fields each new file changed to FILE as JSON')
+    parser.add_argument('--sorted', action='store_true', help=f'write the rows sorted by ICAO address and save an index of the address and byte offset of each row to the output file name followed by {constants.OUTPUT_INDEX_SUFFIX}, not supported by the {constants.INCREMENTAL_ENGINE} engine')
+    parser.add_argument('--engine', choices=list(ENGINES), help=f'conversion engine, {constants.EXTERNAL_SORT_ENGINE} merges files larger than memory (default: {constants.COLUMNAR_ENGINE} if pyarrow and NumPy are installed, otherwise {constants.IN_MEMORY_ENGINE})')
+    parser.add_argument('--memory-budget', type=int, metavar='MB', help=f'approximate memory used for rows by the {constants.EXTERNAL_SORT_ENGINE} engine, in megabytes (default: {constants.DEFAULT_MEMORY_BUDGET // 2 ** 20})')
+    parser.add_argument('--workers', type=int, metavar='N', help=f'number of processes parsing the new file with the {constants.IN_MEMORY_ENGINE} engine (default: {constants.DEFAULT_WORKERS})')
+    parser.add_argument('--no-cache', action='store_true', help=f'always parse the current file rather than loading its rows from the cache in {constants.CACHE_PATH}, the {constants.EXTERNAL_SORT_ENGINE} and {constants.COLUMNAR_ENGINE} engines never use the cache')
+    parser.add_argument('--trace', type=Path, metavar='FILE', help='save a Chrome trace of the phases, time slices and sub-steps to FILE, the phases are run in time slices so the trace shows their progress')
+    parser.add_argument('--profile', type=Path, metavar='FILE', help='profile the conversion with cProfile and save the pstats to FILE')
+    parser.add_argument('--memory-report', type=Path, metavar='FILE', help='trace memory allocations and save the lines of code holding the most memory to FILE')
+    parser.add_argument('-q', '--quiet', action='store_true', help='do not report the progress of each phase')
+    parser.add_argument('-v', '--verbose', action='store_true', help='log debug messages to standard error')
+
+    args = parser.parse_args(argv)
+
+    # Log to standard error, keeping standard output free for the output file
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s', datefmt='%d-%b-%y %H:%M:%S')
+
+    # Load the mapping, and the delimiter and mapping of each additional new file
+    try:
+        mapping = load_mapping(args.mapping)
+        additional_sources = parse_sources(args.source, args.new_delimiter, mapping)
+    except argparse.ArgumentTypeError as error:
+        parser.error(str(error))
+    except (OSError, ValueError) as error:
+        logging.error('Invalid mapping: %s', error)
+        return constants.EXIT_INVALID_ARGUMENTS
+
+    input_files = [args.current_file, args.new_file] + [source.path for source in additional_sources]
+
+    # Standard input can only be read once
+    if sum(is_standard_stream(input_file) for input_file in input_files) > 1:
+        parser.error('only one of the current file and the new files can be read from standard input')
+
+    # Check the files are different
+    if not is_standard_stream(args.output_file) and args.output_file in input_files:
+        parser.error('the output file cannot be the same as the current file or a new file')
+
+    # Check the input files exist
+    for input_file in input_files:
+        if not is_standard_stream(input_file) and not input_file.is_file():
+            parser.error(f'{input_file} does not exist')
+
+    # Choose the engine, parallel parsing is only supported by the in memory engine so it is used if the number of workers is given
+    if args.engine is None:
+        args.engine = constants.IN_MEMORY_ENGINE if args.workers is not None else default_engine()
+
+    # The columnar engine needs its optional modules
+    if args.engine == constants.COLUMNAR_ENGINE and not columnar_available():
+        parser.error(f'the {constants.COLUMNAR_ENGINE} engine needs {" and ".join(constants.COLUMNAR_ENGINE_MODULES)} to be installed')
+
+    # The memory budget only applies to the external sort engine
+    engine_options: Dict[str, Any] = {}
+
+    if args.memory_budget is not None:
+        if args.engine != constants.EXTERNAL_SORT_ENGINE:
+            parser.error(f'--memory-budget can only be used with the {constants.EXTERNAL_SORT_ENGINE} engine')
+
+        engine_options['memory_budget'] = args.memory_budget * 2 ** 20
+
+    # Parallel parsing only applies to the in memory engine
+    if args.workers is not None:
+        if args.engine != constants.IN_MEMORY_ENGINE:
+            parser.error(f'--workers can only be used with the {constants.IN_MEMORY_ENGINE} engine')
+
+        if args.workers < 1:
+            parser.error('--workers must be at least 1')
+
+        engine_options['workers'] = args.workers
+
+    # Only some engines can merge several new files, the changes are recorded by the same engines
+    if additional_sources or args.changes is not None:
+        if not ENGINES[args.engine].multiple_sources:
+            parser.error(f'--source and --changes cannot be used with the {args.engine} engine')
+
+        if additional_sources:
+            engine_options['additional_sources'] = additional_sources
+
+        # Record the changes so the rows each new file changed can be reported
+        engine_options['record_changes'] = True
+
+    # Sort the output, the incremental engine keeps the order of its previous output
+    if args.sorted:
+        if not ENGINES[args.engine].sortable_output:
+            parser.error(f'--sorted cannot be used with the {args.engine} engine')
+
+        engine_options['sorted_output'] = True
+
+    # The external sort and columnar engines never use the cache
+    if args.no_cache and args.engine not in (constants.EXTERNAL_SORT_ENGINE, constants.COLUMNAR_ENGINE):
+        engine_options['cache_directory'] = None
+
+    # Create the converter, running each phase to completion rather than in time slices unless the phases are being traced
+    converter = create_converter(
+        args.current_file,
+        args.current_delimiter,
+        args.new_file,
+        args.new_delimiter,
+        args.output_file,
+        mapping,
+        time_slice=timedelta(milliseconds=constants.UI_REFRESH_TIME) if args.trace is not None else None,
+        engine=args.engine,
+        **engine_options
+    )
+
+    # Instrument the converter if a trace, profile or memory report has been asked for
+    instrumentation = None
+
+    if args.trace is not None or args.profile is not None or args.memory_report is not None:
+        instrumentation = Instrumentation(profile=args.profile is not None, trace_memory=args.memory_report is not None)
+        instrumentation.attach(converter)
+
+    try:
+        # Run the three phases back to back
+        run_phase('Reading Current File', converter.initialise_current_file, converter.read_current_file, lambda: converter.lines_read, args.quiet)
+        run_phase('Merging New File', converter.initialise_new_file, converter.merge_new_file, converter.new_file_lines_read, args.quiet)
+        run_phase('Writing Output File', converter.initialise_output_file, converter.write_output_file, lambda: converter.lines_written, args.quiet)
+
+    except KeyboardInterrupt:
+        # Close the files
+        converter.conversion_cancelled()
+
+        # Log that the conversion was cancelled
+        logging.error('Conversion cancelled')
+
+        return constants.EXIT_CANCELLED
+
+    except (OSError, ValueError, UnicodeDecodeError) + DECOMPRESSION_ERRORS as error:
+        # Close the files
+        converter.conversion_cancelled()
+
+        # Log the error
+        logging.error('Conversion failed: %s', error)
+
+        return constants.EXIT_CONVERSION_FAILED
+
+    finally:
+        # Save the trace, profile and memory report, even if the conversion failed
+        if instrumentation is not None:
+            save_instrumentation(instrumentation, args.trace, args.profile, args.memory_report, args.quiet)
+
+    # Report and save the changes made by each new file
+    if additional_sources or args.changes is not None:
+        save_changes(converter.source_changes, args.changes, args.quiet)
+
+    # Return success
+    return constants.EXIT_SUCCESS
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -10,6 +10,7 @@ WINDOWS_SYSTEM = 'win32'
 MACOS_SYSTEM = 'aqua'
 
 UI_REFRESH_TIME = 100 # The time in milliseconds to wait before refreshing the progress bars
+UNPACK_POLL_TIME = 50 # The time in milliseconds to wait before checking if the default files have been unpacked
 
 # Default file paths
 BASE_PATH = Path(__file__).parent.absolute()
@@ -34,8 +35,127 @@ DOCS_PATH = Path(f'{BASE_PATH}/site/index.html')
 # Log path
 LOG_PATH = Path(f'{HOME_PATH}/aircraft-db-converter-log.txt')
 
+# Conversion phases reported by the conversion worker
+READ_CURRENT_FILE_PHASE = 'Reading Current File'
+MERGE_NEW_FILE_PHASE = 'Merging New File'
+WRITE_OUTPUT_FILE_PHASE = 'Writing Output File'
+CONVERSION_COMPLETE = 'Conversion Complete'
+CONVERSION_FAILED = 'Conversion Failed'
+CONVERSION_CANCELLED = 'Conversion Cancelled'
+
+# Conversion engines
+IN_MEMORY_ENGINE = 'memory'
+EXTERNAL_SORT_ENGINE = 'external'
+INCREMENTAL_ENGINE = 'incremental'
+PIPELINED_ENGINE = 'pipelined'
+COLUMNAR_ENGINE = 'columnar'
+COLUMNAR_ENGINE_MODULES = ('pyarrow', 'numpy') # The optional modules the columnar engine needs, it is chosen by default when they are all installed
+
+# External sort settings
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024 # The approximate number of bytes of rows held in memory before they are spilled to disk
+SPILL_FILE_CHUNK_ROWS = 128 # The number of records written to a spill file at a time
+MAX_SPILL_FILE_RUNS = 32 # The number of spill files merged at the same time
+STRING_OVERHEAD = 49 # The approximate number of bytes used by a string in addition to its characters
+
+# Incremental conversion settings
+INCREMENTAL_STATE_SUFFIX = '.state' # Added to the name of the output file to give the name of the file storing the state of the last conversion
+INCREMENTAL_STATE_VERSION = 2 # Incremented whenever the format of the state file changes
+PARTIAL_OUTPUT_SUFFIX = '.partial' # Added to the name of the output file while it is being written
+
+# Pipelined conversion settings
+PIPELINE_QUEUE_SIZE = 16 # The number of batches each queue between the stages holds before the stage filling it waits
+PIPELINE_BATCH_ROWS = 4096 # The number of rows of the new file passed between the stages at a time
+PIPELINE_POLL_TIME = 0.1 # The number of seconds a stage waits on a full queue before checking whether it has been stopped
+ROW_DIGEST_SIZE = 8 # The number of bytes in the digest of the rows of the new file with the same Mode S ID
+COPY_CHUNK_SIZE = 1024 * 1024 # The largest number of bytes copied from the previous output file at a time
+
+# Reading current files from a memory map
+MAPPED_READER_CHUNK_SIZE = 1024 * 1024 # The number of bytes of whole lines decoded and split at a time
+MAPPED_READER_SPECIAL_CHARACTERS = '"\r\n' # Delimiters which cannot be split directly as csv.reader treats them specially
+
+# Cache of parsed current files
+CACHE_PATH = Path(f'{HOME_PATH}/cache')
+CACHE_SUFFIX = '.rows' # The suffix of each cache entry
+CACHE_VERSION = 2 # Incremented whenever the format of the cache entries changes
+CACHE_DIGEST_SIZE = 16 # The number of bytes in the hash of a cached file's contents
+CACHE_SIZE_LIMIT = 1024 * 1024 * 1024 # The largest total size of the cache entries in bytes, the least recently used entries are removed first
+
+# Time slice scheduling settings
+INITIAL_BATCH_SIZE = 64 # The number of rows processed in the first batch of a phase, before the throughput has been measured
+MAX_BATCH_SIZE = 8192 # The largest number of rows processed between checks of the clock
+BATCH_TARGET_FRACTION = 0.25 # The fraction of a time slice each batch aims to take
+BATCH_SMOOTHING = 0.5 # How much each new measurement of the time taken per row changes the estimate
+ALLOWED_SLICE_OVERRUN = 0.5 # The fraction of the target a time slice can overrun by before it is counted as an overrun
+
+# ICAO addresses, the key of every row
+ICAO24_DIGITS = 6 # The largest number of hexadecimal digits in a 24-bit ICAO address
+HEXADECIMAL_DIGITS = frozenset('0123456789abcdefABCDEF') # The characters allowed in a Mode S ID
+ICAO24_FORMAT = '06X' # The format of a Mode S ID written from an address
+ICAO24_PATTERN = '^[0-9A-Fa-f]{1,6}$' # A regular expression matching a valid Mode S ID once its padding is removed
+
+# Row store index, the rows restored or compacted into a store are indexed by sorted entries
+ROW_INDEX_POSITION_BITS = 32 # The number of low bits of each index entry holding the position of the row, the ICAO address is held in the bits above them
+
+# String pooling, the values of these fields are shared between rows
+POOLED_FIELDS = frozenset((
+    'Country_ICAOCountryName', 'Country_1_ICAOCountryName', 'AirportName', 'CellCategoryDesc',
+    'CellManufacturer', 'NCAACellManufacturer', 'CellMake', 'CellMasterModel', 'CellModel', 'NCAACellModel', 'CellMasterSerie', 'CellSeries', 'CellPopularName',
+    'PaxCount', 'NCAAPaxCount', 'CellMTOW', 'NCAAMTOW', 'CellYearFirstConstruction', 'NCAAYearOfConstruction',
+    'Length', 'CellWidth', 'CellHeight', 'Ceiling', 'MaximumSpeed', 'ConstructionMaterial', 'AerofoilDesc', 'EmpennageDesc', 'LandingGearDesc', 'Pressurization',
+    'EngineCount', 'OACICODE', 'NCAANoiseInformation', 'NCAACDNCategory',
+    'EngineCategory', 'EngineManufacturer', 'NCAAEngineManufacturer', 'NCAAEngineType', 'EngineModel', 'NCAAEngineModel', 'EngineHorsePower', 'EngineUnity',
+    'PropellerCategoryDesc', 'PropellerManufacturer', 'NCAAPropellerManufacturer', 'PropellerModel', 'NCAAPropellerModel',
+)) # The fields describing the type, country and equipment of an aircraft, which repeat the same few values, the registration, owner, operator, dates and Mode S ID are almost all different
+
+# Output settings
+OUTPUT_BATCH_ROWS = 1024 # The number of rows formatted and written to the output file at a time
+
+# Sorted output and its index
+OUTPUT_INDEX_SUFFIX = '.idx' # Added to the name of a sorted output file to give the name of its index
+OUTPUT_INDEX_MAGIC = b'IRCAIDX\0' # The first bytes of an index file
+OUTPUT_INDEX_VERSION = 1 # Incremented whenever the format of the index file changes
+OUTPUT_INDEX_OFFSET_BITS = 40 # The number of low bits of each index entry holding the byte offset of the row, the ICAO address is held in the bits above them
+
+# Aircraft lookups
+LOOKUP_CACHE_SIZE = 65536 # The number of addresses whose rows are kept in memory by a lookup reading an indexed output file, the least recently used are dropped first
+
+# Parallel parsing settings
+DEFAULT_WORKERS = 1 # The number of processes parsing the new file, 1 parses it in the main process
+CHUNKS_PER_WORKER = 4 # The number of byte ranges the new file is split into for each worker process
+MINIMUM_CHUNK_SIZE = 1024 * 1024 # The smallest byte range of the new file given to a worker process
+
+# Instrumentation settings
+MEMORY_REPORT_LINES = 25 # The number of lines of code listed in the memory report
+TRACE_DIRECTORY_VARIABLE = 'AIRCRAFT_DB_CONVERTER_TRACE_DIR' # Environment variable naming a directory to save a trace and profile of each conversion run from the user interface to
+TRACE_FILENAME = 'conversion-trace.json'
+PROFILE_FILENAME = 'conversion.pstats'
+
+# Compression formats which input files are decompressed from as they are read
+ZIP_COMPRESSION = 'zip'
+GZIP_COMPRESSION = 'gzip'
+BZIP2_COMPRESSION = 'bzip2'
+XZ_COMPRESSION = 'xz'
+COMPRESSION_SIGNATURES = {
+    b'PK\x03\x04': ZIP_COMPRESSION,
+    b'\x1f\x8b': GZIP_COMPRESSION,
+    b'BZh': BZIP2_COMPRESSION,
+    b'\xfd7zXZ\x00': XZ_COMPRESSION,
+}
+COMPRESSED_FILE_TYPES = ('Compressed Files', '*.zip *.gz *.bz2 *.xz')
+
+# Path used to read from standard input or write to standard output
+STANDARD_STREAM_PATH = '-'
+
+# Command line exit codes
+EXIT_SUCCESS = 0
+EXIT_CONVERSION_FAILED = 1
+EXIT_INVALID_ARGUMENTS = 2
+EXIT_CANCELLED = 130
+
 # Dialect settings
 SNIFFER_READ_SIZE = 8192
+PROBE_CACHE_SIZE = 16 # The number of file probes cached, the least recently used are dropped first
+PRELOAD_BATCH_ROWS = 10000 # The number of rows of a new file parsed in the background between checks for cancellation
 DEFAULT_CURRENT_FILE_DELIMITER = '\t'
 DEFAULT_NEW_FILE_DELIMITER = ','
 DEFAULT_OUTPUT_FILE_DELIMITER = '\t'
@@ -54,6 +174,7 @@ MAPPING_DIALOG_ITEMS_PER_COLUMN = 2
 NO_MAPPING_STRING = 'Do not Map'
 
 MODE_S_ADDRESS_KEY = 'ModeSCode'
+REGISTRATION_KEY = 'RegistrationMark'
 
 ORIGINAL_IRCA_MAPPING = {
     'RegistrationMark': 'registration',
@@ -0,0 +1,128 @@
+"""Fixtures shared by the tests.
+
+The tests convert a small current file and new file, then check the output file, its index and the lookups built from them.
+"""
+
+import sys
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import pytest
+
+# Import the application modules from the root of the repository
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import constants
+from Converter import Converter, create_converter
+
+# The rows of the current file, a Mode S ID in lower case, one with padding, and two which are not valid addresses and are skipped
+CURRENT_ROWS: List[Dict[str, str]] = [
+    {'ModeSCode': 'A1B2C3', 'RegistrationMark': 'N123AB', 'OwnerName': 'Jones Aviation', 'CellManufacturer': 'CESSNA'},
+    {'ModeSCode': '4ca7b9', 'RegistrationMark': 'EI-DVM', 'OwnerName': 'Ryanair', 'CellManufacturer': 'BOEING'},
+    {'ModeSCode': '  00ABCD', 'RegistrationMark': 'N1', 'OwnerName': 'Smith', 'CellManufacturer': 'PIPER'},
+    {'ModeSCode': '478F41', 'RegistrationMark': 'LN-ABC', 'OwnerName': 'Ålesund Flyklubb', 'CellManufacturer': 'PIPER'},
+    {'ModeSCode': '-00007', 'RegistrationMark': 'BAD-1', 'OwnerName': 'Invalid', 'CellManufacturer': 'CESSNA'},
+    {'ModeSCode': '', 'RegistrationMark': 'BAD-2', 'OwnerName': 'Blank', 'CellManufacturer': 'CESSNA'},
+]
+
+# The rows of the new file, changing an existing aircraft written in another case and adding two, one with a Mode S ID which is not a valid address
+NEW_ROWS: List[Dict[str, str]] = [
+    {'icao24': 'a1b2c3', 'registration': 'N123AB', 'model': '172 Skyhawk', 'owner': 'Jones Aviation'},
+    {'icao24': '3c6444', 'registration': 'D-AIBL', 'model': 'A319', 'owner': 'Lufthansa Flugbücherei'},
+    {'icao24': 'zzzzzz', 'registration': 'BAD-3', 'model': 'A320', 'owner': 'Invalid'},
+]
+
+# The mapping of the IRCA fields to the fields of the new file
+MAPPING = {field: constants.NO_MAPPING_STRING for field in constants.ORIGINAL_IRCA_MAPPING}
+MAPPING.update({'ModeSCode': 'icao24', 'RegistrationMark': 'registration', 'CellModel': 'model', 'OwnerName': 'owner'})
+
+# The addresses of the rows of the output file, in address order
+OUTPUT_ADDRESSES = [0x00ABCD, 0x3C6444, 0x478F41, 0x4CA7B9, 0xA1B2C3]
+
+def write_files(directory: Path) -> Dict[str, Path]:
+    """Writes the current file and new file.
+
+    Args:
+        directory (Path): The directory to write the files in.
+
+    Returns:
+        Dict[str, Path]: The paths of the current, new and output files.
+    """
+    fieldnames = list(constants.ORIGINAL_IRCA_MAPPING)
+    current_file_path = directory / 'current.txt'
+    new_file_path = directory / 'new.csv'
+
+    # Write the current file with every IRCA field
+    with current_file_path.open('w', encoding='utf-8', newline='') as current_file:
+        current_file.write('\t'.join(fieldnames) + '\r\n')
+
+        for row in CURRENT_ROWS:
+            current_file.write('\t'.join(row.get(field, '') for field in fieldnames) + '\r\n')
+
+    # Write the new file with the fields of an OpenSky file
+    new_fieldnames = list(NEW_ROWS[0])
+
+    with new_file_path.open('w', encoding='utf-8', newline='') as new_file:
+        new_file.write(','.join(new_fieldnames) + '\r\n')
+
+        for row in NEW_ROWS:
+            new_file.write(','.join(row[field] for field in new_fieldnames) + '\r\n')
+
+    return {'current': current_file_path, 'new': new_file_path, 'output': directory / 'output.txt'}
+
+def run_conversion(converter: Converter) -> Converter:
+    """Runs each phase of a conversion to completion.
+
+    Args:
+        converter (Converter): The converter.
+
+    Returns:
+        Converter: The converter, once its output file has been written.
+    """
+    for initialise, step in (
+        (converter.initialise_current_file, converter.read_current_file),
+        (converter.initialise_new_file, converter.merge_new_file),
+        (converter.initialise_output_file, converter.write_output_file),
+    ):
+        initialise()
+
+        while step()[1]:
+            pass
+
+    return converter
+
+@pytest.fixture
+def convert(tmp_path: Path) -> Callable[..., Converter]:
+    """Creates a function converting the test files with an engine, writing a sorted and indexed output file.
+
+    Args:
+        tmp_path (Path): The temporary directory of the test.
+
+    Returns:
+        Callable[..., Converter]: The function, taking the name of the engine and returning the converter once the output file has been written.
+    """
+    paths = write_files(tmp_path)
+
+    def convert_with(engine: str = constants.IN_MEMORY_ENGINE) -> Converter:
+        # The parsed file cache is not used, so the tests never write outside their temporary directory
+        engine_options = {'cache_directory': None} if engine == constants.IN_MEMORY_ENGINE else {}
+
+        converter = create_converter(
+            paths['current'], '\t', paths['new'], ',', paths['output'], MAPPING, None, engine=engine, sorted_output=True, **engine_options
+        )
+
+        return run_conversion(converter)
+
+    return convert_with
+
+@pytest.fixture
+def output_file(convert: Callable[..., Converter]) -> Path:
+    """Converts the test files with the in memory engine.
+
+    Args:
+        convert (Callable[..., Converter]): The function converting the test files.
+
+    Returns:
+        Path: The path of the sorted output file, with its index next to it.
+    """
+    return convert().output_file_path
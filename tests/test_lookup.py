@@ -0,0 +1,124 @@
+"""Tests of the aircraft lookups built from a conversion or an output file."""
+
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+import constants
+from Converter import AircraftLookup, Converter, IndexedFileLookup
+
+from conftest import OUTPUT_ADDRESSES
+
+# Mode S IDs which are not valid addresses, and addresses with no row
+INVALID_ADDRESSES = ['zzzzzz', '-00007', '1234567', '0x1234', '', -1, 1 << 24]
+MISSING_ADDRESSES = [0x123456, '123456', 0xFFFFFF]
+
+@pytest.fixture(params=[constants.IN_MEMORY_ENGINE, constants.EXTERNAL_SORT_ENGINE])
+def lookup(request: pytest.FixtureRequest, convert: Callable[..., Converter]) -> AircraftLookup:
+    """Creates a lookup from a conversion, using the merged rows of the in memory engine and reading back the output file of the external sort engine.
+
+    Args:
+        request (pytest.FixtureRequest): The request, whose parameter is the engine.
+        convert (Callable[..., Converter]): The function converting the test files.
+
+    Returns:
+        AircraftLookup: The lookup.
+    """
+    return AircraftLookup.from_converter(convert(request.param))
+
+def test_round_trip(lookup: AircraftLookup, output_file: Path) -> None:
+    with IndexedFileLookup(output_file) as file_lookup:
+        assert len(lookup) == len(file_lookup) == len(OUTPUT_ADDRESSES)
+
+        # Both lookups return the same row for every address
+        for address in OUTPUT_ADDRESSES:
+            row = lookup.get(address)
+
+            assert row is not None
+            assert dict(row) == dict(file_lookup.get(address)) # type: ignore[arg-type]
+            assert int(row[constants.MODE_S_ADDRESS_KEY], 16) == address
+
+def test_merged_values(lookup: AircraftLookup) -> None:
+    row = lookup.get('A1B2C3')
+
+    # The new file changed the aircraft of the current file, although its Mode S ID was in lower case
+    assert row is not None
+    assert row['CellModel'] == '172 Skyhawk'
+    assert row['CellManufacturer'] == 'CESSNA'
+
+def test_mode_s_id_in_any_case(lookup: AircraftLookup) -> None:
+    row = lookup.get(0x00ABCD)
+
+    assert row is not None
+    assert [lookup.get(address) for address in ('00ABCD', '00abcd', 'abcd', ' 00ABCD ')] == [row] * 4
+    assert '00abcd' in lookup
+
+def test_missing_address(lookup: AircraftLookup) -> None:
+    for address in MISSING_ADDRESSES:
+        assert lookup.get(address) is None
+        assert address not in lookup
+
+def test_invalid_address(lookup: AircraftLookup) -> None:
+    for address in INVALID_ADDRESSES:
+        assert lookup.get(address) is None
+        assert address not in lookup
+
+    assert None not in lookup
+
+def test_get_many(lookup: AircraftLookup) -> None:
+    addresses = ['a1b2c3', 0x123456, 'zzzzzz', 0x3C6444]
+    rows = lookup.get_many(addresses)
+
+    assert rows == [lookup.get(address) for address in addresses]
+    assert [row is not None for row in rows] == [True, False, False, True]
+
+def test_registration(lookup: AircraftLookup) -> None:
+    rows = lookup.get_by_registration(' ei-dvm ')
+
+    assert [row[constants.MODE_S_ADDRESS_KEY] for row in rows] == ['4ca7b9']
+    assert lookup.get_by_registration('BAD-1') == []
+    assert lookup.get_many_by_registration(['N123AB', 'G-NONE']) == [[lookup.get(0xA1B2C3)], []]
+
+def test_non_ascii_rows(lookup: AircraftLookup) -> None:
+    assert lookup.get(0x478F41)['OwnerName'] == 'Ålesund Flyklubb' # type: ignore[index]
+    assert lookup.get(0x3C6444)['OwnerName'] == 'Lufthansa Flugbücherei' # type: ignore[index]
+
+def test_row_view(lookup: AircraftLookup) -> None:
+    row = lookup.get(0x4CA7B9)
+
+    # The view is a read only mapping of every IRCA field
+    assert row is not None
+    assert list(row) == list(constants.ORIGINAL_IRCA_MAPPING)
+    assert list(row.values()) == [row[field] for field in row]
+    assert dict(row.items())['OwnerName'] == 'Ryanair'
+
+def test_from_file(output_file: Path) -> None:
+    lookup = AircraftLookup.from_file(output_file, cache_directory=None)
+
+    assert len(lookup) == len(OUTPUT_ADDRESSES)
+    assert lookup.get('3c6444')['RegistrationMark'] == 'D-AIBL' # type: ignore[index]
+
+def test_indexed_file_lookup(output_file: Path) -> None:
+    # A cache of one row drops each row as the next is looked up, so rows are read from the file again
+    with IndexedFileLookup(output_file, cache_size=1) as file_lookup:
+        first = [file_lookup.get(address) for address in OUTPUT_ADDRESSES]
+        second = file_lookup.get_many(reversed(OUTPUT_ADDRESSES))
+
+        assert second == first[::-1]
+        assert len(file_lookup.cache) == 1
+
+        for address in MISSING_ADDRESSES + INVALID_ADDRESSES:
+            assert file_lookup.get(address) is None
+            assert address not in file_lookup
+
+        assert file_lookup.get('a1b2c3')['CellModel'] == '172 Skyhawk' # type: ignore[index]
+        assert file_lookup.get(0x478F41)['OwnerName'] == 'Ålesund Flyklubb' # type: ignore[index]
+
+def test_indexed_file_lookup_changed_output_file(output_file: Path) -> None:
+    # Add a row after the output file was indexed
+    with output_file.open('a', encoding='utf-8', newline='') as file:
+        file.write('extra\r\n')
+
+    with pytest.raises(ValueError, match='has changed'):
+        IndexedFileLookup(output_file)
@@ -0,0 +1,124 @@
+"""Tests that the memory mapped reader returns the same rows as csv.reader."""
+
+import csv
+import random
+from pathlib import Path
+from typing import List
+
+import pytest
+
+import constants
+from Converter.mapped_reader import MappedReader
+
+# The values of the random files, including quotes, lone carriage returns and characters which are not ASCII
+PLAIN_VALUES = ['', 'A1B2C3', 'CESSNA', '172 Skyhawk', 'Ålesund Flyklubb', 'Flugbücherei', ' padded ', ',']
+SPECIAL_VALUES = ['"', '"quoted"', 'a "b" c', 'lone\rreturn', '\r', 'x""y']
+
+# The line endings of the random files, mixed within a file
+LINE_ENDINGS = ['\n', '\r\n']
+
+def write_random_file(path: Path, rng: random.Random, special_values: List[str], rows: int = 200) -> None:
+    """Writes a tab separated file of random values and line endings.
+
+    Args:
+        path (Path): The path of the file.
+        rng (random.Random): The random number generator.
+        special_values (List[str]): The values which may be chosen as well as the plain values.
+        rows (int, optional): The number of rows. Defaults to 200.
+    """
+    values = PLAIN_VALUES + special_values
+    lines = []
+
+    for _ in range(rows):
+        # Some rows are empty lines, the others have a random number of values
+        row = [rng.choice(values) for _ in range(rng.randrange(4))]
+        lines.append('\t'.join(row) + rng.choice(LINE_ENDINGS))
+
+    # The last line of a file does not always end with a line ending
+    text = ''.join(lines)
+
+    if rng.random() < 0.5:
+        text = text.rstrip('\r\n')
+
+    path.write_text(text, encoding='utf-8', newline='')
+
+def read_rows(path: Path) -> List[List[str]]:
+    """Reads every row of a file with the mapped reader.
+
+    Args:
+        path (Path): The path of the file.
+
+    Returns:
+        List[List[str]]: The rows.
+    """
+    reader = MappedReader.open(path, '\t')
+    assert reader is not None
+
+    try:
+        return list(reader)
+    finally:
+        reader.close()
+
+def read_csv_rows(path: Path) -> List[List[str]]:
+    """Reads every row of a file with csv.reader.
+
+    Args:
+        path (Path): The path of the file.
+
+    Returns:
+        List[List[str]]: The rows.
+    """
+    with path.open(encoding='utf-8', newline='') as file:
+        return list(csv.reader(file, delimiter='\t'))
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64, constants.MAPPED_READER_CHUNK_SIZE])
+@pytest.mark.parametrize('seed', range(20))
+def test_random_files(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, chunk_size: int, seed: int) -> None:
+    monkeypatch.setattr(constants, 'MAPPED_READER_CHUNK_SIZE', chunk_size)
+    rng = random.Random(seed)
+    path = tmp_path / 'random.txt'
+
+    # Files with only plain values are split directly, the others fall back to csv.reader
+    for special_values in ([], SPECIAL_VALUES):
+        write_random_file(path, rng, special_values)
+
+        assert read_rows(path) == read_csv_rows(path)
+
+@pytest.mark.parametrize('chunk_size', [1, 64])
+def test_fall_back_part_way(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, chunk_size: int) -> None:
+    monkeypatch.setattr(constants, 'MAPPED_READER_CHUNK_SIZE', chunk_size)
+    path = tmp_path / 'quoted.txt'
+
+    # Only the lines near the end of the file need csv.reader, one of them has a quoted line ending
+    lines = [f'{address:06X}\tPlain\r\n' for address in range(100)]
+    lines += ['000100\t"Two\nLines"\n', '000101\tlone\rreturn\n', '000102\tLast']
+    path.write_text(''.join(lines), encoding='utf-8', newline='')
+
+    reader = MappedReader.open(path, '\t')
+    assert reader is not None
+
+    try:
+        # The first rows are split directly, the reader then falls back for the rest of the file
+        rows = [next(reader) for _ in range(50)]
+        assert reader.fallback_reader is None
+
+        rows += list(reader)
+        assert reader.fallback_reader is not None
+    finally:
+        reader.close()
+
+    assert rows == read_csv_rows(path)
+    assert rows[100] == ['000100', 'Two\nLines']
+    assert reader.percentage_read() == 100
+
+def test_special_delimiters(tmp_path: Path) -> None:
+    path = tmp_path / 'empty.txt'
+    path.write_bytes(b'')
+
+    # Empty files and delimiters which csv.reader treats specially are not mapped
+    assert MappedReader.open(path, '\t') is None
+
+    path.write_text('a"b"c\n', encoding='utf-8')
+
+    for delimiter in constants.MAPPED_READER_SPECIAL_CHARACTERS:
+        assert MappedReader.open(path, delimiter) is None
@@ -0,0 +1,124 @@
+"""Tests of the index written next to a sorted output file."""
+
+import csv
+from pathlib import Path
+
+import pytest
+
+import constants
+from Converter import OutputIndex
+from Converter.icao import parse_icao24
+from Converter.output_index import OutputIndexWriter, output_index_path
+from Converter.writer import RowFormatter
+
+from conftest import OUTPUT_ADDRESSES
+
+def read_output_rows(output_file: Path) -> list:
+    """Parses every row of an output file.
+
+    Args:
+        output_file (Path): The path of the output file.
+
+    Returns:
+        list: The header followed by the values of each row.
+    """
+    with output_file.open(encoding='utf-8', newline='') as file:
+        return list(csv.reader(file, delimiter=constants.DEFAULT_OUTPUT_FILE_DELIMITER))
+
+def test_round_trip(output_file: Path) -> None:
+    header, *rows = read_output_rows(output_file)
+    key_column = header.index(constants.MODE_S_ADDRESS_KEY)
+
+    with OutputIndex(output_file) as index:
+        assert index.fieldnames == header
+        assert len(index) == len(rows)
+
+        # Every row is found by its address
+        for row in rows:
+            assert index.get(parse_icao24(row[key_column])) == row
+
+def test_rows_are_sorted_by_address(output_file: Path) -> None:
+    header, *rows = read_output_rows(output_file)
+    key_column = header.index(constants.MODE_S_ADDRESS_KEY)
+
+    assert [parse_icao24(row[key_column]) for row in rows] == OUTPUT_ADDRESSES
+
+    with OutputIndex(output_file) as index:
+        assert list(index.range(0, 1 << 24)) == rows
+        assert [parse_icao24(row[key_column]) for row in index.range('3C6444', 'A1B2C3')] == [0x3C6444, 0x478F41, 0x4CA7B9]
+
+def test_mode_s_id_in_any_case(output_file: Path) -> None:
+    with OutputIndex(output_file) as index:
+        row = index.get(0xA1B2C3)
+
+        assert row is not None
+        assert index.get('A1B2C3') == row
+        assert index.get('a1b2c3') == row
+        assert index.get(' a1b2c3 ') == row
+        assert index.get_all('a1b2c3') == [row]
+        assert 'a1b2c3' in index
+
+def test_missing_address(output_file: Path) -> None:
+    with OutputIndex(output_file) as index:
+        assert index.get(0x123456) is None
+        assert index.get('123456') is None
+        assert index.get_all(0x123456) == []
+        assert 0x123456 not in index
+        assert list(index.range(0x500000, 0xA00000)) == []
+
+@pytest.mark.parametrize('address', ['zzzzzz', '-00007', '1234567', '0x1234', '', -1, 1 << 24])
+def test_invalid_address(output_file: Path, address: object) -> None:
+    with OutputIndex(output_file) as index:
+        assert index.get(address) is None # type: ignore[arg-type]
+        assert address not in index
+
+def test_invalid_range(output_file: Path) -> None:
+    with OutputIndex(output_file) as index:
+        assert list(index.range('zzzzzz', 'FFFFFF')) == []
+        assert list(index.range('000000', 'zzzzzz')) == []
+
+def test_non_ascii_rows(output_file: Path) -> None:
+    with OutputIndex(output_file) as index:
+        owner_column = index.fieldnames.index('OwnerName')
+
+        # The offsets count the encoded bytes of each row, so the rows either side of a row which is not ASCII are found
+        assert index.get(0x3C6444)[owner_column] == 'Lufthansa Flugbücherei' # type: ignore[index]
+        assert index.get(0x478F41)[owner_column] == 'Ålesund Flyklubb' # type: ignore[index]
+        assert index.get(0x4CA7B9)[owner_column] == 'Ryanair' # type: ignore[index]
+
+def test_quoted_newline(tmp_path: Path) -> None:
+    fieldnames = [constants.MODE_S_ADDRESS_KEY, 'OwnerName']
+    rows = [['000001', 'First'], ['000002', 'Two\nLines "quoted"'], ['000003', 'Third']]
+    output_file = tmp_path / 'output.txt'
+    formatter = RowFormatter(fieldnames, constants.DEFAULT_OUTPUT_FILE_DELIMITER)
+    header = formatter.format_row(fieldnames) + formatter.line_terminator
+    lines = [formatter.format_row(row) for row in rows]
+
+    # Write the output file and its index
+    output_file.write_text(header + ''.join(line + formatter.line_terminator for line in lines), encoding='utf-8', newline='')
+    writer = OutputIndexWriter(output_index_path(output_file), len(header.encode('utf-8')), 0)
+    writer.add_rows(rows, lines)
+    writer.save()
+
+    with OutputIndex(output_file) as index:
+        assert [index.get(address) for address in (1, 2, 3)] == rows
+
+def test_changed_output_file(output_file: Path) -> None:
+    # Add a row after the output file was indexed
+    with output_file.open('a', encoding='utf-8', newline='') as file:
+        file.write('extra\r\n')
+
+    with pytest.raises(ValueError, match='has changed'):
+        OutputIndex(output_file)
+
+def test_not_an_index(output_file: Path) -> None:
+    output_index_path(output_file).write_bytes(b'not an index file at all, just some bytes')
+
+    with pytest.raises(ValueError, match='not an output index'):
+        OutputIndex(output_file)
+
+def test_missing_index(output_file: Path) -> None:
+    output_index_path(output_file).unlink()
+
+    with pytest.raises(OSError):
+        OutputIndex(output_file)
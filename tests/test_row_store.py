@@ -0,0 +1,175 @@
+"""Tests that a row store behaves as a dictionary of the rows keyed by address."""
+
+import random
+from typing import Dict, List
+
+import pytest
+
+import constants
+from Converter.row_store import RowStore
+
+# The fieldnames of the rows, and the number of rows added, thousands so the sorted entries are searched over many steps
+FIELDNAMES = [constants.MODE_S_ADDRESS_KEY, 'RegistrationMark', 'CellManufacturer']
+ROW_COUNT = 10000
+
+def make_row(key: int, version: int = 0) -> List[str]:
+    """Creates the values of a row.
+
+    Args:
+        key (int): The ICAO address of the row.
+        version (int, optional): A number distinguishing the rows which replace an earlier row. Defaults to 0.
+
+    Returns:
+        List[str]: The values of the row.
+    """
+    return [format(key, '06X'), f'REG-{key}-{version}', 'CESSNA']
+
+def random_keys(rng: random.Random, count: int) -> List[int]:
+    """Chooses different random ICAO addresses.
+
+    Args:
+        rng (random.Random): The random number generator.
+        count (int): The number of addresses.
+
+    Returns:
+        List[int]: The addresses, in random order.
+    """
+    return rng.sample(range(1 << 24), count)
+
+def assert_matches(store: RowStore, expected: Dict[int, List[str]], missing: List[int]) -> None:
+    """Checks a row store holds the same rows, in the same order, as a dictionary.
+
+    Args:
+        store (RowStore): The row store.
+        expected (Dict[int, List[str]]): The rows keyed by address, in the order their key was first added.
+        missing (List[int]): Addresses with no row.
+    """
+    assert len(store) == len(expected)
+    assert list(store) == list(expected)
+    assert store.rows == list(expected.values())
+
+    # Every row is found by its address
+    for position, (key, values) in enumerate(expected.items()):
+        assert key in store
+        assert store.position(key) == position
+        assert store.get_row(key) is store.rows[position]
+        assert store.get_row(key) == values
+
+    for key in missing:
+        assert key not in store
+        assert store.position(key) is None
+        assert store.get_row(key) is None
+
+        with pytest.raises(KeyError):
+            store[key]
+
+    # The positions in key order match the dictionary sorted by address
+    positions = {key: position for position, key in enumerate(expected)}
+    assert store.positions_in_key_order() == [positions[key] for key in sorted(expected)]
+
+@pytest.fixture
+def rng() -> random.Random:
+    """Creates a random number generator with a fixed seed, so the tests are repeatable.
+
+    Returns:
+        random.Random: The random number generator.
+    """
+    return random.Random(0)
+
+def test_set_row(rng: random.Random) -> None:
+    store = RowStore(FIELDNAMES)
+    expected: Dict[int, List[str]] = {}
+    keys = random_keys(rng, ROW_COUNT + 100)
+    keys, missing = keys[:ROW_COUNT], keys[ROW_COUNT:]
+
+    # Append many rows
+    for key in keys:
+        values = make_row(key)
+        store.set_row(key, values)
+        expected[key] = values
+
+    assert_matches(store, expected, missing)
+
+    # Replacing rows keeps their position
+    for key in rng.sample(keys, ROW_COUNT // 2):
+        values = make_row(key, 1)
+        store.set_row(key, values)
+        expected[key] = values
+
+    assert_matches(store, expected, missing)
+
+def test_add_empty_row(rng: random.Random) -> None:
+    store = RowStore(FIELDNAMES)
+    keys = random_keys(rng, ROW_COUNT)
+
+    for key in keys:
+        values = store.add_empty_row(key)
+        values[0] = format(key, '06X')
+
+    assert_matches(store, {key: [format(key, '06X'), '', ''] for key in keys}, [])
+    assert store[keys[0]][constants.MODE_S_ADDRESS_KEY] == format(keys[0], '06X')
+
+def test_restore_rows(rng: random.Random) -> None:
+    keys = random_keys(rng, 3 * ROW_COUNT)
+    restored, added, missing = keys[:ROW_COUNT], keys[ROW_COUNT:2 * ROW_COUNT], keys[2 * ROW_COUNT:]
+    expected = {key: make_row(key) for key in restored}
+
+    # Restoring rows replaces the rows already in the store
+    store = RowStore(FIELDNAMES)
+    store.set_row(missing[0], make_row(missing[0]))
+    store.restore_rows(list(expected.values()), restored)
+
+    assert store.index == {}
+    assert_matches(store, expected, missing)
+
+    # Rows added after restoring are indexed by the dictionary, interleaved in key order with the restored rows
+    for key in added:
+        values = make_row(key)
+        store.set_row(key, values)
+        expected[key] = values
+
+    # Replace rows of both indexes
+    for key in rng.sample(restored, 1000) + rng.sample(added, 1000):
+        values = make_row(key, 1)
+        store.set_row(key, values)
+        expected[key] = values
+
+    assert len(store.index) == len(added)
+    assert_matches(store, expected, missing)
+
+    # Compacting moves the added rows into the sorted entries
+    store.compact()
+
+    assert store.index == {}
+    assert len(store.entries) == len(expected)
+    assert_matches(store, expected, missing)
+
+    # Rows are still added and replaced once the store has been compacted
+    for key in missing[:100]:
+        values = make_row(key)
+        store.set_row(key, values)
+        expected[key] = values
+
+    store.set_row(restored[0], make_row(restored[0], 2))
+    expected[restored[0]] = make_row(restored[0], 2)
+
+    assert_matches(store, expected, missing[100:])
+
+def test_compact(rng: random.Random) -> None:
+    store = RowStore(FIELDNAMES)
+    keys = random_keys(rng, ROW_COUNT + 100)
+    keys, missing = keys[:ROW_COUNT], keys[ROW_COUNT:]
+    expected = {key: make_row(key) for key in keys}
+
+    # Compacting an empty store, or a store with no rows in its dictionary, leaves it unchanged
+    store.compact()
+    assert len(store.entries) == 0
+
+    for key, values in expected.items():
+        store.set_row(key, values)
+
+    store.compact()
+    store.compact()
+
+    assert store.index == {}
+    assert_matches(store, expected, missing)